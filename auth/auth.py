@@ -1,17 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
 from starlette import status
-from database.database import SessionLocal
-from typing import Annotated
-from sqlalchemy.orm import Session
+from database.database import get_async_db, get_read_db
+from typing import Annotated, List, Optional
+from sqlalchemy import and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.security import OAuth2PasswordRequestForm
 from services.auth_service import (
-    authenticate_user, bcrypt_context, create_access_token
+    ACCESS_TOKEN_LIFETIME, authenticate_user, create_access_token
 )
-from datetime import timedelta
+from services.etag import collection_etag, etag_matches
+from services.query_budget import route_budget
+from services.serialization import ORJSONResponse, projection, rows_to_dicts
+from services.pagination import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, decode_cursor, split_page
+)
+from services.password_hasher import password_hasher
+from services.rate_limiter import login_limiter
 from models.token_model import Token
-from services.auth_service import get_current_user
-from schemas.staff_schema import StaffSchema
-from models.staff_model import Staff
+from services.auth_service import (
+    get_current_user, oauth2_bearer, revoke_token
+)
+from schemas.staff_schema import StaffOut, StaffSchema
+from models.staff_model import Staff, StaffDirectoryVersion
 
 
 router = APIRouter(
@@ -20,49 +30,93 @@ router = APIRouter(
 )
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
-db_dependency = Annotated[Session, Depends(get_db)]
+db_dependency = Annotated[AsyncSession, Depends(get_async_db)]
+read_db_dependency = Annotated[AsyncSession, Depends(get_read_db)]
 user_dependency = Annotated[dict, Depends(get_current_user)]
 
 
-@router.get("/get-all-user", status_code=status.HTTP_200_OK)
-async def get_all_users(db: db_dependency):
-    users_model = db.query(Staff).all()
-    if users_model is None or len(users_model) < 1:
-        raise HTTPException(status_code=404, detail="Users not found")
-    else:
-        return users_model
+def _directory_query(role: Optional[str], username: Optional[str]):
+    query = select(*projection(Staff, StaffOut)).where(Staff.username.is_not(None))
+    if role is not None:
+        query = query.where(Staff.role == role.upper())
+    if username is not None:
+        # The pattern_ops indexes serve LIKE 'prefix%' under any collation.
+        query = query.where(Staff.username.startswith(username, autoescape=True))
+    return query
+
+
+@router.get("/staff-directory", response_model=List[StaffOut],
+            status_code=status.HTTP_200_OK,
+            summary="Lista a equipe por função e prefixo do nome de usuário")
+@route_budget(2)
+async def staff_directory(
+    *,
+    db: read_db_dependency,
+    current_user: user_dependency,
+    role: Optional[str] = Query(None, min_length=3, max_length=15, description="Função, ex.: DOCTOR"),
+    username: Optional[str] = Query(None, min_length=1, max_length=100, description="Prefixo do nome de usuário"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Tamanho da página"),
+    cursor: Optional[str] = Query(None, description=f"Valor do cabeçalho {NEXT_CURSOR_HEADER} da página anterior"),
+    if_none_match: Optional[str] = Header(None)
+):
+    # Every ORM write to staff_member bumps this row in the same
+    # transaction, so revalidation is a single primary-key lookup.
+    version = await db.scalar(
+        select(StaffDirectoryVersion.version).where(StaffDirectoryVersion.id == 1)
+    )
+    etag = collection_etag("staff", version, role, username, limit, cursor)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+    query = _directory_query(role, username)
+    if cursor:
+        last_name, last_id = decode_cursor(cursor, str, int)
+        query = query.where(or_(
+            Staff.username > last_name,
+            and_(Staff.username == last_name, Staff.id > last_id)
+        ))
+    result = await db.execute(query.order_by(Staff.username, Staff.id).limit(limit + 1))
+    rows, next_cursor = split_page(result.all(), limit, lambda row: (row.username, row.id))
+
+    headers = {"ETag": etag}
+    if next_cursor:
+        headers[NEXT_CURSOR_HEADER] = next_cursor
+    return ORJSONResponse(rows_to_dicts(rows, StaffOut), headers=headers)
 
 
 @router.post("/create-new-staff-member",
              status_code=status.HTTP_201_CREATED)
+@route_budget(2)
 async def create_user(db: db_dependency,
                       create_staff_request: StaffSchema):
     create_user_model = Staff(
         cpf=create_staff_request.cpf,
         username=create_staff_request.username,
-        hashed_password=bcrypt_context.hash(create_staff_request
-                                            .hashed_password),
+        hashed_password=await password_hasher.hash(create_staff_request
+                                                   .hashed_password),
         role=create_staff_request.role
     )
 
     db.add(create_user_model)
-    db.commit()
+    await db.commit()
 
 
 
 @router.post("/login", response_model=Token)
-async def login_for_access_token(form_data:
+@route_budget(1)
+async def login_for_access_token(request: Request,
+                                 form_data:
                                  Annotated[OAuth2PasswordRequestForm,
                                            Depends()], db: db_dependency):
-    user = authenticate_user(form_data.username, form_data.password, db)
+    # Before any query or bcrypt work, so a flood costs almost nothing.
+    retry_after = login_limiter.check(request.client.host if request.client else None,
+                                      form_data.username)
+    if retry_after:
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                            detail="Muitas tentativas de login. Tente novamente mais tarde.",
+                            headers={"Retry-After": login_limiter.retry_after_header(retry_after)})
+
+    user = await authenticate_user(form_data.username, form_data.password, db)
 
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
@@ -71,6 +125,13 @@ async def login_for_access_token(form_data:
                                 user_id=user.id,
                                 role=user.role,
                                 username=user.username,
-                                expires_delta=timedelta(minutes=30))
+                                expires_delta=ACCESS_TOKEN_LIFETIME)
+
+    return {"access_token": token, "token_type": "bearer"}
+
 
-    return {"access_token": token, "token_type": "bearer"}
\ No newline at end of file
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+@route_budget(0)
+async def logout(token: Annotated[str, Depends(oauth2_bearer)],
+                 current_user: user_dependency):
+    revoke_token(token)
\ No newline at end of file
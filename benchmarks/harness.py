@@ -0,0 +1,66 @@
+import json
+import os
+import statistics
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+
+BASELINE_DIR = Path(__file__).parent / "baselines"
+DEFAULT_THRESHOLD = float(os.getenv("BENCH_THRESHOLD", "0.25"))
+
+
+def measure(fn: Callable[[], object], iterations: int, warmup: int = 1) -> dict:
+    # fn runs one operation; timings are reported in milliseconds.
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        "iterations": iterations,
+        "median_ms": statistics.median(samples),
+        "p95_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        "min_ms": samples[0],
+    }
+
+
+def baseline_path(size: str) -> Path:
+    return BASELINE_DIR / f"{size}.json"
+
+
+def load_baseline(size: str) -> Optional[Dict[str, dict]]:
+    path = baseline_path(size)
+    if not path.exists():
+        return None
+    return json.loads(path.read_text())["results"]
+
+
+def save_baseline(size: str, results: Dict[str, dict], environment: dict):
+    BASELINE_DIR.mkdir(exist_ok=True)
+    baseline_path(size).write_text(json.dumps(
+        {"environment": environment, "results": results}, indent=2, sort_keys=True
+    ) + "\n")
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict],
+            threshold: float = DEFAULT_THRESHOLD) -> List[dict]:
+    # A benchmark regresses when its median is more than `threshold` slower
+    # than the baseline median. Benchmarks missing on either side are skipped.
+    report = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        ratio = result["median_ms"] / previous["median_ms"] if previous["median_ms"] else 1.0
+        report.append({
+            "name": name,
+            "baseline_ms": previous["median_ms"],
+            "current_ms": result["median_ms"],
+            "ratio": ratio,
+            "regressed": ratio > 1 + threshold,
+        })
+    return report
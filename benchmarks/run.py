@@ -0,0 +1,234 @@
+"""Hot-path benchmark suite.
+
+    python -m benchmarks.run --size 10k            # compare with the baseline
+    python -m benchmarks.run --size 10k --save     # record a new baseline
+
+Runs against a seeded SQLite file in benchmarks/.data by default; point
+BENCH_DATABASE_URL at a dedicated PostgreSQL database to measure that
+instead (it is dropped and reseeded when its size does not match). Exits
+with status 1 when any median is more than --threshold slower than the
+baseline in benchmarks/baselines/<size>.json, and with status 2 when that
+baseline does not exist, so a gate without a reference never passes.
+"""
+import argparse
+import asyncio
+import os
+import platform
+import random
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from benchmarks.harness import (
+    DEFAULT_THRESHOLD, compare, load_baseline, measure, save_baseline
+)
+
+
+SIZES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+DATA_DIR = Path(__file__).parent / ".data"
+SEED_CHUNK_SIZE = 10_000
+PASSWORD = "senha123"
+# Benchmark data only; never reuse it for real records.
+BENCH_CPF_KEY = "nzKne95yB1oaUombaczlWe-0t2c_Zqykomlfjbkv2zo="
+
+FIRST_NAMES = ("Ana", "João", "Maria", "José", "Francisca", "Antônio", "Luiza",
+               "Carlos", "Paulo", "Adriana", "Lucas", "Juliana", "Márcio", "Beatriz")
+LAST_NAMES = ("Silva", "Santos", "Oliveira", "Souza", "Rodrigues", "Ferreira", "Alves",
+              "Pereira", "Lima", "Gomes", "Costa", "Ribeiro", "Martins", "Carvalho")
+
+
+def configure_environment(size: str) -> str:
+    # Must run before the engines are first used: they are built from
+    # DATABASE_URL on demand.
+    url = os.getenv("BENCH_DATABASE_URL")
+    if not url:
+        DATA_DIR.mkdir(exist_ok=True)
+        url = f"sqlite:///{DATA_DIR / f'pacients-{size}.db'}"
+    os.environ["DATABASE_URL"] = url
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+    os.environ.setdefault("ALGORITHM", "HS256")
+    os.environ.setdefault("CPF_ENCRYPTION_KEYS", BENCH_CPF_KEY)
+    os.environ.setdefault("CPF_INDEX_KEY", "benchmark")
+    return url
+
+
+def pacient_name(i: int) -> str:
+    first = FIRST_NAMES[i % len(FIRST_NAMES)]
+    middle = LAST_NAMES[(i // len(FIRST_NAMES)) % len(LAST_NAMES)]
+    last = LAST_NAMES[(i // 7) % len(LAST_NAMES)]
+    return f"{first} {middle} {last} {i}"
+
+
+def seed(rows: int):
+    from sqlalchemy import func, insert, inspect, select
+    from database.database import Base, get_engine
+    # Every table has to be in the metadata for drop_all to order the drops.
+    import models.appointment_model
+    import models.pacient_change_set_model
+    import models.pacient_inactivation_model
+    from models.pacient_model import Pacient
+    from models.staff_model import Staff
+    from services.cpf_crypto import cpf_index
+    from services.password_hasher import _crypt_context
+    from services.trigram import normalize_name
+
+    engine = get_engine()
+    Base.metadata.create_all(engine)
+    current = all(
+        {column["name"] for column in inspect(engine).get_columns(model.__tablename__)}
+        == set(model.__table__.columns.keys())
+        for model in (Pacient, Staff)
+    )
+    with engine.connect() as conn:
+        if current and conn.scalar(select(func.count()).select_from(Pacient)) == rows:
+            return
+
+    print(f"seeding {rows} patients...", file=sys.stderr)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    hashed = _crypt_context.hash(PASSWORD)
+    with engine.begin() as conn:
+        conn.execute(insert(Staff), [{"username": "Dr. Benchmark", "cpf": "00000000001",
+                                      "cpf_hash": cpf_index("00000000001"),
+                                      "hashed_password": hashed, "role": "DOCTOR"}])
+        for start in range(0, rows, SEED_CHUNK_SIZE):
+            conn.execute(insert(Pacient), [
+                {"full_name": pacient_name(i), "normalized_name": normalize_name(pacient_name(i)),
+                 "birth_date": "01012000", "cpf": f"{i + 10**10:011d}",
+                 "cpf_hash": cpf_index(f"{i + 10**10:011d}"),
+                 "hashed_password": hashed, "gender": "Feminino",
+                 "phone_number": "11999999999", "address": "Rua das Flores, 100",
+                 "email": f"p{i}@example.com", "version_id": 1}
+                for i in range(start, min(start + SEED_CHUNK_SIZE, rows))
+            ])
+
+
+def build_benchmarks(client, rows: int):
+    from jose import jwt
+    from sqlalchemy import func, select
+    from database.database import get_engine
+    from models.appointment_model import Appointment
+    from models.pacient_model import Pacient
+    from models.staff_model import Staff
+    from schemas.pacient_output import PacientOutput
+    from services.auth_service import algorithm, create_access_token, secret_key
+    from services.password_hasher import password_hasher
+    from services.serialization import ORJSONResponse, projection, rows_to_dicts
+
+    rng = random.Random(42)
+    loop = asyncio.new_event_loop()
+    # Writes persist between runs, so start after the last booked slot and
+    # from the current version of each patient that will be updated.
+    targets = rng.sample(range(1, rows + 1), 100)
+    with get_engine().connect() as conn:
+        hashed = conn.scalar(select(Pacient.hashed_password).limit(1))
+        doctor_id = conn.scalar(select(Staff.id).where(Staff.role == "DOCTOR"))
+        page = conn.execute(select(*projection(Pacient, PacientOutput)).limit(500)).all()
+        last_slot = conn.scalar(select(func.max(Appointment.scheduled_at)))
+        versions = dict(conn.execute(
+            select(Pacient.id, Pacient.version_id).where(Pacient.id.in_(targets))
+        ).all())
+
+    token = create_access_token("00000000001", "DOCTOR", 1, "Dr. Benchmark",
+                                timedelta(minutes=20))
+    first_slot = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    first_slot += timedelta(days=1)
+    if last_slot is not None:
+        if last_slot.tzinfo is None:
+            last_slot = last_slot.replace(tzinfo=timezone.utc)
+        first_slot = max(first_slot, last_slot + timedelta(minutes=30))
+    slots = (first_slot + timedelta(minutes=30 * i) for i in range(10**7))
+    update_targets = iter(targets * 100)
+
+    def search(params):
+        response = client.get("/patients/search-patient", params=params)
+        assert response.status_code == 200, response.text
+
+    def schedule():
+        response = client.post("/appointments/schedule-appointment", json={
+            "pacient_id": rng.randint(1, rows), "doctor_id": doctor_id,
+            "scheduled_at": next(slots).isoformat()})
+        assert response.status_code == 201, response.text
+
+    def update():
+        pacient_id = next(update_targets)
+        response = client.patch(
+            f"/patients/update-patient/{pacient_id}",
+            json={"full_name": f"Atualizado {rng.random()}", "birth_date": "01012000",
+                  "phone_number": "11988887777", "address": "Rua Nova, 200"},
+            headers={"If-Match": f'"{pacient_id}-{versions[pacient_id]}"'})
+        assert response.status_code == 200, response.text
+        versions[pacient_id] = response.json()["version_id"]
+
+    return {
+        "bcrypt_verify": (10, lambda: loop.run_until_complete(
+            password_hasher.verify(PASSWORD, hashed))),
+        "jwt_encode": (2000, lambda: create_access_token(
+            "00000000001", "DOCTOR", 1, "Dr. Benchmark", timedelta(minutes=20))),
+        "jwt_decode": (2000, lambda: jwt.decode(token, secret_key, algorithms=algorithm)),
+        "search_by_id": (300, lambda: search({"id": rng.randint(1, rows)})),
+        "search_by_cpf": (300, lambda: search({"cpf": f"{rng.randrange(rows) + 10**10:011d}"})),
+        "search_by_name": (50, lambda: search({"name": pacient_name(rng.randrange(rows))})),
+        "schedule_appointment": (100, schedule),
+        "update_pacient": (100, update),
+        "serialize_search_page": (300, lambda: ORJSONResponse(rows_to_dicts(page, PacientOutput))),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", choices=SIZES, default="10k")
+    parser.add_argument("--save", action="store_true", help="grava os resultados como baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="regressão tolerada sobre a mediana (0.25 = 25%%)")
+    parser.add_argument("--only", help="lista de benchmarks separados por vírgula")
+    args = parser.parse_args(argv)
+
+    url = configure_environment(args.size)
+    rows = SIZES[args.size]
+    seed(rows)
+
+    from fastapi.testclient import TestClient
+    from main import app
+    from services.auth_service import get_current_user
+    from services.password_hasher import password_hasher
+
+    app.dependency_overrides[get_current_user] = lambda: {
+        "cpf": "00000000001", "id": 1, "role": "RECEPCIONISTA", "username": "benchmark"}
+    results = {}
+    try:
+        with TestClient(app) as client:
+            benchmarks = build_benchmarks(client, rows)
+            selected = args.only.split(",") if args.only else list(benchmarks)
+            for name in selected:
+                iterations, fn = benchmarks[name]
+                results[name] = measure(fn, iterations)
+                print(f"{name:24} {results[name]['median_ms']:10.3f} ms  "
+                      f"(p95 {results[name]['p95_ms']:.3f})")
+    finally:
+        app.dependency_overrides.pop(get_current_user, None)
+        password_hasher.shutdown()
+
+    if args.save:
+        save_baseline(args.size, results, {
+            "database": url.split(":", 1)[0], "python": platform.python_version(),
+            "machine": platform.machine(), "cpus": os.cpu_count()})
+        print(f"baseline saved for {args.size}")
+        return 0
+
+    baseline = load_baseline(args.size)
+    if baseline is None:
+        print(f"no baseline for {args.size}; record one with --save on the gate machine "
+              f"and commit benchmarks/baselines/{args.size}.json", file=sys.stderr)
+        return 2
+
+    regressions = 0
+    for entry in compare(results, baseline, args.threshold):
+        flag = "REGRESSION" if entry["regressed"] else "ok"
+        regressions += entry["regressed"]
+        print(f"{entry['name']:24} {entry['baseline_ms']:10.3f} -> "
+              f"{entry['current_ms']:10.3f} ms  x{entry['ratio']:.2f}  {flag}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+"""Per-row cost of rendering patient search results.
+
+    python -m benchmarks.serialization_bench [rows]
+
+"orm" is the old path: hydrate Pacient objects and validate them into
+PacientOutput before dumping. "projected" is the current one: select the
+PacientOutput columns and dump the rows with orjson.
+"""
+import os
+import sys
+import time
+from typing import List
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("CPF_ENCRYPTION_KEYS", "nzKne95yB1oaUombaczlWe-0t2c_Zqykomlfjbkv2zo=")
+os.environ.setdefault("CPF_INDEX_KEY", "benchmark")
+
+import orjson
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session
+from database.database import Base
+import models.appointment_model
+import models.pacient_change_set_model
+import models.pacient_inactivation_model
+import models.staff_model
+from models.pacient_model import Pacient
+from schemas.pacient_output import PacientOutput
+from services.serialization import projection, rows_to_dicts
+
+
+REPEAT = 5
+pacients_adapter = TypeAdapter(List[PacientOutput])
+
+
+def seed(engine, rows: int):
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(Pacient), [
+            {"full_name": f"Paciente Número {i}", "birth_date": "01012000",
+             "cpf": f"{i:011d}", "hashed_password": "x", "gender": "Feminino",
+             "phone_number": "11999999999", "address": "Rua das Flores, 100",
+             "email": f"p{i}@example.com", "version_id": 1}
+            for i in range(rows)
+        ])
+
+
+def orm_path(engine) -> bytes:
+    with Session(engine) as session:
+        pacients = session.scalars(select(Pacient)).all()
+        return pacients_adapter.dump_json(
+            pacients_adapter.validate_python(pacients, from_attributes=True)
+        )
+
+
+def projected_path(engine) -> bytes:
+    with engine.connect() as conn:
+        rows = conn.execute(select(*projection(Pacient, PacientOutput))).all()
+        return orjson.dumps(rows_to_dicts(rows, PacientOutput))
+
+
+def per_row_us(fn, engine, rows: int) -> float:
+    best = float("inf")
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        fn(engine)
+        best = min(best, time.perf_counter() - started)
+    return best / rows * 1e6
+
+
+def main(rows: int = 10_000):
+    engine = create_engine("sqlite://")
+    seed(engine, rows)
+    assert orjson.loads(orm_path(engine)) == orjson.loads(projected_path(engine))
+
+    before = per_row_us(orm_path, engine, rows)
+    after = per_row_us(projected_path, engine, rows)
+    print(f"rows={rows}")
+    print(f"orm        {before:8.2f} us/row")
+    print(f"projected  {after:8.2f} us/row  ({before / after:.1f}x)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000)
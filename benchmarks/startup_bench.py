@@ -0,0 +1,120 @@
+"""Start of one API worker, from a fresh process to ready.
+
+    python -m benchmarks.startup_bench [--runs 5] [--target 0.5] [--preload]
+
+Each run starts a new process, imports main, runs the lifespan startup and
+waits for the first passing readiness check, which is what an autoscaler
+waits for before routing traffic. With --preload the benchmark imports main
+once and forks every run from it, as `gunicorn --preload` forks its
+workers; the target is set for that mode, and a cold start (importing
+FastAPI, Pydantic and SQLAlchemy in each worker) does not meet it.
+DATABASE_URL must point at a database migrated to head. Exits with status 1
+when the median total is above --target seconds.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+
+DEFAULT_TARGET = float(os.getenv("STARTUP_TARGET_SECONDS", "0.5"))
+
+
+def start_worker(started: float) -> dict:
+    from main import app
+    from database.readiness import check_readiness
+    imported = time.perf_counter()
+
+    async def start():
+        async with app.router.lifespan_context(app):
+            lifespan = time.perf_counter()
+            report = await check_readiness()
+            return lifespan, report, time.perf_counter()
+
+    lifespan, report, ready = asyncio.run(start())
+    return {
+        "ready_at": time.time(),
+        "report": report,
+        "import_seconds": imported - started,
+        "lifespan_seconds": lifespan - imported,
+        "readiness_seconds": ready - lifespan,
+    }
+
+
+def child():
+    print(json.dumps(start_worker(time.perf_counter())))
+
+
+def run_forked() -> dict:
+    # The caller has imported main already; the fork inherits the modules
+    # and, like a preloaded gunicorn worker, only starts up.
+    read, write = os.pipe()
+    forked = time.time()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read)
+        status = 1
+        try:
+            os.write(write, json.dumps(start_worker(time.perf_counter())).encode())
+            status = 0
+        finally:
+            os._exit(status)
+    os.close(write)
+    with os.fdopen(read) as pipe:
+        output = pipe.read()
+    _, status = os.waitpid(pid, 0)
+    if status:
+        raise RuntimeError(f"worker exited with status {status}")
+    result = json.loads(output)
+    result["total_seconds"] = result.pop("ready_at") - forked
+    return result
+
+
+def run_once() -> dict:
+    spawned = time.time()
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.startup_bench", "--child"],
+        check=True, capture_output=True, text=True
+    ).stdout
+    result = json.loads(output.splitlines()[-1])
+    result["total_seconds"] = result.pop("ready_at") - spawned
+    return result
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--target", type=float, default=DEFAULT_TARGET,
+                        help="tempo máximo até o primeiro readiness (segundos)")
+    parser.add_argument("--preload", action="store_true",
+                        help="importa main uma vez e cria cada worker com fork")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        child()
+        return 0
+
+    if args.preload:
+        import main  # noqa: F401
+        import database.readiness  # noqa: F401
+        runs = [run_forked() for _ in range(args.runs)]
+    else:
+        runs = [run_once() for _ in range(args.runs)]
+    if not runs[0]["report"]["ready"]:
+        print(f"not ready: {runs[0]['report']}")
+        return 2
+
+    for key in ("import_seconds", "lifespan_seconds", "readiness_seconds", "total_seconds"):
+        print(f"{key:20} {statistics.median(run[key] for run in runs) * 1000:10.1f} ms")
+    total = statistics.median(run["total_seconds"] for run in runs)
+    print(f"target {args.target * 1000:.0f} ms: {'ok' if total <= args.target else 'SLOWER'}")
+    return 0 if total <= args.target else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
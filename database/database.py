@@ -1,30 +1,196 @@
-from sqlalchemy import create_engine
+import os
+import threading
+from typing import Optional
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from dotenv import load_dotenv
-import os
+from starlette.requests import Request
+from database.pool import engine_options, pool_stats
+from database.routing import (
+    LAST_WRITE_COOKIE, LAST_WRITE_HEADER, ReplicaSet, is_replica_failure, replica_urls,
+    track_writes, wrote_recently,
+)
+
+
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def to_async_url(url: str) -> str:
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise RuntimeError(f"Banco de dados sem driver assíncrono suportado: {backend}")
+    return parsed.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+
+def database_url() -> str:
+    load_dotenv()
+    url = os.getenv("DATABASE_URL")
+    if not url:
+        raise RuntimeError("A variável DATABASE_URL está vazia ou não foi definida. "
+                           "Verifique o seu arquivo .env e defina corretamente a string de conexão.")
+    return url
+
+
+def async_database_url() -> str:
+    url = database_url()
+    return os.getenv("ASYNC_DATABASE_URL") or to_async_url(url)
+
+
+def _enable_foreign_keys(dbapi_connection, connection_record):
+    # SQLite ignores ON DELETE CASCADE unless foreign keys are switched on.
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+def _build_engine(url: str, asynchronous: bool = False):
+    options = engine_options(url, asynchronous=asynchronous)
+    engine = create_async_engine(url, **options) if asynchronous else create_engine(url, **options)
+    sync_engine = engine.sync_engine if asynchronous else engine
+    if sync_engine.dialect.name == "sqlite":
+        event.listen(sync_engine, "connect", _enable_foreign_keys)
+    return engine
+
 
+class _Engines:
+    # Nothing connects, or even loads a driver, until the first caller needs
+    # an engine: importing the app stays free of I/O, and a pre-forked
+    # worker never inherits a parent's connections. The API only serves
+    # from the async engines; the sync one is for scripts and tests.
+    def __init__(self):
+        self.sync: Optional[Engine] = None
+        self.asynchronous: Optional[AsyncEngine] = None
+        self.replicas = ReplicaSet([])
+        self.session_factory: Optional[sessionmaker] = None
+        self.async_session_factory: Optional[async_sessionmaker] = None
+        self._lock = threading.Lock()
 
-load_dotenv()
+    def start(self):
+        if self.asynchronous is not None:
+            return
+        with self._lock:
+            if self.asynchronous is None:
+                asynchronous = _build_engine(async_database_url(), asynchronous=True)
+                replicas = ReplicaSet([_build_engine(to_async_url(url), asynchronous=True)
+                                       for url in replica_urls()])
+                for replica in replicas.engines:
+                    replicas.watch(replica)
+                self.async_session_factory = async_sessionmaker(
+                    bind=asynchronous, autoflush=False, expire_on_commit=False
+                )
+                self.replicas = replicas
+                self.asynchronous = asynchronous
 
-SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL")
+    def start_sync(self):
+        if self.sync is not None:
+            return
+        with self._lock:
+            if self.sync is None:
+                sync = _build_engine(database_url())
+                self.session_factory = sessionmaker(autocommit=False, autoflush=False,
+                                                    bind=sync)
+                self.sync = sync
 
-if not SQLALCHEMY_DATABASE_URL:
-    raise RuntimeError("A variável DATABASE_URL está vazia ou não foi definida. "
-                       "Verifique o seu arquivo .env e defina corretamente a string de conexão.")
+    async def dispose(self):
+        with self._lock:
+            sync, asynchronous, replicas = self.sync, self.asynchronous, self.replicas
+            self.sync = self.asynchronous = None
+            self.session_factory = self.async_session_factory = None
+            self.replicas = ReplicaSet([])
+        for replica in replicas.engines:
+            await replica.dispose()
+        if asynchronous is not None:
+            await asynchronous.dispose()
+        if sync is not None:
+            sync.dispose()
 
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+_engines = _Engines()
+init_engines = _engines.start
+dispose_engines = _engines.dispose
+
+
+def get_engine() -> Engine:
+    _engines.start_sync()
+    return _engines.sync
+
+
+def get_async_engine() -> AsyncEngine:
+    _engines.start()
+    return _engines.asynchronous
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 metadata = Base.metadata
 
 
 def get_db():
-    db = SessionLocal()
+    _engines.start_sync()
+    db = _engines.session_factory()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+async def get_async_db(request: Request):
+    _engines.start()
+    async with _engines.async_session_factory() as db:
+        track_writes(db, request.scope.setdefault("state", {}))
+        yield db
+
+
+async def get_read_db(request: Request):
+    # For read-only routes: a healthy replica in round-robin order, or the
+    # primary when there is none or this reader wrote a moment ago.
+    _engines.start()
+    replicas = _engines.replicas
+    last_write = (request.headers.get(LAST_WRITE_HEADER)
+                  or request.cookies.get(LAST_WRITE_COOKIE))
+    if replicas.engines and wrote_recently(last_write):
+        replicas.pin()
+    else:
+        for replica in replicas.candidates():
+            db = _engines.async_session_factory(bind=replica)
+            try:
+                await db.connection()
+            except (SQLAlchemyError, OSError) as exc:
+                await db.close()
+                if is_replica_failure(exc):
+                    replicas.mark_down(replica)
+                continue
+            async with db:
+                yield db
+            return
+
+    async with _engines.async_session_factory() as db:
+        yield db
+
+
+def get_pool_stats() -> dict:
+    stats = {}
+    if _engines.sync is not None:
+        stats["sync"] = pool_stats(_engines.sync.pool)
+    if _engines.asynchronous is not None:
+        stats["async"] = pool_stats(_engines.asynchronous.sync_engine.pool)
+    for i, replica in enumerate(_engines.replicas.engines):
+        stats[f"replica-{i}"] = pool_stats(replica.sync_engine.pool)
+    return stats
+
+
+def get_replica_stats() -> dict:
+    replicas = _engines.replicas
+    return {
+        "up": {f"replica-{i}": not replicas.is_down(replica)
+               for i, replica in enumerate(replicas.engines)},
+        "failovers": replicas.failovers,
+        "pinned_reads": replicas.pinned_reads,
+    }
@@ -0,0 +1,93 @@
+import os
+import time
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from services.metrics import Histogram
+
+
+CHECKOUT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0)
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value in (None, ""):
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+POOL_SIZE = _env_int("DB_POOL_SIZE", 10)
+MAX_OVERFLOW = _env_int("DB_MAX_OVERFLOW", 20)
+POOL_TIMEOUT = _env_int("DB_POOL_TIMEOUT", 30)
+POOL_RECYCLE = _env_int("DB_POOL_RECYCLE", 1800)
+POOL_PRE_PING = _env_bool("DB_POOL_PRE_PING", True)
+
+
+class _TimedCheckout:
+    # Times how long callers wait for a connection, including timeouts.
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            self.checkout_seconds.observe(time.perf_counter() - started)
+
+    def _init_metrics(self):
+        self.checkout_seconds = Histogram(CHECKOUT_BUCKETS)
+        self.timeouts = 0
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size(),
+            "checked_in": self.checkedin(),
+            "checked_out": self.checkedout(),
+            "overflow": max(self.overflow(), 0),
+            "max_overflow": self._max_overflow,
+            "timeouts": self.timeouts,
+            "checkout_seconds": self.checkout_seconds.snapshot(),
+        }
+
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._init_metrics()
+
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._init_metrics()
+
+
+def engine_options(url: str, asynchronous: bool = False) -> dict:
+    parsed = make_url(url)
+    # In-memory SQLite needs its single shared connection; leave it alone.
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        return {}
+    return {
+        "poolclass": TimedAsyncQueuePool if asynchronous else TimedQueuePool,
+        "pool_size": POOL_SIZE,
+        "max_overflow": MAX_OVERFLOW,
+        "pool_timeout": POOL_TIMEOUT,
+        "pool_recycle": POOL_RECYCLE,
+        "pool_pre_ping": POOL_PRE_PING,
+    }
+
+
+def pool_capacity() -> int:
+    return POOL_SIZE + MAX_OVERFLOW
+
+
+def pool_stats(pool) -> dict:
+    if isinstance(pool, _TimedCheckout):
+        return pool.stats()
+    return {"status": pool.status()}
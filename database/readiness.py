@@ -0,0 +1,61 @@
+import ast
+from pathlib import Path
+from typing import FrozenSet, Optional
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import SQLAlchemyError
+from database.database import get_async_engine
+
+
+VERSIONS_DIR = Path(__file__).resolve().parent.parent / "migrations" / "versions"
+VERSION_TABLE = "alembic_version"
+
+_heads: Optional[FrozenSet[str]] = None
+
+
+def _revision_ids(value) -> set:
+    if value is None:
+        return set()
+    if isinstance(value, str):
+        return {value}
+    return set(value)
+
+
+def expected_heads() -> FrozenSet[str]:
+    # Read straight from the revision files: importing Alembic alone would
+    # cost a fresh worker more than the rest of its startup.
+    global _heads
+    if _heads is None:
+        revisions, parents = set(), set()
+        for path in VERSIONS_DIR.glob("*.py"):
+            for node in ast.parse(path.read_text(encoding="utf-8")).body:
+                if not isinstance(node, ast.Assign) or len(node.targets) != 1:
+                    continue
+                name = getattr(node.targets[0], "id", None)
+                if name == "revision":
+                    revisions |= _revision_ids(ast.literal_eval(node.value))
+                elif name == "down_revision":
+                    parents |= _revision_ids(ast.literal_eval(node.value))
+        _heads = frozenset(revisions - parents)
+    return _heads
+
+
+def _current_heads(connection) -> FrozenSet[str]:
+    if not inspect(connection).has_table(VERSION_TABLE):
+        return frozenset()
+    return frozenset(connection.execute(text(f"SELECT version_num FROM {VERSION_TABLE}")).scalars())
+
+
+async def check_readiness() -> dict:
+    # Ready means the database answers and its schema is at the head
+    # revision this code was written against.
+    try:
+        async with get_async_engine().connect() as conn:
+            current = await conn.run_sync(_current_heads)
+    except (SQLAlchemyError, OSError):
+        return {"ready": False, "detail": "Banco de dados indisponível."}
+
+    expected = expected_heads()
+    if current != expected:
+        return {"ready": False, "detail": "Migrações pendentes.",
+                "revision": sorted(current), "expected": sorted(expected)}
+    return {"ready": True, "revision": sorted(current)}
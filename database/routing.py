@@ -0,0 +1,151 @@
+import itertools
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+from sqlalchemy import event
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.orm import Session
+
+
+STICKY_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "10"))
+RETRY_SECONDS = float(os.getenv("REPLICA_RETRY_SECONDS", "30"))
+# The time of a reader's last write travels with the reader, so every
+# worker and every host routes its next reads the same way.
+LAST_WRITE_COOKIE = "last_write"
+LAST_WRITE_HEADER = "X-Last-Write"
+
+_STATE_KEY = "read_routing_state"
+_WROTE_KEY = "read_routing_wrote"
+
+
+def replica_urls() -> List[str]:
+    value = os.getenv("DATABASE_REPLICA_URLS", "")
+    return [url.strip() for url in value.split(",") if url.strip()]
+
+
+def is_replica_failure(exc: BaseException) -> bool:
+    # Refused or dropped connections take a replica out; a pool that is
+    # merely busy (TimeoutError) only sends this one read elsewhere.
+    return isinstance(exc, (DBAPIError, OSError))
+
+
+class ReplicaSet:
+    def __init__(self, engines: List[AsyncEngine], retry_seconds: float = RETRY_SECONDS):
+        self.engines = list(engines)
+        self.retry_seconds = retry_seconds
+        self.failovers = 0
+        self.pinned_reads = 0
+        self._down_until: Dict[int, float] = {}
+        self._turn = itertools.count()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.engines)
+
+    def candidates(self) -> List[AsyncEngine]:
+        # Healthy replicas in round-robin order; one that failed is skipped
+        # until its retry window passes, then gets another chance.
+        if not self.engines:
+            return []
+        now = time.monotonic()
+        with self._lock:
+            start = next(self._turn) % len(self.engines)
+            ordered = self.engines[start:] + self.engines[:start]
+            return [engine for engine in ordered
+                    if self._down_until.get(id(engine), 0.0) <= now]
+
+    def mark_down(self, engine: AsyncEngine):
+        with self._lock:
+            self.failovers += 1
+            self._down_until[id(engine)] = time.monotonic() + self.retry_seconds
+
+    def pin(self):
+        # A read sent to the primary because its reader wrote a moment ago.
+        with self._lock:
+            self.pinned_reads += 1
+
+    def is_down(self, engine: AsyncEngine) -> bool:
+        with self._lock:
+            return self._down_until.get(id(engine), 0.0) > time.monotonic()
+
+    def watch(self, engine: AsyncEngine):
+        # Connections that drop mid-request take the replica out as well.
+        @event.listens_for(engine.sync_engine, "handle_error")
+        def _on_error(context):
+            if context.is_disconnect:
+                self.mark_down(engine)
+
+
+def wrote_recently(value: Optional[str], window: float = STICKY_SECONDS,
+                   now: Optional[float] = None) -> bool:
+    # A forged value can only send the sender's own reads to the primary.
+    if not value or window <= 0:
+        return False
+    try:
+        written_at = float(value)
+    except ValueError:
+        return False
+    now = time.time() if now is None else now
+    return now - window < written_at < now + window
+
+
+def track_writes(session, state: dict):
+    # Called on primary sessions with the request's ASGI state: a commit
+    # that wrote anything records when, for LastWriteMiddleware to send.
+    session.info[_STATE_KEY] = state
+
+
+@event.listens_for(Session, "after_flush")
+def _note_write(session, flush_context):
+    if _STATE_KEY in session.info:
+        session.info[_WROTE_KEY] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _note_bulk_write(orm_execute_state):
+    # Bulk insert/update/delete statements never go through a flush.
+    if (_STATE_KEY in orm_execute_state.session.info
+            and not orm_execute_state.is_select):
+        orm_execute_state.session.info[_WROTE_KEY] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_write(session):
+    if session.info.pop(_WROTE_KEY, False):
+        session.info[_STATE_KEY][LAST_WRITE_COOKIE] = time.time()
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_write(session, previous_transaction):
+    session.info.pop(_WROTE_KEY, None)
+
+
+class LastWriteMiddleware:
+    # Hands the write time back as a cookie, for browsers, and as a header
+    # that API clients send back on their reads.
+    def __init__(self, app, window: float = STICKY_SECONDS):
+        self.app = app
+        self.window = window
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.window <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        state = scope.setdefault("state", {})
+
+        async def send_wrapper(message):
+            written_at = state.get(LAST_WRITE_COOKIE)
+            if message["type"] == "http.response.start" and written_at is not None:
+                value = f"{written_at:.3f}"
+                cookie = (f"{LAST_WRITE_COOKIE}={value}; Max-Age={int(self.window) or 1}; "
+                          "Path=/; HttpOnly; SameSite=lax")
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"set-cookie", cookie.encode()),
+                    (LAST_WRITE_HEADER.lower().encode(), value.encode()),
+                ]
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
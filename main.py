@@ -1,18 +1,61 @@
-from fastapi import FastAPI
-import models.pacient_model as pacient_model
-from database.database import engine
+from contextlib import asynccontextmanager
+from anyio import to_thread
+from fastapi import Depends, FastAPI
+from fastapi.responses import PlainTextResponse
+from database.database import dispose_engines, get_pool_stats, init_engines
+from database.readiness import check_readiness
+from database.routing import LastWriteMiddleware
+from database.pool import pool_capacity
 from scalar_fastapi import get_scalar_api_reference
+from services.serialization import ORJSONResponse
+from services.prometheus import CONTENT_TYPE, render_metrics, require_scrape_token
+from services.request_metrics import MetricsMiddleware
+from services.password_hasher import password_hasher
 from auth import auth
 from routers import pacients, appointments
 
-app = FastAPI()
 
-pacient_model.Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Sync handlers run in anyio's threadpool; never allow more of them than
+    # the sync pool can hand connections to, or they block on checkout.
+    to_thread.current_default_thread_limiter().total_tokens = pool_capacity()
+    # The schema comes from `alembic upgrade head`, run once per deploy; a
+    # worker only builds its engines here and connects on first use.
+    init_engines()
+    try:
+        yield
+    finally:
+        await dispose_engines()
+        # Waits for the bcrypt worker processes, so none outlive a reload.
+        await to_thread.run_sync(password_hasher.shutdown)
+
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(LastWriteMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(auth.router)
 app.include_router(pacients.router)
 app.include_router(appointments.router)
 
+# Operational detail for the scraper and operators only; see
+# require_scrape_token.
+@app.get("/pool-stats", include_in_schema=False,
+         dependencies=[Depends(require_scrape_token)])
+async def pool_stats():
+    return get_pool_stats()
+
+@app.get("/ready", include_in_schema=False)
+async def ready():
+    report = await check_readiness()
+    return ORJSONResponse(report, status_code=200 if report["ready"] else 503)
+
+@app.get("/metrics", include_in_schema=False,
+         dependencies=[Depends(require_scrape_token)])
+async def metrics():
+    return PlainTextResponse(render_metrics(), media_type=CONTENT_TYPE)
+
 @app.get("/scalar", include_in_schema=False)
 async def scalar_html():
     return get_scalar_api_reference(
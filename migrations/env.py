@@ -0,0 +1,48 @@
+import os
+from logging.config import fileConfig
+from alembic import context
+from dotenv import load_dotenv
+from sqlalchemy import create_engine
+from sqlalchemy.pool import NullPool
+from database.database import Base
+import models.appointment_model
+import models.pacient_change_set_model
+import models.pacient_inactivation_model
+import models.pacient_model
+import models.staff_model
+
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+load_dotenv()
+target_metadata = Base.metadata
+
+
+def database_url() -> str:
+    url = os.getenv("DATABASE_URL")
+    if not url:
+        raise RuntimeError("A variável DATABASE_URL está vazia ou não foi definida.")
+    return url
+
+
+def run_migrations_offline():
+    context.configure(url=database_url(), target_metadata=target_metadata,
+                      literal_binds=True)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    connectable = create_engine(database_url(), poolclass=NullPool)
+    with connectable.connect() as connection:
+        context.configure(connection=connection, target_metadata=target_metadata)
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,91 @@
+"""baseline schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+
+Databases that were created by ``create_all`` before migrations existed
+should be marked with ``alembic stamp 0001`` instead of upgraded.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "staff_member",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("cpf", sa.String(), unique=True),
+        sa.Column("username", sa.String(), unique=True),
+        sa.Column("hashed_password", sa.String()),
+        sa.Column("role", sa.String()),
+    )
+    op.create_index("ix_staff_member_id", "staff_member", ["id"])
+
+    op.create_table(
+        "pacient",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("full_name", sa.String()),
+        sa.Column("birth_date", sa.String()),
+        sa.Column("cpf", sa.String(), unique=True),
+        sa.Column("hashed_password", sa.String()),
+        sa.Column("gender", sa.String()),
+        sa.Column("phone_number", sa.String()),
+        sa.Column("address", sa.String()),
+        sa.Column("email", sa.String(), nullable=True),
+        sa.Column("blood_type", sa.String(), nullable=True),
+        sa.Column("known_allergies", sa.String(), nullable=True),
+        sa.Column("role", sa.String(), nullable=False, server_default=sa.text("'PACIENT'")),
+        sa.Column("version_id", sa.Integer(), nullable=False),
+        sa.Column("is_active", sa.Boolean(), nullable=False, server_default=sa.text("true")),
+    )
+    op.create_index("ix_pacient_id", "pacient", ["id"])
+
+    op.create_table(
+        "pacient_history",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("pacient_id", sa.Integer(), sa.ForeignKey("pacient.id"), nullable=False),
+        sa.Column("field_name", sa.String(), nullable=False),
+        sa.Column("old_value", sa.String()),
+        sa.Column("new_value", sa.String()),
+        sa.Column("changed_by", sa.String(), nullable=False),
+        sa.Column("changed_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_pacient_history_id", "pacient_history", ["id"])
+
+    op.create_table(
+        "pacient_inactivation",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("pacient_id", sa.Integer(), sa.ForeignKey("pacient.id"), nullable=False),
+        sa.Column("reason", sa.String(), nullable=False),
+        sa.Column("inactivated_by", sa.String(), nullable=False),
+        sa.Column("inactivated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_pacient_inactivation_id", "pacient_inactivation", ["id"])
+
+    op.create_table(
+        "appointment",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("pacient_id", sa.Integer(), sa.ForeignKey("pacient.id"), nullable=False),
+        sa.Column("doctor_id", sa.Integer(), sa.ForeignKey("staff_member.id"), nullable=False),
+        sa.Column("scheduled_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("status", sa.Enum("SCHEDULED", "CANCELLED", "COMPLETED",
+                                    name="appointmentstatus"), nullable=False),
+        sa.UniqueConstraint("doctor_id", "scheduled_at", name="uq_doctor_schedule"),
+    )
+    op.create_index("ix_appointment_id", "appointment", ["id"])
+
+
+def downgrade():
+    op.drop_table("appointment")
+    sa.Enum(name="appointmentstatus").drop(op.get_bind(), checkfirst=True)
+    op.drop_table("pacient_inactivation")
+    op.drop_table("pacient_history")
+    op.drop_table("pacient")
+    op.drop_table("staff_member")
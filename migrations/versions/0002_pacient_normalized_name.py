@@ -0,0 +1,53 @@
+"""pacient.normalized_name for accent-insensitive name search
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+from services.name_search import create_trigram_index
+from services.trigram import normalize_name
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+def upgrade():
+    bind = op.get_bind()
+    columns = {column["name"] for column in sa.inspect(bind).get_columns("pacient")}
+    if "normalized_name" not in columns:
+        op.add_column("pacient", sa.Column("normalized_name", sa.String()))
+
+    pacient = sa.table("pacient", sa.column("id", sa.Integer),
+                       sa.column("full_name", sa.String),
+                       sa.column("normalized_name", sa.String))
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(pacient.c.id, pacient.c.full_name)
+            .where(pacient.c.id > last_id, pacient.c.normalized_name.is_(None))
+            .order_by(pacient.c.id)
+            .limit(BACKFILL_BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        bind.execute(
+            pacient.update()
+            .where(pacient.c.id == sa.bindparam("row_id"))
+            .values(normalized_name=sa.bindparam("name")),
+            [{"row_id": row.id, "name": normalize_name(row.full_name)} for row in rows]
+        )
+        last_id = rows[-1].id
+
+    create_trigram_index(bind)
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ix_pacient_normalized_name_trgm")
+    op.drop_column("pacient", "normalized_name")
@@ -0,0 +1,28 @@
+"""composite index for patient agendas
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+
+Doctor agendas are served by uq_doctor_schedule (doctor_id, scheduled_at),
+so only the patient side needs a new index.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    indexes = {index["name"] for index in sa.inspect(op.get_bind()).get_indexes("appointment")}
+    if "ix_appointment_pacient_status_scheduled" not in indexes:
+        op.create_index("ix_appointment_pacient_status_scheduled", "appointment",
+                        ["pacient_id", "status", "scheduled_at"])
+
+
+def downgrade():
+    op.drop_index("ix_appointment_pacient_status_scheduled", table_name="appointment")
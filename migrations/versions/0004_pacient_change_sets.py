@@ -0,0 +1,124 @@
+"""one change-set row per patient update
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+
+Converts the per-field pacient_history rows into pacient_change_set rows.
+Fields written by the same update share pacient_id, changed_by and
+changed_at (the transaction timestamp), which is how they are grouped.
+The old rows never recorded a version, and version_id was bumped even by
+saves that changed nothing, so converted change sets keep version_id NULL
+rather than a guessed number.
+"""
+from itertools import groupby
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+CONVERT_BATCH_SIZE = 500
+
+history = sa.table(
+    "pacient_history",
+    sa.column("id", sa.Integer), sa.column("pacient_id", sa.Integer),
+    sa.column("field_name", sa.String), sa.column("old_value", sa.String),
+    sa.column("new_value", sa.String), sa.column("changed_by", sa.String),
+    sa.column("changed_at", sa.DateTime(timezone=True)),
+)
+change_set = sa.table(
+    "pacient_change_set",
+    sa.column("pacient_id", sa.Integer), sa.column("version_id", sa.Integer),
+    sa.column("changes", sa.JSON), sa.column("changed_by", sa.String),
+    sa.column("changed_at", sa.DateTime(timezone=True)),
+)
+
+
+def _pacient_batches(bind, table):
+    # Walk patients in id order so memory stays bounded by the batch.
+    last_id = 0
+    while True:
+        ids = bind.execute(
+            sa.select(table.c.pacient_id).distinct()
+            .where(table.c.pacient_id > last_id)
+            .order_by(table.c.pacient_id)
+            .limit(CONVERT_BATCH_SIZE)
+        ).scalars().all()
+        if not ids:
+            return
+        yield ids
+        last_id = ids[-1]
+
+
+def upgrade():
+    op.create_table(
+        "pacient_change_set",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("pacient_id", sa.Integer(), sa.ForeignKey("pacient.id"), nullable=False),
+        sa.Column("version_id", sa.Integer(), nullable=True),
+        sa.Column("changes", sa.JSON(), nullable=False),
+        sa.Column("changed_by", sa.String(), nullable=False),
+        sa.Column("changed_at", sa.DateTime(timezone=True), nullable=False,
+                  server_default=sa.func.now()),
+    )
+    op.create_index("ix_pacient_change_set_id", "pacient_change_set", ["id"])
+    op.create_index("ix_pacient_change_set_pacient_changed", "pacient_change_set",
+                    ["pacient_id", "changed_at"])
+
+    bind = op.get_bind()
+    for ids in _pacient_batches(bind, history):
+        rows = bind.execute(
+            sa.select(history).where(history.c.pacient_id.in_(ids))
+            .order_by(history.c.pacient_id, history.c.changed_at, history.c.id)
+        ).all()
+        change_sets = []
+        for pacient_id, updates in groupby(rows, key=lambda row: row.pacient_id):
+            grouped = groupby(updates, key=lambda row: (row.changed_at, row.changed_by))
+            for (changed_at, changed_by), fields in grouped:
+                change_sets.append({
+                    "pacient_id": pacient_id,
+                    "version_id": None,
+                    "changes": {row.field_name: [row.old_value, row.new_value]
+                                for row in fields},
+                    "changed_by": changed_by,
+                    "changed_at": changed_at,
+                })
+        if change_sets:
+            bind.execute(change_set.insert(), change_sets)
+
+    op.drop_table("pacient_history")
+
+
+def downgrade():
+    op.create_table(
+        "pacient_history",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("pacient_id", sa.Integer(), sa.ForeignKey("pacient.id"), nullable=False),
+        sa.Column("field_name", sa.String(), nullable=False),
+        sa.Column("old_value", sa.String()),
+        sa.Column("new_value", sa.String()),
+        sa.Column("changed_by", sa.String(), nullable=False),
+        sa.Column("changed_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_pacient_history_id", "pacient_history", ["id"])
+
+    bind = op.get_bind()
+    for ids in _pacient_batches(bind, change_set):
+        rows = bind.execute(
+            sa.select(change_set).where(change_set.c.pacient_id.in_(ids))
+        ).all()
+        fields = [
+            {"pacient_id": row.pacient_id, "field_name": field,
+             "old_value": None if old is None else str(old),
+             "new_value": None if new is None else str(new),
+             "changed_by": row.changed_by, "changed_at": row.changed_at}
+            for row in rows for field, (old, new) in row.changes.items()
+        ]
+        if fields:
+            bind.execute(history.insert(), fields)
+
+    op.drop_table("pacient_change_set")
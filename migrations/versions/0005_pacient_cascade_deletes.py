@@ -0,0 +1,51 @@
+"""ON DELETE CASCADE for patient children
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+CHILD_TABLES = ("appointment", "pacient_inactivation", "pacient_change_set")
+# SQLite leaves these foreign keys unnamed; batch mode names them the way
+# PostgreSQL does so they can be dropped.
+NAMING_CONVENTION = {"fk": "%(table_name)s_%(column_0_name)s_fkey"}
+
+
+def _pacient_foreign_key(bind, table):
+    for foreign_key in sa.inspect(bind).get_foreign_keys(table):
+        if foreign_key["referred_table"] == "pacient" and \
+                foreign_key["constrained_columns"] == ["pacient_id"]:
+            return foreign_key["name"] or f"{table}_pacient_id_fkey"
+    return None
+
+
+def _replace_foreign_keys(ondelete):
+    bind = op.get_bind()
+    for table in CHILD_TABLES:
+        current = _pacient_foreign_key(bind, table)
+        with op.batch_alter_table(table, naming_convention=NAMING_CONVENTION) as batch:
+            if current is not None:
+                batch.drop_constraint(current, type_="foreignkey")
+            batch.create_foreign_key(f"{table}_pacient_id_fkey", "pacient",
+                                     ["pacient_id"], ["id"], ondelete=ondelete)
+
+
+def upgrade():
+    _replace_foreign_keys("CASCADE")
+    # The purge job groups inactivations by patient and date; the cascade
+    # needs pacient_id indexed as well.
+    op.create_index("ix_pacient_inactivation_pacient_at", "pacient_inactivation",
+                    ["pacient_id", "inactivated_at"])
+
+
+def downgrade():
+    op.drop_index("ix_pacient_inactivation_pacient_at", table_name="pacient_inactivation")
+    _replace_foreign_keys(None)
@@ -0,0 +1,21 @@
+"""covering (id, version_id) index for ETag revalidation
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index("ix_pacient_id_version", "pacient", ["id", "version_id"])
+
+
+def downgrade():
+    op.drop_index("ix_pacient_id_version", table_name="pacient")
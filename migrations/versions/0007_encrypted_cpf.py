@@ -0,0 +1,101 @@
+"""encrypted CPF with an HMAC blind index
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+
+Needs CPF_ENCRYPTION_KEYS and CPF_INDEX_KEY. Rows are converted in
+committed batches, and a row gets its ciphertext and its cpf_hash in the
+same UPDATE, so an interrupted upgrade resumes where it stopped when run
+again: every step below is skipped once it is done.
+"""
+import os
+from alembic import op
+import sqlalchemy as sa
+from services.cpf_crypto import INDEX_LENGTH, cpf_index, decrypt_cpf, encrypt_cpf
+
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+TABLES = ("pacient", "staff_member")
+BATCH_SIZE = int(os.getenv("CPF_MIGRATION_BATCH_SIZE", "1000"))
+
+
+def _table(name):
+    return sa.table(name, sa.column("id", sa.Integer), sa.column("cpf", sa.String),
+                    sa.column("cpf_hash", sa.String))
+
+
+# SQLite leaves unique constraints unnamed and cannot ALTER them; batch mode
+# rebuilds the table and names them the way PostgreSQL does.
+NAMING_CONVENTION = {"uq": "%(table_name)s_%(column_0_name)s_key"}
+
+
+def _unique_constraint(bind, table, column):
+    for constraint in sa.inspect(bind).get_unique_constraints(table):
+        if constraint["column_names"] == [column]:
+            return constraint["name"] or f"{table}_{column}_key"
+    return None
+
+
+def _convert(bind, name, pending, convert):
+    table = _table(name)
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(table.c.id, table.c.cpf)
+            .where(table.c.id > last_id, table.c.cpf.is_not(None), pending(table))
+            .order_by(table.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        bind.execute(
+            table.update()
+            .where(table.c.id == sa.bindparam("row_id"))
+            .values(cpf=sa.bindparam("new_cpf"), cpf_hash=sa.bindparam("new_hash")),
+            [dict(row_id=row.id, **convert(row.cpf)) for row in rows]
+        )
+        last_id = rows[-1].id
+
+
+def upgrade():
+    bind = op.get_bind()
+    for table in TABLES:
+        columns = {column["name"] for column in sa.inspect(bind).get_columns(table)}
+        if "cpf_hash" not in columns:
+            op.add_column(table, sa.Column("cpf_hash", sa.String(INDEX_LENGTH)))
+
+    with op.get_context().autocommit_block():
+        for table in TABLES:
+            _convert(bind, table, lambda t: t.c.cpf_hash.is_(None),
+                     lambda cpf: {"new_cpf": encrypt_cpf(cpf), "new_hash": cpf_index(cpf)})
+
+    for table in TABLES:
+        cpf_key = _unique_constraint(bind, table, "cpf")
+        cpf_hash_key = _unique_constraint(bind, table, "cpf_hash")
+        with op.batch_alter_table(table, naming_convention=NAMING_CONVENTION) as batch:
+            # Ciphertexts are never equal; uniqueness now lives on the index.
+            if cpf_key is not None:
+                batch.drop_constraint(cpf_key, type_="unique")
+            if cpf_hash_key is None:
+                batch.create_unique_constraint(f"{table}_cpf_hash_key", ["cpf_hash"])
+
+
+def downgrade():
+    bind = op.get_bind()
+    with op.get_context().autocommit_block():
+        for table in TABLES:
+            _convert(bind, table, lambda t: t.c.cpf_hash.is_not(None),
+                     lambda cpf: {"new_cpf": decrypt_cpf(cpf), "new_hash": None})
+
+    for table in TABLES:
+        cpf_hash_key = _unique_constraint(bind, table, "cpf_hash")
+        with op.batch_alter_table(table, naming_convention=NAMING_CONVENTION) as batch:
+            if cpf_hash_key is not None:
+                batch.drop_constraint(cpf_hash_key, type_="unique")
+            batch.drop_column("cpf_hash")
+            batch.create_unique_constraint(f"{table}_cpf_key", ["cpf"])
@@ -0,0 +1,43 @@
+"""staff directory: version_id, upper-case roles and prefix indexes
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18
+
+Existing rows start at version 1 through the server default. Roles were
+stored as sent, so they are upper-cased to match the directory filter.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+PATTERN_OPS = {"username": "varchar_pattern_ops"}
+INDEXES = {
+    "ix_staff_member_role_username": ["role", "username"],
+    "ix_staff_member_username_pattern": ["username"],
+}
+
+
+def upgrade():
+    bind = op.get_bind()
+    columns = {column["name"] for column in sa.inspect(bind).get_columns("staff_member")}
+    if "version_id" not in columns:
+        op.add_column("staff_member", sa.Column("version_id", sa.Integer(), nullable=False,
+                                                server_default=sa.text("1")))
+    op.execute("UPDATE staff_member SET role = upper(role) WHERE role <> upper(role)")
+
+    indexes = {index["name"] for index in sa.inspect(bind).get_indexes("staff_member")}
+    for name, index_columns in INDEXES.items():
+        if name not in indexes:
+            op.create_index(name, "staff_member", index_columns, postgresql_ops=PATTERN_OPS)
+
+
+def downgrade():
+    for name in INDEXES:
+        op.drop_index(name, table_name="staff_member")
+    op.drop_column("staff_member", "version_id")
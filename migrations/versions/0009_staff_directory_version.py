@@ -0,0 +1,31 @@
+"""staff directory version: one row bumped by every staff write
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18
+
+The staff directory ETag used to aggregate the whole staff_member table on
+every request. It now reads this single row, which the application bumps
+in the same transaction as each staff insert, update or delete.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    version = op.create_table(
+        "staff_directory_version",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("version", sa.Integer(), nullable=False, server_default=sa.text("1")),
+    )
+    op.bulk_insert(version, [{"id": 1, "version": 1}])
+
+
+def downgrade():
+    op.drop_table("staff_directory_version")
@@ -1,5 +1,5 @@
 from sqlalchemy import (
-    Column, Integer, DateTime, Enum, ForeignKey, UniqueConstraint
+    Column, Integer, DateTime, Enum, ForeignKey, Index, UniqueConstraint
 )
 from sqlalchemy.orm import relationship
 from database.database import Base
@@ -13,11 +13,14 @@ class AppointmentStatus(str, enum.Enum):
 class Appointment(Base):
     __tablename__ = "appointment"
     __table_args__ = (
+        # Also serves as the (doctor_id, scheduled_at) index for doctor agendas.
         UniqueConstraint("doctor_id", "scheduled_at", name="uq_doctor_schedule"),
+        Index("ix_appointment_pacient_status_scheduled",
+              "pacient_id", "status", "scheduled_at"),
     )
 
     id = Column(Integer, primary_key=True, index=True)
-    pacient_id = Column(Integer, ForeignKey("pacient.id"), nullable=False)
+    pacient_id = Column(Integer, ForeignKey("pacient.id", ondelete="CASCADE"), nullable=False)
     doctor_id = Column(Integer, ForeignKey("staff_member.id"),   nullable=False)
     scheduled_at = Column(DateTime(timezone=True), nullable=False)
     status = Column(Enum(AppointmentStatus), default=AppointmentStatus.SCHEDULED,
@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Integer, ForeignKey, Index, String, DateTime, JSON, func
+from sqlalchemy.orm import relationship
+from database.database import Base
+
+class PacientChangeSet(Base):
+    __tablename__ = "pacient_change_set"
+    __table_args__ = (
+        Index("ix_pacient_change_set_pacient_changed", "pacient_id", "changed_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    pacient_id = Column(Integer, ForeignKey("pacient.id", ondelete="CASCADE"), nullable=False)
+    # Version the update produced, NULL for change sets converted from the
+    # per-field history; changes maps field -> [old, new].
+    version_id = Column(Integer, nullable=True)
+    changes = Column(JSON, nullable=False)
+    changed_by = Column(String, nullable=False)
+    changed_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    pacient = relationship("Pacient", back_populates="history")
@@ -1,14 +1,17 @@
 from sqlalchemy import (
-    Column, Integer, ForeignKey, String, DateTime, func
+    Column, Integer, ForeignKey, Index, String, DateTime, func
 )
 from sqlalchemy.orm import relationship
 from database.database import Base
 
 class PacientInactivation(Base):
     __tablename__ = "pacient_inactivation"
+    __table_args__ = (
+        Index("ix_pacient_inactivation_pacient_at", "pacient_id", "inactivated_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    pacient_id = Column(Integer, ForeignKey("pacient.id"), nullable=False)
+    pacient_id = Column(Integer, ForeignKey("pacient.id", ondelete="CASCADE"), nullable=False)
     reason = Column(String, nullable=False)
     inactivated_by = Column(String, nullable=False)
     inactivated_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -1,14 +1,22 @@
 from database.database import Base
-from sqlalchemy import Column, Integer, String, text, Boolean
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Index, Integer, String, text, Boolean
+from sqlalchemy.orm import relationship, validates
+from services.cpf_crypto import INDEX_LENGTH, EncryptedCPF, cpf_index
+from services.trigram import normalize_name
 
 class Pacient(Base):
     __tablename__ = "pacient"
+    __table_args__ = (
+        # Lets ETag revalidation answer from the index alone.
+        Index("ix_pacient_id_version", "id", "version_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     full_name = Column(String)
+    normalized_name = Column(String)
     birth_date = Column(String)
-    cpf = Column(String, unique=True)
+    cpf = Column(EncryptedCPF)
+    cpf_hash = Column(String(INDEX_LENGTH), unique=True)
     hashed_password = Column(String)
     gender = Column(String)
     phone_number = Column(String)
@@ -18,9 +26,27 @@ class Pacient(Base):
     known_allergies = Column(String, nullable=True)
     role = Column(String, nullable=False, default="PACIENT", server_default=text("'PACIENT'"))
     version_id = Column(Integer, nullable=False, default=1)
-    history = relationship("PacientHistory", back_populates="pacient")
     is_active = Column(Boolean, nullable=False, default=True, server_default=text("true"))
+    # Children are removed by ON DELETE CASCADE; passive_deletes keeps the
+    # ORM from loading them just to delete them one by one.
+    history = relationship("PacientChangeSet", back_populates="pacient",
+                           cascade="all, delete-orphan", passive_deletes=True)
     inactivations  = relationship("PacientInactivation", back_populates="pacient",
-                                  cascade="all, delete-orphan")
+                                  cascade="all, delete-orphan", passive_deletes=True)
     appointments = relationship(
-        "Appointment", back_populates="pacient", cascade="all, delete-orphan")
+        "Appointment", back_populates="pacient", cascade="all, delete-orphan",
+        passive_deletes=True)
+
+    # Every ORM UPDATE checks and bumps version_id, so concurrent writers
+    # fail with StaleDataError instead of overwriting each other.
+    __mapper_args__ = {"version_id_col": version_id}
+
+    @validates("full_name")
+    def _sync_normalized_name(self, key, value):
+        self.normalized_name = normalize_name(value)
+        return value
+
+    @validates("cpf")
+    def _sync_cpf_hash(self, key, value):
+        self.cpf_hash = cpf_index(value)
+        return value
@@ -1,15 +1,60 @@
 from database.database import Base
-from sqlalchemy import Column, Integer, String
-from sqlalchemy.orm import relationship
+from sqlalchemy import DDL, Column, Index, Integer, String, event, text, update
+from sqlalchemy.orm import relationship, validates
+from services.cpf_crypto import INDEX_LENGTH, EncryptedCPF, cpf_index
 
 
 class Staff(Base):
     __tablename__ = "staff_member"
+    __table_args__ = (
+        # Username prefixes for the staff directory, with or without a role.
+        # The pattern ops keep LIKE 'prefix%' on the index in any locale.
+        Index("ix_staff_member_role_username", "role", "username",
+              postgresql_ops={"username": "varchar_pattern_ops"}),
+        Index("ix_staff_member_username_pattern", "username",
+              postgresql_ops={"username": "varchar_pattern_ops"}),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    cpf = Column(String, unique=True)
+    cpf = Column(EncryptedCPF)
+    cpf_hash = Column(String(INDEX_LENGTH), unique=True)
     username = Column(String, unique=True)
     hashed_password = Column(String)
     role = Column(String)
+    version_id = Column(Integer, nullable=False, default=1, server_default=text("1"))
     appointments = relationship(
-        "Appointment", back_populates="doctor", cascade="all, delete-orphan")
\ No newline at end of file
+        "Appointment", back_populates="doctor", cascade="all, delete-orphan")
+
+    # Bumped on every ORM update, which moves the directory ETag.
+    __mapper_args__ = {"version_id_col": version_id}
+
+    @validates("cpf")
+    def _sync_cpf_hash(self, key, value):
+        self.cpf_hash = cpf_index(value)
+        return value
+
+
+class StaffDirectoryVersion(Base):
+    # A single row whose version moves with every staff insert, update or
+    # delete, so the directory ETag is one primary-key lookup.
+    __tablename__ = "staff_directory_version"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=1, server_default=text("1"))
+
+
+event.listen(StaffDirectoryVersion.__table__, "after_create",
+             DDL("INSERT INTO staff_directory_version (id, version) VALUES (1, 1)"))
+
+
+def _bump_directory_version(mapper, connection, target):
+    # In the writer's transaction, so every worker sees it with the write.
+    connection.execute(
+        update(StaffDirectoryVersion)
+        .where(StaffDirectoryVersion.id == 1)
+        .values(version=StaffDirectoryVersion.version + 1)
+    )
+
+
+for _change in ("after_insert", "after_update", "after_delete"):
+    event.listen(Staff, _change, _bump_directory_version)
@@ -1,35 +1,85 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from datetime import date, datetime, timezone
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import JSONResponse
+from sqlalchemy import and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
 from models.appointment_model import Appointment, AppointmentStatus
-from models.pacient_model import Pacient
-from models.staff_model import Staff
 from schemas.appointment_schema import AppointmentCreate, AppointmentOut
+from schemas.appointment_batch_schema import AppointmentBatchCreate, AppointmentBatchOut
+from schemas.availability_schema import AvailabilityOut
+from services.availability import free_slots
+from services.entity_cache import fetch_pacient, fetch_staff, load_pacient, load_staff
 from services.auth_service import get_current_user
-from typing import Annotated
-from database.database import SessionLocal
+from services.serialization import ORJSONResponse, adapter_response, projection, rows_to_dicts
+from services.query_budget import route_budget
+from services.pagination import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, decode_cursor, split_page
+)
+from typing import Annotated, List, Optional
+from pydantic import TypeAdapter
+from database.database import get_async_db, get_read_db
 
 router = APIRouter(prefix="/appointments", tags=["appointments"])
 
+MAX_AVAILABILITY_DAYS = 31
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# Built once per route; see adapter_response.
+_appointment_adapter = TypeAdapter(AppointmentOut)
+_batch_adapter = TypeAdapter(AppointmentBatchOut)
+_availability_adapter = TypeAdapter(AvailabilityOut)
 
-db_dependency = Annotated[Session, Depends(get_db)]
+
+db_dependency = Annotated[AsyncSession, Depends(get_async_db)]
+read_db_dependency = Annotated[AsyncSession, Depends(get_read_db)]
 user_dependency = Annotated[dict, Depends(get_current_user)]
 
 
+async def _check_pacient_and_doctor(db: AsyncSession, pacient_id: int, doctor_id: int):
+    # A booking is a write: it reads both rows from the primary, never from
+    # a cache that may not have seen another worker's inactivation yet.
+    pacient = await fetch_pacient(db, pacient_id)
+    if not pacient or not pacient["is_active"]:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Paciente não encontrado ou inativo."
+        )
+
+    doctor = await fetch_staff(db, doctor_id)
+    if not doctor or doctor["role"].upper() != "DOCTOR":
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Médico não encontrado."
+        )
+
+
+def _as_utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+async def _taken_slots(db: AsyncSession, doctor_id: int,
+                       slots: List[datetime]) -> List[datetime]:
+    # One lookup on uq_doctor_schedule for the whole batch.
+    taken = await db.scalars(
+        select(Appointment.scheduled_at).where(
+            Appointment.doctor_id == doctor_id,
+            Appointment.scheduled_at.in_(slots)
+        )
+    )
+    taken = {_as_utc(value) for value in taken}
+    return [slot for slot in slots if _as_utc(slot) in taken]
+
+
 @router.post(
     "/schedule-appointment",
     response_model=AppointmentOut,
     status_code=status.HTTP_201_CREATED,
     summary="Agendar nova consulta médica"
 )
-def schedule_appointment(
+@route_budget(4)
+async def schedule_appointment(
     payload: AppointmentCreate,
     current_user: user_dependency,
     db: db_dependency
@@ -40,19 +90,7 @@ def schedule_appointment(
             detail="Permissão insuficiente."
         )
 
-    pacient = db.get(Pacient, payload.pacient_id)
-    if not pacient or not getattr(pacient, "is_active", True):
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Paciente não encontrado ou inativo."
-        )
-
-    doctor = db.get(Staff, payload.doctor_id)
-    if not doctor or doctor.role.upper() != "DOCTOR":
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Médico não encontrado."
-        )
+    await _check_pacient_and_doctor(db, payload.pacient_id, payload.doctor_id)
 
     appt = Appointment(
         pacient_id=payload.pacient_id,
@@ -62,13 +100,207 @@ def schedule_appointment(
     )
     db.add(appt)
     try:
-        db.commit()
-        db.refresh(appt)
+        await db.commit()
+        await db.refresh(appt)
     except IntegrityError:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail="Horário já agendado para este médico."
         )
 
-    return appt
+    return adapter_response(_appointment_adapter, appt, status.HTTP_201_CREATED)
+
+
+def _conflict_response(conflicts: List[datetime]) -> JSONResponse:
+    return JSONResponse(
+        status_code=status.HTTP_409_CONFLICT,
+        content={
+            "detail": "Horários já agendados para este médico.",
+            "conflicts": [slot.isoformat() for slot in conflicts]
+        }
+    )
+
+
+@router.post(
+    "/schedule-batch",
+    response_model=AppointmentBatchOut,
+    status_code=status.HTTP_201_CREATED,
+    summary="Agendar várias consultas ou uma série recorrente"
+)
+@route_budget(4)
+async def schedule_batch(
+    payload: AppointmentBatchCreate,
+    current_user: user_dependency,
+    db: db_dependency
+):
+    if current_user.get("role") != "RECEPCIONISTA":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Permissão insuficiente."
+        )
+
+    await _check_pacient_and_doctor(db, payload.pacient_id, payload.doctor_id)
+
+    slots = payload.all_slots()
+    conflicts = await _taken_slots(db, payload.doctor_id, slots)
+    if conflicts and not payload.skip_conflicts:
+        return _conflict_response(conflicts)
+
+    taken = set(conflicts)
+    appts = [
+        Appointment(
+            pacient_id=payload.pacient_id,
+            doctor_id=payload.doctor_id,
+            scheduled_at=slot,
+            status=AppointmentStatus.SCHEDULED
+        )
+        for slot in slots if slot not in taken
+    ]
+    db.add_all(appts)
+    try:
+        await db.commit()
+    except IntegrityError:
+        # Another booking landed between the check and the insert.
+        await db.rollback()
+        return _conflict_response(await _taken_slots(db, payload.doctor_id, slots))
+
+    return adapter_response(_batch_adapter, {"scheduled": appts, "conflicts": conflicts},
+                            status.HTTP_201_CREATED)
+
+
+@router.get(
+    "/availability",
+    response_model=AvailabilityOut,
+    status_code=status.HTTP_200_OK,
+    summary="Horários livres de um médico"
+)
+@route_budget(2)
+async def doctor_availability(
+    current_user: user_dependency,
+    db: db_dependency,
+    doctor_id: int = Query(..., gt=0),
+    start_date: date = Query(..., description="Primeiro dia (horário da clínica)"),
+    end_date: date = Query(..., description="Último dia, inclusive"),
+    slot_minutes: int = Query(30, ge=5, le=240, description="Duração do horário")
+):
+    if current_user.get("role") not in ("RECEPCIONISTA", "DOCTOR"):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Permissão insuficiente."
+        )
+
+    if end_date < start_date or (end_date - start_date).days >= MAX_AVAILABILITY_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Intervalo inválido: informe até {MAX_AVAILABILITY_DAYS} dias."
+        )
+
+    doctor = await load_staff(db, doctor_id)
+    if not doctor or doctor["role"].upper() != "DOCTOR":
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Médico não encontrado."
+        )
+
+    slots = await free_slots(db, doctor_id, start_date, end_date, slot_minutes)
+    return adapter_response(_availability_adapter, {
+        "doctor_id": doctor_id, "slot_minutes": slot_minutes, "slots": slots})
+
+
+def _agenda_page(query, cursor: Optional[str], limit: int):
+    # Keyset on (scheduled_at, id): both agenda indexes end in scheduled_at.
+    if cursor:
+        last_at, last_id = decode_cursor(cursor, datetime, int)
+        query = query.where(or_(
+            Appointment.scheduled_at > last_at,
+            and_(Appointment.scheduled_at == last_at, Appointment.id > last_id)
+        ))
+    return query.order_by(Appointment.scheduled_at, Appointment.id).limit(limit + 1)
+
+
+async def _list_agenda(db: AsyncSession, query, cursor: Optional[str], limit: int):
+    result = await db.execute(_agenda_page(query, cursor, limit))
+    rows, next_cursor = split_page(result.all(), limit,
+                                   lambda row: (row.scheduled_at, row.id))
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+    return ORJSONResponse(rows_to_dicts(rows, AppointmentOut), headers=headers)
+
+
+@router.get(
+    "/doctor/{doctor_id}",
+    response_model=List[AppointmentOut],
+    status_code=status.HTTP_200_OK,
+    summary="Agenda de um médico por período"
+)
+@route_budget(2)
+async def doctor_agenda(
+    doctor_id: int,
+    current_user: user_dependency,
+    db: read_db_dependency,
+    start: Optional[datetime] = Query(None, description="Início do período, inclusive"),
+    end: Optional[datetime] = Query(None, description="Fim do período, exclusivo"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Tamanho da página"),
+    cursor: Optional[str] = Query(None, description=f"Valor do cabeçalho {NEXT_CURSOR_HEADER} da página anterior")
+):
+    if current_user.get("role") not in ("RECEPCIONISTA", "DOCTOR"):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Permissão insuficiente."
+        )
+
+    if start and end and end <= start:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Intervalo inválido: end deve ser posterior a start."
+        )
+
+    doctor = await load_staff(db, doctor_id)
+    if not doctor or doctor["role"].upper() != "DOCTOR":
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Médico não encontrado."
+        )
+
+    query = select(*projection(Appointment, AppointmentOut)).where(Appointment.doctor_id == doctor_id)
+    if start:
+        query = query.where(Appointment.scheduled_at >= _as_utc(start))
+    if end:
+        query = query.where(Appointment.scheduled_at < _as_utc(end))
+    return await _list_agenda(db, query, cursor, limit)
+
+
+@router.get(
+    "/patient/{pacient_id}",
+    response_model=List[AppointmentOut],
+    status_code=status.HTTP_200_OK,
+    summary="Consultas de um paciente por status"
+)
+@route_budget(2)
+async def pacient_appointments(
+    pacient_id: int,
+    current_user: user_dependency,
+    db: read_db_dependency,
+    appointment_status: Optional[AppointmentStatus] = Query(None, alias="status", description="Filtrar por status"),
+    upcoming: bool = Query(False, description="Somente consultas futuras"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Tamanho da página"),
+    cursor: Optional[str] = Query(None, description=f"Valor do cabeçalho {NEXT_CURSOR_HEADER} da página anterior")
+):
+    if current_user.get("role") not in ("RECEPCIONISTA", "DOCTOR"):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Permissão insuficiente."
+        )
+
+    if not await load_pacient(db, pacient_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Paciente não encontrado."
+        )
+
+    query = select(*projection(Appointment, AppointmentOut)).where(Appointment.pacient_id == pacient_id)
+    if appointment_status:
+        query = query.where(Appointment.status == appointment_status)
+    if upcoming:
+        query = query.where(Appointment.scheduled_at >= datetime.now(timezone.utc))
+    return await _list_agenda(db, query, cursor, limit)
@@ -1,20 +1,44 @@
 from typing import Annotated, List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Path, Response, Query, Body
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, Header, HTTPException, Path, Response, Query, Body, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from models.pacient_model import Pacient
-from database.database import SessionLocal
-from sqlalchemy.orm import Session
+from database.database import get_async_db, get_read_db
+from sqlalchemy import and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.exc import StaleDataError
 from starlette import status
-from services.auth_service import get_current_user
-from services.auth_service import bcrypt_context
+from services.auth_service import get_current_user, revoke_user_tokens
+from services.password_hasher import password_hasher
 from schemas.pacient_schema import PacientSchema
 from schemas.pacient_output import PacientOutput
-from models.pacient_history_model import PacientHistory
+from models.pacient_change_set_model import PacientChangeSet
 from models.pacient_inactivation_model import PacientInactivation
 from models.appointment_model import Appointment
 from models.appointment_model import AppointmentStatus
 from schemas.update_pacient_schema import UpdatePacient
 from schemas.inactivation_reason_schema import InactivationReason
+from services.name_search import search_by_name
+from services import pacient_import, pacient_purge
+from services.availability import queue_invalidations
+from services.cpf_crypto import cpf_index
+from services.entity_cache import (
+    PACIENT, entity_cache, fetch_pacient, load_current_pacient, load_current_pacient_by_cpf,
+    load_pacient, pacient_output
+)
+from services.etag import etag_matches, make_etag, version_from_etag
+from services.serialization import (
+    ORJSONResponse, adapter_response, dump_line, projection, rows_to_dicts
+)
+from schemas.import_report import ImportReport
+from schemas.inactivation_output import InactivationOut
+from schemas.pacient_history_schema import PacientChangeSetOut
+from datetime import datetime
+from pydantic import TypeAdapter
+from services.query_budget import route_budget
+from services.pagination import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, decode_cursor, encode_cursor,
+    split_page
+)
 
 router = APIRouter(
     prefix="/patients",
@@ -22,27 +46,55 @@ router = APIRouter(
 )
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+db_dependency = Annotated[AsyncSession, Depends(get_async_db)]
+read_db_dependency = Annotated[AsyncSession, Depends(get_read_db)]
+user_dependency = Annotated[dict, Depends(get_current_user)]
 
+STREAM_BATCH_SIZE = 1000
+
+# Built once per route; see adapter_response.
+_import_report_adapter = TypeAdapter(ImportReport)
+_inactivation_adapter = TypeAdapter(InactivationOut)
+
+
+async def _search_query(db: AsyncSession, id: Optional[int], cpf: Optional[str],
+                        name: Optional[str], cursor: Optional[str], limit: int):
+    # Rows are the PacientOutput columns (plus ranking columns for name
+    # searches), at most `limit` of them; the returned function extracts
+    # the keyset cursor values.
+    query = select(*projection(Pacient, PacientOutput))
+
+    filters = []
+    if id is not None:
+        filters.append(Pacient.id == id)
+    if cpf is not None:
+        filters.append(Pacient.cpf_hash == cpf_index(cpf))
+
+    if name is not None:
+        after = decode_cursor(cursor, float, float, int) if cursor else None
+        query = await search_by_name(query, db, name, limit, after=after, where=filters)
+        return query, lambda row: [row.score, row.tiebreak, row.id]
+
+    query = query.where(*filters)
+    if cursor:
+        last_id, = decode_cursor(cursor, int)
+        query = query.where(Pacient.id > last_id)
+    return query.order_by(Pacient.id).limit(limit), lambda row: [row.id]
 
-db_dependency = Annotated[Session, Depends(get_db)]
-user_dependency = Annotated[dict, Depends(get_current_user)]
 
 @router.get("/search-patient", response_model=List[PacientOutput],
             status_code=status.HTTP_200_OK,
             summary="Buscar pacientes por ID, CPF ou nome")
-def search_pacients(
+@route_budget(3)
+async def search_pacients(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: dict = Depends(get_current_user),
     id: Optional[int] = Query(None, gt=0, description="Id do paciente"),
     cpf: Optional[str] = Query(None, min_length=11, max_length=14, description="CPF com ou sem formatação"),
     name: Optional[str] = Query(None, min_length=3, description="Parte ou nome completo do paciente"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Tamanho da página"),
+    cursor: Optional[str] = Query(None, description=f"Valor do cabeçalho {NEXT_CURSOR_HEADER} da página anterior"),
 ):
     
     if current_user.get("role") not in ("RECEPCIONISTA", "DOCTOR"):
@@ -51,33 +103,86 @@ def search_pacients(
             detail="Permissão insuficiente para acessar este método."
     )
 
-    query = db.query(Pacient)
+    if name is None and cursor is None and (id is not None or cpf is not None):
+        # An exact lookup matches one row at most: answer it from the cache.
+        if id is not None:
+            pacient = await load_current_pacient(db, id)
+        else:
+            pacient = await load_current_pacient_by_cpf(db, cpf)
+        if pacient and cpf is not None and pacient["cpf_hash"] != cpf_index(cpf):
+            pacient = None
+        if not pacient:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Nenhum paciente encontrado."
+            )
+        return ORJSONResponse([pacient_output(pacient)])
 
+    query, cursor_of = await _search_query(db, id, cpf, name, cursor, limit + 1)
+    result = await db.execute(query)
+    rows, next_cursor = split_page(result.all(), limit, cursor_of)
 
-    if id is not None:
-        query = query.filter(Pacient.id == id)
-    if cpf is not None:
-        from re import sub
-        raw_cpf = sub(r"\D", "", cpf)
-        query = query.filter(Pacient.cpf == raw_cpf)
-    if name is not None:
-        query = query.filter(Pacient.full_name.ilike(f"%{name}%"))
+    if not rows:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Nenhum paciente encontrado."
+        )
+
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+    return ORJSONResponse(rows_to_dicts(rows, PacientOutput), headers=headers)
 
-    results = query.all()
 
-    if not results:
+@router.get("/search-patient/stream",
+            status_code=status.HTTP_200_OK,
+            response_class=StreamingResponse,
+            summary="Buscar pacientes por ID, CPF ou nome em NDJSON")
+async def stream_pacients(
+    *,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: dict = Depends(get_current_user),
+    id: Optional[int] = Query(None, gt=0, description="Id do paciente"),
+    cpf: Optional[str] = Query(None, min_length=11, max_length=14, description="CPF com ou sem formatação"),
+    name: Optional[str] = Query(None, min_length=3, description="Parte ou nome completo do paciente"),
+):
+    if current_user.get("role") not in ("RECEPCIONISTA", "DOCTOR"):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Permissão insuficiente para acessar este método."
+        )
+
+    # Walked a page at a time with the same keyset as /search-patient, so
+    # every match is streamed whichever search backend answers.
+    async def page(cursor):
+        query, cursor_of = await _search_query(db, id, cpf, name, cursor, STREAM_BATCH_SIZE)
+        rows = (await db.execute(query)).all()
+        if len(rows) < STREAM_BATCH_SIZE:
+            return rows, None
+        return rows, encode_cursor(cursor_of(rows[-1]))
+
+    first, cursor = await page(None)
+    if not first:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Nenhum paciente encontrado."
         )
 
-    return results
+    async def lines():
+        rows, next_cursor = first, cursor
+        while True:
+            for row in rows:
+                yield dump_line(row, PacientOutput)
+            if next_cursor is None:
+                return
+            rows, next_cursor = await page(next_cursor)
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
 
 
 @router.post("/add-new-patient",
              status_code=status.HTTP_201_CREATED,
              response_model=None,
              summary="Cria um novo paciente")
+@route_budget(3)
 async def add_pacient(db: db_dependency, 
                       create_pacient_request: PacientSchema, current_user: dict = Depends(get_current_user)):
 
@@ -88,10 +193,10 @@ async def add_pacient(db: db_dependency,
     )
 
 
-    existing = (
-        db.query(Pacient)
-          .filter(Pacient.cpf == create_pacient_request.cpf)
-          .first()
+    existing = await db.scalar(
+        select(Pacient.id)
+          .where(Pacient.cpf_hash == cpf_index(create_pacient_request.cpf))
+          .limit(1)
     )
     if existing:
         raise HTTPException(
@@ -103,7 +208,7 @@ async def add_pacient(db: db_dependency,
         full_name=create_pacient_request.full_name,
         birth_date=create_pacient_request.birth_date,
         cpf=create_pacient_request.cpf,
-        hashed_password=bcrypt_context.hash(create_pacient_request.hashed_password),
+        hashed_password=await password_hasher.hash(create_pacient_request.hashed_password),
         gender=create_pacient_request.gender,
         phone_number=create_pacient_request.phone_number,
         address=create_pacient_request.address,
@@ -113,8 +218,8 @@ async def add_pacient(db: db_dependency,
     )
 
     db.add(pacient)
-    db.commit()
-    db.refresh(pacient)
+    await db.commit()
+    await db.refresh(pacient)
 
     return JSONResponse(
         status_code=status.HTTP_201_CREATED,
@@ -122,16 +227,47 @@ async def add_pacient(db: db_dependency,
     )
 
 
+@router.post("/import-patients",
+             status_code=status.HTTP_200_OK,
+             response_model=ImportReport,
+             summary="Importa pacientes em lote a partir de CSV ou NDJSON")
+async def import_pacients(request: Request, db: db_dependency,
+                          current_user: dict = Depends(get_current_user)):
+
+    if current_user.get("role") != "RECEPCIONISTA":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Permissão insuficiente para acessar este método."
+        )
+
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    lines = pacient_import.iter_lines(request.stream())
+    if content_type in pacient_import.CSV_TYPES:
+        rows = pacient_import.iter_csv_rows(lines)
+    elif content_type in pacient_import.NDJSON_TYPES:
+        rows = pacient_import.iter_ndjson_rows(lines)
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Formato não suportado. Envie text/csv ou application/x-ndjson."
+        )
+
+    return adapter_response(_import_report_adapter,
+                            await pacient_import.import_pacients(db, rows))
+
+
 @router.patch(
     "/update-patient/{pacient_id}",
     status_code=status.HTTP_200_OK,
     summary="Atualiza dados cadastrais de um paciente."  
 )
-def update_pacient(
+@route_budget(3)
+async def update_pacient(
     *,
     pacient_id: int = Path(..., gt=0),
     payload: UpdatePacient,
-    db: Session = Depends(get_db),
+    if_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_user)
 ):
     if current_user.get("role") != "RECEPCIONISTA":
@@ -142,55 +278,128 @@ def update_pacient(
     
     data = payload.model_dump()
 
-    pacient = db.get(Pacient, pacient_id)
+    # If-Match carries the version as an ETag; a stale one is a failed
+    # precondition (412) rather than the body's 409. "*" skips the check.
+    if if_match:
+        expected = version_from_etag(if_match, pacient_id)
+        stale_status = status.HTTP_412_PRECONDITION_FAILED
+    else:
+        expected = data["version_id"]
+        stale_status = status.HTTP_409_CONFLICT
+    if expected is None and not if_match:
+        raise HTTPException(
+            status_code=status.HTTP_428_PRECONDITION_REQUIRED,
+            detail="Informe version_id ou o cabeçalho If-Match."
+        )
+
+    pacient = await db.get(Pacient, pacient_id)
     if not pacient:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Paciente não encontrado."
         )
 
-    if data["version_id"] != pacient.version_id:
+    if expected is not None and expected != pacient.version_id:
         raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT,
+            status_code=stale_status,
             detail="Dados desatualizados: atualize a tela e tente novamente"
         )
 
     new_data = payload.model_dump()
     new_data.pop("version_id", None)
+    changes = {}
     for field, new_value in new_data.items():
         old_value = getattr(pacient, field)
         if new_value != old_value:
-            hist = PacientHistory(
-                pacient_id=pacient.id,
-                field_name=field,
-                old_value=str(old_value) if old_value is not None else None,
-                new_value=str(new_value),
-                changed_by=current_user.get("username")
-            )
-            db.add(hist)
+            changes[field] = [old_value, new_value]
             setattr(pacient, field, new_value)
 
-    pacient.version_id += 1
-    db.commit()
-    db.refresh(pacient)
+    if changes:
+        # version_id_col turns the flush into a single
+        # UPDATE ... WHERE id = ? AND version_id = ?; zero rows means another
+        # writer got there first.
+        try:
+            await db.flush()
+        except StaleDataError:
+            await db.rollback()
+            raise HTTPException(
+                status_code=stale_status,
+                detail="Dados desatualizados: atualize a tela e tente novamente"
+            )
+        db.add(PacientChangeSet(
+            pacient_id=pacient.id,
+            version_id=pacient.version_id,
+            changes=changes,
+            changed_by=current_user.get("username")
+        ))
+        await db.commit()
 
     return JSONResponse(
         status_code=status.HTTP_200_OK,
-        content={"message": "Usuário atualizado com sucesso."}
+        content={"message": "Usuário atualizado com sucesso.",
+                 "version_id": pacient.version_id},
+        headers={"ETag": make_etag(pacient.id, pacient.version_id)}
     )
 
 
+@router.get(
+    "/patient-history/{pacient_id}",
+    response_model=List[PacientChangeSetOut],
+    status_code=status.HTTP_200_OK,
+    summary="Histórico de alterações cadastrais de um paciente"
+)
+@route_budget(2)
+async def pacient_history(
+    *,
+    pacient_id: int = Path(..., gt=0),
+    db: read_db_dependency,
+    current_user: user_dependency,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Tamanho da página"),
+    cursor: Optional[str] = Query(None, description=f"Valor do cabeçalho {NEXT_CURSOR_HEADER} da página anterior")
+):
+    if current_user.get("role") not in ("RECEPCIONISTA", "ADM"):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Permissão insuficiente."
+        )
+
+    if not await load_pacient(db, pacient_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Paciente não encontrado."
+        )
+
+    # Newest first, keyset on (changed_at, id).
+    query = (select(*projection(PacientChangeSet, PacientChangeSetOut))
+             .where(PacientChangeSet.pacient_id == pacient_id))
+    if cursor:
+        last_at, last_id = decode_cursor(cursor, datetime, int)
+        query = query.where(or_(
+            PacientChangeSet.changed_at < last_at,
+            and_(PacientChangeSet.changed_at == last_at, PacientChangeSet.id < last_id)
+        ))
+    result = await db.execute(
+        query.order_by(PacientChangeSet.changed_at.desc(), PacientChangeSet.id.desc())
+             .limit(limit + 1)
+    )
+    rows, next_cursor = split_page(result.all(), limit,
+                                   lambda row: (row.changed_at, row.id))
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+    return ORJSONResponse(rows_to_dicts(rows, PacientChangeSetOut), headers=headers)
+
+
 @router.post(
     "/inactivate-patient/{pacient_id}",
-    response_model=None,
+    response_model=InactivationOut,
     status_code=status.HTTP_200_OK,
     summary="Inativa logicamente um cadastro de paciente"
 )
-def inactivate_pacient(
+@route_budget(5)
+async def inactivate_pacient(
     *,
     pacient_id: int = Path(..., gt=0),
     payload: InactivationReason,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_user)
 ):
     if current_user.get("role") not in ("RECEPCIONISTA", "ADM"):
@@ -201,20 +410,20 @@ def inactivate_pacient(
     
     data = payload.model_dump()
 
-    pacient = db.get(Pacient, pacient_id)
+    pacient = await db.get(Pacient, pacient_id)
     if not pacient or not pacient.is_active:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Paciente não encontrado ou já inativo."
         )
 
-    pendente = (
-        db.query(Appointment)
-          .filter(
+    pendente = await db.scalar(
+        select(Appointment.id)
+          .where(
              Appointment.pacient_id == pacient_id,
              Appointment.status == AppointmentStatus.SCHEDULED
           )
-          .first()
+          .limit(1)
     )
     if pendente:
         raise HTTPException(
@@ -229,25 +438,34 @@ def inactivate_pacient(
         inactivated_by=current_user.get("username")
     )
     db.add(hist)
-    db.commit()
-    db.refresh(hist)
+    try:
+        await db.commit()
+    except StaleDataError:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Dados desatualizados: atualize a tela e tente novamente"
+        )
+    revoke_user_tokens(pacient.cpf)
+    await db.refresh(hist)
 
-    return {
+    return adapter_response(_inactivation_adapter, {
         "pacient_id": pacient.id,
         "was_active": True,
         "inactivated_at": hist.inactivated_at.isoformat(),
         "inactivated_by": hist.inactivated_by,
         "reason": hist.reason
-    }
+    })
 
 
 
 @router.delete("/delete-patient/{pacient_id}",
                status_code=status.HTTP_204_NO_CONTENT,
                summary="Deleta um paciente pelo ID")
+@route_budget(3)
 async def delete_pacient(db: db_dependency, pacient_id: int = Path(gt=0)):
     
-    pacient = db.query(Pacient).get(pacient_id)
+    pacient = await db.get(Pacient, pacient_id)
     
     if not pacient:
         raise HTTPException(
@@ -255,7 +473,80 @@ async def delete_pacient(db: db_dependency, pacient_id: int = Path(gt=0)):
             detail="Paciente não encontrado."
         )
 
-    db.delete(pacient)
-    db.commit()
+    queue_invalidations(db, await pacient_purge.doctor_ids_for_pacients(db, [pacient_id]))
+    cpf = pacient.cpf
+    await db.delete(pacient)
+    await db.commit()
+    revoke_user_tokens(cpf)
+
+    return Response(status_code=status.HTTP_200_OK)
 
-    return Response(status_code=status.HTTP_200_OK)
\ No newline at end of file
+
+@router.post("/purge-inactive",
+             status_code=status.HTTP_200_OK,
+             summary="Remove pacientes inativos além do prazo de retenção (LGPD)")
+async def purge_inactive_pacients(
+    db: db_dependency,
+    current_user: user_dependency,
+    retention_days: int = Query(pacient_purge.RETENTION_DAYS, ge=1,
+                                description="Dias desde a inativação")
+):
+    if current_user.get("role") != "ADM":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Permissão insuficiente."
+        )
+
+    purged = await pacient_purge.purge_inactive_pacients(db, retention_days)
+    return {"purged": purged}
+
+
+# Declared last: the int convertor keeps it from shadowing the other routes.
+@router.get("/{pacient_id:int}",
+            response_model=PacientOutput,
+            status_code=status.HTTP_200_OK,
+            summary="Busca um paciente pelo ID, com suporte a ETag")
+@route_budget(1)
+async def get_pacient(
+    pacient_id: int,
+    db: read_db_dependency,
+    current_user: user_dependency,
+    if_none_match: Optional[str] = Header(None)
+):
+    if current_user.get("role") not in ("RECEPCIONISTA", "DOCTOR"):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Permissão insuficiente para acessar este método."
+        )
+
+    cached = entity_cache.get(PACIENT, pacient_id)
+    if cached is not None or if_none_match:
+        # Revalidation, and trusting a cached row, read only (id, version_id),
+        # covered by ix_pacient_id_version: every worker's writes show there.
+        version_id = await db.scalar(
+            select(Pacient.version_id).where(Pacient.id == pacient_id)
+        )
+        if version_id is None:
+            entity_cache.evict(PACIENT, pacient_id)
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Paciente não encontrado."
+            )
+        etag = make_etag(pacient_id, version_id)
+        if if_none_match and etag_matches(if_none_match, etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED,
+                            headers={"ETag": etag})
+        if cached is not None and cached["version_id"] == version_id:
+            return ORJSONResponse(pacient_output(cached), headers={"ETag": etag})
+
+    pacient = await fetch_pacient(db, pacient_id)
+    if not pacient:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Paciente não encontrado."
+        )
+
+    return ORJSONResponse(
+        pacient_output(pacient),
+        headers={"ETag": make_etag(pacient_id, pacient["version_id"])}
+    )
@@ -0,0 +1,48 @@
+from pydantic import BaseModel, Field, model_validator
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+from schemas.appointment_schema import AppointmentOut
+
+MAX_BATCH_SLOTS = 100
+
+class Recurrence(BaseModel):
+    start: datetime = Field(..., description="Primeira consulta (UTC)")
+    interval_days: int = Field(7, ge=1, le=365, description="Dias entre as consultas")
+    count: int = Field(..., ge=1, le=MAX_BATCH_SLOTS, description="Número de consultas")
+
+    def occurrences(self) -> List[datetime]:
+        return [self.start + timedelta(days=self.interval_days * i)
+                for i in range(self.count)]
+
+class AppointmentBatchCreate(BaseModel):
+    pacient_id: int = Field(..., gt=0)
+    doctor_id:  int = Field(..., gt=0)
+    slots: List[datetime] = Field(default_factory=list, max_length=MAX_BATCH_SLOTS)
+    recurrence: Optional[Recurrence] = None
+    skip_conflicts: bool = Field(False, description="Agenda os horários livres e "
+                                                    "apenas relata os conflitantes")
+
+    @model_validator(mode="after")
+    def check_slots(self):
+        slots = self.all_slots()
+        if not slots:
+            raise ValueError("Informe slots ou recurrence")
+        if len(slots) > MAX_BATCH_SLOTS:
+            raise ValueError(f"No máximo {MAX_BATCH_SLOTS} consultas por lote")
+        if len(set(slots)) != len(slots):
+            raise ValueError("Horários repetidos no lote")
+        agora_utc = datetime.now(timezone.utc)
+        if any(slot <= agora_utc for slot in slots):
+            raise ValueError("Todos os horários devem ser datas futuras")
+        return self
+
+    def all_slots(self) -> List[datetime]:
+        slots = list(self.slots)
+        if self.recurrence is not None:
+            slots.extend(self.recurrence.occurrences())
+        return sorted(slot if slot.tzinfo else slot.replace(tzinfo=timezone.utc)
+                      for slot in slots)
+
+class AppointmentBatchOut(BaseModel):
+    scheduled: List[AppointmentOut]
+    conflicts: List[datetime]
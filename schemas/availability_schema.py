@@ -0,0 +1,8 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import List
+
+class AvailabilityOut(BaseModel):
+    doctor_id: int
+    slot_minutes: int
+    slots: List[datetime]
@@ -0,0 +1,12 @@
+from pydantic import BaseModel
+from typing import List, Optional
+
+class ImportRowError(BaseModel):
+    row: int
+    cpf: Optional[str] = None
+    detail: str
+
+class ImportReport(BaseModel):
+    imported: int
+    failed: int
+    errors: List[ImportRowError]
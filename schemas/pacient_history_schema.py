@@ -0,0 +1,11 @@
+from datetime import datetime
+from typing import Dict, List, Optional
+from pydantic import BaseModel
+
+
+class PacientChangeSetOut(BaseModel):
+    id: int
+    version_id: Optional[int]
+    changes: Dict[str, List[Optional[str]]]
+    changed_by: str
+    changed_at: datetime
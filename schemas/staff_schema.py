@@ -1,8 +1,21 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 
 
 class StaffSchema(BaseModel):
     username: str = Field(min_length=5, max_length=100)
     hashed_password: str = Field(min_length=6, max_length=30)
     cpf: str = Field(min_length=11, max_length=11)
-    role: str = Field(min_length=3, max_length=15)
\ No newline at end of file
+    role: str = Field(min_length=3, max_length=15)
+
+    @field_validator("role", mode="after")
+    @classmethod
+    def upper_role(cls, v):
+        # Roles are compared as stored: "doctor" must be saved as DOCTOR.
+        return v.strip().upper()
+
+
+class StaffOut(BaseModel):
+    # The public directory entry: never the CPF or the password hash.
+    id: int
+    username: str
+    role: str
@@ -7,4 +7,4 @@ class UpdatePacient(BaseModel):
     phone_number: str = Field(min_length=11, max_length=11)
     address: str = Field(min_length=5, max_length=60)
     email: Optional[str] = None
-    version_id: int  = Field(description="Version control")
\ No newline at end of file
+    version_id: Optional[int] = Field(None, description="Version control; alternativa ao cabeçalho If-Match")
\ No newline at end of file
@@ -1,7 +1,7 @@
-from passlib.context import CryptContext
-from database.database import SessionLocal
+from database.database import get_async_db
 from typing import Annotated
-from sqlalchemy.orm import Session
+from sqlalchemy import literal, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import Depends, HTTPException
 from models.pacient_model import Pacient
 from datetime import datetime, timedelta, timezone
@@ -10,37 +10,59 @@ from jose import jwt, JWTError
 from fastapi.security import OAuth2PasswordBearer
 from starlette import status
 from models.staff_model import Staff
+from services.cpf_crypto import cpf_index
+from services.password_hasher import password_hasher
+from services.token_cache import token_cache
 import os
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 load_dotenv()
 
 secret_key = os.getenv("SECRET_KEY")
 algorithm = os.getenv("ALGORITHM")
 
 
-db_dependency = Annotated[Session, Depends(get_db)]
+db_dependency = Annotated[AsyncSession, Depends(get_async_db)]
 oauth2_bearer = OAuth2PasswordBearer(tokenUrl="auth/login")
-bcrypt_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-
-def authenticate_user(cpf: str, password: str, db: db_dependency):
-    staff = db.query(Staff).filter(Staff.cpf == cpf).first()
-    if staff and bcrypt_context.verify(password, staff.hashed_password):
-        return staff
-    
-    patient = db.query(Pacient).filter(Pacient.cpf == cpf).first()
-    if patient and bcrypt_context.verify(password, patient.hashed_password):
-        return patient
-    
+
+# Verified instead of a real hash when the CPF is unknown, so every login
+# attempt costs exactly one bcrypt verification.
+DUMMY_HASH = "$2b$12$nG71Mq9ixRg8cIwSJFT04eGUcX.JY2xujabAkuSIvjXwrwNOFj.3."
+ACCESS_TOKEN_LIFETIME = timedelta(minutes=30)
+
+
+def credential_lookup(cpf: str):
+    # Both branches are unique-index lookups on the CPF blind index, sent as
+    # one statement. Staff accounts take precedence when a CPF is in both.
+    digest = cpf_index(cpf)
+    staff = select(
+        literal("STAFF").label("principal_type"),
+        literal(0).label("precedence"),
+        Staff.id, Staff.cpf, Staff.role, Staff.username, Staff.hashed_password
+    ).where(Staff.cpf_hash == digest)
+    pacient = select(
+        literal("PACIENT").label("principal_type"),
+        literal(1).label("precedence"),
+        Pacient.id, Pacient.cpf, Pacient.role,
+        Pacient.full_name.label("username"), Pacient.hashed_password
+    ).where(Pacient.cpf_hash == digest)
+
+    credentials = union_all(staff, pacient).subquery("credentials")
+    return (
+        select(credentials)
+        .order_by(credentials.c.precedence)
+        .limit(1)
+    )
+
+
+async def authenticate_user(cpf: str, password: str, db: db_dependency):
+    principal = (await db.execute(credential_lookup(cpf))).first()
+    hashed_password = principal.hashed_password if principal else None
+
+    valid = await password_hasher.verify(password, hashed_password or DUMMY_HASH)
+    if principal and hashed_password and valid:
+        return principal
+
     return False
 
 
@@ -48,12 +70,17 @@ def create_access_token(cpf: str, role: str,
                         user_id: str, username: str,
                         expires_delta: timedelta):
     encode = {"sub": cpf, "id": user_id, "role": role, "username": username}
-    expires = datetime.now(timezone.utc) + expires_delta
-    encode.update({"exp": expires})
+    issued_at = datetime.now(timezone.utc)
+    expires = issued_at + expires_delta
+    encode.update({"exp": expires, "iat": issued_at})
     return jwt.encode(encode, secret_key, algorithm=algorithm)
 
 
 async def get_current_user(token: Annotated[str, Depends(oauth2_bearer)]):
+    cached = token_cache.get(token)
+    if cached is not None:
+        return cached
+
     try:
         payload = jwt.decode(token, secret_key, algorithms=algorithm)
         cpf: str = payload.get("sub")
@@ -64,8 +91,29 @@ async def get_current_user(token: Annotated[str, Depends(oauth2_bearer)]):
         if cpf is None or user_id is None:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
                                 detail="Could not validate user.")
-
-        return {"cpf": cpf, "id": user_id, "role": role, "username": username}
     except JWTError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
-                            detail="Could not validate user.")
\ No newline at end of file
+                            detail="Could not validate user.")
+
+    if token_cache.is_revoked(token, cpf, payload.get("iat")):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
+                            detail="Could not validate user.")
+
+    user = {"cpf": cpf, "id": user_id, "role": role, "username": username}
+    if payload.get("exp") is not None:
+        token_cache.put(token, user, payload["exp"])
+    return user
+
+
+def revoke_token(token: str):
+    try:
+        payload = jwt.decode(token, secret_key, algorithms=algorithm)
+    except JWTError:
+        return
+    token_cache.revoke(token, payload.get("exp") or 0)
+
+
+def revoke_user_tokens(cpf: str):
+    # Every token issued so far expires within ACCESS_TOKEN_LIFETIME.
+    forget_at = (datetime.now(timezone.utc) + ACCESS_TOKEN_LIFETIME).timestamp()
+    token_cache.revoke_subject(cpf, forget_at)
\ No newline at end of file
@@ -0,0 +1,185 @@
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, time as dtime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, object_session
+from models.appointment_model import Appointment, AppointmentStatus
+
+
+CLINIC_TIMEZONE = ZoneInfo(os.getenv("CLINIC_TIMEZONE", "America/Sao_Paulo"))
+OPENS_AT = dtime.fromisoformat(os.getenv("CLINIC_OPENS_AT", "08:00"))
+CLOSES_AT = dtime.fromisoformat(os.getenv("CLINIC_CLOSES_AT", "18:00"))
+APPOINTMENT_LENGTH = timedelta(minutes=int(os.getenv("APPOINTMENT_MINUTES", "30")))
+INDEX_TTL = float(os.getenv("AVAILABILITY_TTL", "60"))
+
+_PENDING_KEY = "availability_pending"
+
+
+def _as_utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def clinic_day(value: datetime) -> date:
+    return _as_utc(value).astimezone(CLINIC_TIMEZONE).date()
+
+
+def day_bounds(day: date) -> Tuple[datetime, datetime]:
+    start = datetime.combine(day, dtime.min, CLINIC_TIMEZONE)
+    end = datetime.combine(day + timedelta(days=1), dtime.min, CLINIC_TIMEZONE)
+    return start.astimezone(timezone.utc), end.astimezone(timezone.utc)
+
+
+class _Day:
+    __slots__ = ("loaded_at", "starts", "cancelled")
+
+    def __init__(self):
+        self.loaded_at = time.monotonic()
+        self.starts: List[datetime] = []
+        self.cancelled: List[bool] = []
+
+    def add(self, start: datetime, cancelled: bool):
+        index = bisect_right(self.starts, start)
+        self.starts.insert(index, start)
+        self.cancelled.insert(index, cancelled)
+
+    def blocks(self, slot_start: datetime, slot_end: datetime) -> bool:
+        # Any live appointment overlapping the slot blocks it; a cancelled one
+        # only blocks its exact start, which uq_doctor_schedule still holds.
+        lo = bisect_right(self.starts, slot_start - APPOINTMENT_LENGTH)
+        hi = bisect_left(self.starts, slot_end)
+        for i in range(lo, hi):
+            if not self.cancelled[i] or self.starts[i] == slot_start:
+                return True
+        return False
+
+
+class AvailabilityIndex:
+    def __init__(self, ttl: float = INDEX_TTL):
+        self.ttl = ttl
+        self._days: Dict[Tuple[int, date], _Day] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._days)
+
+    def missing_days(self, doctor_id: int, days: Iterable[date]) -> List[date]:
+        now = time.monotonic()
+        with self._lock:
+            return [day for day in days
+                    if (entry := self._days.get((doctor_id, day))) is None
+                    or now - entry.loaded_at > self.ttl]
+
+    def fill(self, doctor_id: int, days: Iterable[date], rows):
+        loaded = {day: _Day() for day in days}
+        for scheduled_at, status in rows:
+            entry = loaded.get(clinic_day(scheduled_at))
+            if entry is not None:
+                entry.add(_as_utc(scheduled_at), status == AppointmentStatus.CANCELLED)
+        with self._lock:
+            for day, entry in loaded.items():
+                self._days[(doctor_id, day)] = entry
+
+    def day(self, doctor_id: int, day: date) -> _Day:
+        with self._lock:
+            return self._days.get((doctor_id, day)) or _Day()
+
+    def add(self, doctor_id: int, scheduled_at: datetime, cancelled: bool = False):
+        with self._lock:
+            entry = self._days.get((doctor_id, clinic_day(scheduled_at)))
+            if entry is not None:
+                entry.add(_as_utc(scheduled_at), cancelled)
+
+    def invalidate(self, doctor_id: int, day: Optional[date] = None):
+        with self._lock:
+            if day is not None:
+                self._days.pop((doctor_id, day), None)
+                return
+            for key in [key for key in self._days if key[0] == doctor_id]:
+                del self._days[key]
+
+    def clear(self):
+        with self._lock:
+            self._days.clear()
+
+
+availability_index = AvailabilityIndex()
+
+
+async def free_slots(db: AsyncSession, doctor_id: int, first_day: date,
+                     last_day: date, slot_minutes: int) -> List[datetime]:
+    days = [first_day + timedelta(days=i) for i in range((last_day - first_day).days + 1)]
+
+    missing = availability_index.missing_days(doctor_id, days)
+    if missing:
+        # One range scan over (doctor_id, scheduled_at) for every stale day.
+        start, _ = day_bounds(min(missing))
+        _, end = day_bounds(max(missing))
+        rows = await db.execute(
+            select(Appointment.scheduled_at, Appointment.status).where(
+                Appointment.doctor_id == doctor_id,
+                Appointment.scheduled_at >= start,
+                Appointment.scheduled_at < end
+            )
+        )
+        availability_index.fill(doctor_id, missing, rows.all())
+
+    slot = timedelta(minutes=slot_minutes)
+    now = datetime.now(timezone.utc)
+    free = []
+    for day in days:
+        booked = availability_index.day(doctor_id, day)
+        current = datetime.combine(day, OPENS_AT, CLINIC_TIMEZONE).astimezone(timezone.utc)
+        closing = datetime.combine(day, CLOSES_AT, CLINIC_TIMEZONE).astimezone(timezone.utc)
+        while current + slot <= closing:
+            if current > now and not booked.blocks(current, current + slot):
+                free.append(current)
+            current += slot
+    return free
+
+
+# Same commit-time bookkeeping as the name index: nothing reaches the index
+# unless the transaction that wrote it commits.
+def queue_invalidations(session, doctor_ids: Iterable[int]):
+    # For deletes the ORM never sees (ON DELETE CASCADE, bulk deletes).
+    session.info.setdefault(_PENDING_KEY, []).extend(
+        ("invalidate", doctor_id, None, None) for doctor_id in doctor_ids
+    )
+
+
+def _queue(target, change):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(_PENDING_KEY, []).append(change)
+
+
+@event.listens_for(Appointment, "after_insert")
+def _queue_insert(mapper, connection, target):
+    _queue(target, ("add", target.doctor_id, target.scheduled_at,
+                    target.status == AppointmentStatus.CANCELLED))
+
+
+@event.listens_for(Appointment, "after_update")
+@event.listens_for(Appointment, "after_delete")
+def _queue_invalidate(mapper, connection, target):
+    _queue(target, ("invalidate", target.doctor_id, None, None))
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_pending(session):
+    for action, doctor_id, scheduled_at, cancelled in session.info.pop(_PENDING_KEY, ()):
+        if action == "add":
+            availability_index.add(doctor_id, scheduled_at, cancelled)
+        else:
+            availability_index.invalidate(doctor_id)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_pending(session, previous_transaction):
+    session.info.pop(_PENDING_KEY, None)
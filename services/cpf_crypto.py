@@ -0,0 +1,68 @@
+import hashlib
+import hmac
+import os
+import re
+from functools import lru_cache
+from typing import Optional
+from cryptography.fernet import Fernet, MultiFernet
+from dotenv import load_dotenv
+from sqlalchemy import String
+from sqlalchemy.types import TypeDecorator
+
+
+# CPF is encrypted with a random IV, so equal CPFs never produce equal
+# ciphertexts. Lookups go through cpf_hash instead: an HMAC of the digits
+# under a separate key, unique-indexed like the plain column used to be.
+INDEX_LENGTH = 64
+
+
+def normalize_cpf(value: str) -> str:
+    return re.sub(r"\D", "", value)
+
+
+def _required(name: str) -> str:
+    load_dotenv()
+    value = os.getenv(name)
+    if not value:
+        raise RuntimeError(f"A variável {name} está vazia ou não foi definida.")
+    return value
+
+
+@lru_cache(maxsize=None)
+def _fernet() -> MultiFernet:
+    # The first key encrypts; every listed key still decrypts, so a new key
+    # goes first and the old one stays until the rows are re-encrypted.
+    keys = [key.strip() for key in _required("CPF_ENCRYPTION_KEYS").split(",") if key.strip()]
+    return MultiFernet([Fernet(key) for key in keys])
+
+
+@lru_cache(maxsize=None)
+def _index_key() -> bytes:
+    return _required("CPF_INDEX_KEY").encode()
+
+
+def cpf_index(value: Optional[str]) -> Optional[str]:
+    if value is None:
+        return None
+    return hmac.new(_index_key(), normalize_cpf(value).encode(), hashlib.sha256).hexdigest()
+
+
+def encrypt_cpf(value: str) -> str:
+    return _fernet().encrypt(value.encode()).decode()
+
+
+def decrypt_cpf(value: str) -> str:
+    return _fernet().decrypt(value.encode()).decode()
+
+
+class EncryptedCPF(TypeDecorator):
+    # Encrypts on the way in and decrypts on the way out, for ORM and Core
+    # statements alike. Never compare against it in SQL; use cpf_hash.
+    impl = String
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return encrypt_cpf(value) if value is not None else None
+
+    def process_result_value(self, value, dialect):
+        return decrypt_cpf(value) if value is not None else None
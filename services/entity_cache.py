@@ -0,0 +1,307 @@
+import math
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Callable, Dict, Iterable, Optional, Tuple
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, object_session
+from models.pacient_model import Pacient
+from models.staff_model import Staff
+from schemas.pacient_output import PacientOutput
+from services.cpf_crypto import cpf_index
+
+
+PACIENT = "pacient"
+STAFF = "staff"
+
+# What the hot paths read: the PacientOutput fields plus what scheduling and
+# ETags check. Password hashes and the ciphertext never enter the cache.
+FIELDS = {
+    PACIENT: tuple(PacientOutput.model_fields) + ("is_active", "version_id", "cpf_hash"),
+    STAFF: ("id", "username", "role", "version_id", "cpf_hash"),
+}
+MODELS = {PACIENT: Pacient, STAFF: Staff}
+
+_PENDING_KEY = "entity_cache_pending"
+
+
+def _env_flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).strip().lower() not in ("0", "false", "no", "off", "")
+
+
+class EntityCache:
+    # An LRU of row snapshots keyed by (kind, id), with a CPF index on top.
+    # Entries carry the row's version_id: a snapshot never replaces a newer
+    # one, so a lagging replica read cannot undo a write-through.
+    def __init__(self, max_size: Optional[int] = None, ttl: Optional[float] = None,
+                 enabled: Optional[bool] = None, clock: Callable[[], float] = time.monotonic):
+        if max_size is None:
+            max_size = int(os.getenv("ENTITY_CACHE_SIZE", "10000"))
+        if ttl is None:
+            ttl = float(os.getenv("ENTITY_CACHE_TTL", "5"))
+        if enabled is None:
+            enabled = _env_flag("ENTITY_CACHE_ENABLED", "1")
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self.hits: Counter = Counter()
+        self.misses: Counter = Counter()
+
+        # (kind, id) -> (expires_at, version, snapshot or None, cpf_hash).
+        # A None snapshot is a tombstone: it only holds the version floor.
+        self._entries: "OrderedDict[Tuple[str, int], tuple]" = OrderedDict()
+        self._by_cpf: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+        self._enabled = enabled
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def enabled(self) -> bool:
+        return self._enabled and self.max_size > 0
+
+    @enabled.setter
+    def enabled(self, value: bool):
+        # Writes are not tracked while disabled, so nothing cached before
+        # can be trusted afterwards.
+        with self._lock:
+            self._enabled = value
+            self._entries.clear()
+            self._by_cpf.clear()
+
+    def get(self, kind: str, entity_id: int) -> Optional[dict]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            return self._lookup(kind, (kind, entity_id))
+
+    def get_by_cpf(self, kind: str, cpf_hash: str) -> Optional[dict]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entity_id = self._by_cpf.get((kind, cpf_hash))
+            return self._lookup(kind, (kind, entity_id) if entity_id is not None else None)
+
+    def put(self, kind: str, snapshot: dict, version: int = 0):
+        if not self.enabled:
+            return
+        key = (kind, snapshot["id"])
+        now = self.clock()
+        with self._lock:
+            current = self._entries.get(key)
+            if current is not None and current[0] > now and current[1] > version:
+                return
+            self._discard(key)
+            cpf_hash = snapshot.get("cpf_hash")
+            self._entries[key] = (now + self.ttl, version, dict(snapshot), cpf_hash)
+            if cpf_hash is not None:
+                self._by_cpf[(kind, cpf_hash)] = snapshot["id"]
+            self._evict()
+
+    def evict(self, kind: str, entity_id: int, version: float = math.inf):
+        # Leaves a tombstone for the TTL: reads of anything older than
+        # `version` are not cached again. Deleted rows never come back.
+        if not self.enabled:
+            return
+        key = (kind, entity_id)
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = (self.clock() + self.ttl, version, None, None)
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_cpf.clear()
+            self.hits.clear()
+            self.misses.clear()
+
+    def stats(self) -> dict:
+        kinds = {}
+        for kind in MODELS:
+            hits, misses = self.hits[kind], self.misses[kind]
+            kinds[kind] = {
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            }
+        hits, misses = sum(self.hits.values()), sum(self.misses.values())
+        return {
+            "enabled": self.enabled,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "kinds": kinds,
+        }
+
+    def _lookup(self, kind: str, key) -> Optional[dict]:
+        entry = self._entries.get(key) if key is not None else None
+        if entry is not None and entry[0] <= self.clock():
+            self._discard(key)
+            entry = None
+        if entry is None or entry[2] is None:
+            self.misses[kind] += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits[kind] += 1
+        return dict(entry[2])
+
+    def _evict(self):
+        while len(self._entries) > self.max_size:
+            self._discard(next(iter(self._entries)))
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None and entry[3] is not None:
+            if self._by_cpf.get((key[0], entry[3])) == key[1]:
+                del self._by_cpf[(key[0], entry[3])]
+
+
+entity_cache = EntityCache()
+
+
+async def _load(db: AsyncSession, kind: str, where) -> Optional[dict]:
+    model = MODELS[kind]
+    row = (await db.execute(
+        select(*[getattr(model, field) for field in FIELDS[kind]]).where(where)
+    )).first()
+    if row is None:
+        return None
+    snapshot = row._asdict()
+    entity_cache.put(kind, snapshot, snapshot.get("version_id", 0))
+    return snapshot
+
+
+async def fetch_pacient(db: AsyncSession, pacient_id: int) -> Optional[dict]:
+    # Reads the row and caches it, for callers that already missed.
+    return await _load(db, PACIENT, Pacient.id == pacient_id)
+
+
+async def load_pacient(db: AsyncSession, pacient_id: int) -> Optional[dict]:
+    cached = entity_cache.get(PACIENT, pacient_id)
+    if cached is not None:
+        return cached
+    return await fetch_pacient(db, pacient_id)
+
+
+async def _current(db: AsyncSession, kind: str, snapshot: dict) -> Optional[dict]:
+    # The cache only hears about this process's commits. A snapshot is
+    # served once the table still has its version_id, which is an
+    # index-only read that sees every worker's writes.
+    model = MODELS[kind]
+    version = await db.scalar(select(model.version_id).where(model.id == snapshot["id"]))
+    if version == snapshot["version_id"]:
+        return snapshot
+    if version is None:
+        entity_cache.evict(kind, snapshot["id"])
+        return None
+    return await _load(db, kind, model.id == snapshot["id"])
+
+
+async def load_current_pacient(db: AsyncSession, pacient_id: int) -> Optional[dict]:
+    cached = entity_cache.get(PACIENT, pacient_id)
+    if cached is None:
+        return await fetch_pacient(db, pacient_id)
+    return await _current(db, PACIENT, cached)
+
+
+async def load_current_pacient_by_cpf(db: AsyncSession, cpf: str) -> Optional[dict]:
+    digest = cpf_index(cpf)
+    cached = entity_cache.get_by_cpf(PACIENT, digest)
+    if cached is None:
+        return await _load(db, PACIENT, Pacient.cpf_hash == digest)
+    return await _current(db, PACIENT, cached)
+
+
+async def fetch_staff(db: AsyncSession, staff_id: int) -> Optional[dict]:
+    return await _load(db, STAFF, Staff.id == staff_id)
+
+
+async def load_staff(db: AsyncSession, staff_id: int) -> Optional[dict]:
+    cached = entity_cache.get(STAFF, staff_id)
+    if cached is not None:
+        return cached
+    return await fetch_staff(db, staff_id)
+
+
+def pacient_output(snapshot: dict) -> dict:
+    return {field: snapshot[field] for field in PacientOutput.model_fields}
+
+
+# ORM writes update the cache once the surrounding transaction commits, in
+# the committing request, so the next read already sees them.
+def queue_entity_evictions(session, kind: str, ids: Iterable[int]):
+    # For deletes that bypass the ORM (the purge).
+    session.info.setdefault(_PENDING_KEY, []).extend(
+        (kind, entity_id, None, math.inf) for entity_id in ids)
+
+
+def _snapshot(kind: str, state, inserted: bool) -> Optional[dict]:
+    # Columns never set on an insert are NULL unless the server fills them.
+    table = MODELS[kind].__table__
+    snapshot = {}
+    for field in FIELDS[kind]:
+        if field in state.dict:
+            snapshot[field] = state.dict[field]
+        elif inserted and table.c[field].server_default is None:
+            snapshot[field] = None
+        else:
+            return None
+    return snapshot
+
+
+def _queue(kind: str, target, change: str):
+    session = object_session(target)
+    if session is None:
+        return
+    state = inspect(target)
+    snapshot, version = None, math.inf
+    if change != "delete":
+        # Written through when the flush left every field known; otherwise
+        # only the new version is remembered and the next read reloads.
+        snapshot = _snapshot(kind, state, change == "insert")
+        version = state.dict.get("version_id", 0)
+    session.info.setdefault(_PENDING_KEY, []).append((kind, target.id, snapshot, version))
+
+
+def _listen(kind: str):
+    model = MODELS[kind]
+
+    @event.listens_for(model, "after_insert")
+    def _queue_insert(mapper, connection, target):
+        _queue(kind, target, "insert")
+
+    @event.listens_for(model, "after_update")
+    def _queue_update(mapper, connection, target):
+        _queue(kind, target, "update")
+
+    @event.listens_for(model, "after_delete")
+    def _queue_delete(mapper, connection, target):
+        _queue(kind, target, "delete")
+
+
+for _kind in MODELS:
+    _listen(_kind)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_pending(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    for kind, entity_id, snapshot, version in pending:
+        if snapshot is not None:
+            entity_cache.put(kind, snapshot, version)
+        else:
+            entity_cache.evict(kind, entity_id, version)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_pending(session, previous_transaction):
+    session.info.pop(_PENDING_KEY, None)
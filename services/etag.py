@@ -0,0 +1,49 @@
+import hashlib
+from typing import Optional
+from fastapi import HTTPException
+from starlette import status
+
+
+def make_etag(id: int, version_id: int) -> str:
+    # version_id moves on every committed write, so id + version names a
+    # representation exactly.
+    return f'"{id}-{version_id}"'
+
+
+def collection_etag(name: str, *parts) -> str:
+    # For lists: parts are the collection's state and the query that was
+    # asked, so a change to either names a different representation.
+    digest = hashlib.sha256(repr(parts).encode()).hexdigest()[:20]
+    return f'"{name}-{digest}"'
+
+
+def _tags(header: str):
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag:
+            yield tag
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    # Weak comparison, as If-None-Match requires.
+    if not header:
+        return False
+    return any(tag == "*" or tag == etag for tag in _tags(header))
+
+
+def version_from_etag(header: str, id: int) -> Optional[int]:
+    # None for "*": any current version of an existing row will do.
+    tags = list(_tags(header))
+    if tags == ["*"]:
+        return None
+    prefix = f'"{id}-'
+    if len(tags) == 1 and tags[0].startswith(prefix) and tags[0].endswith('"'):
+        version = tags[0][len(prefix):-1]
+        if version.isdigit():
+            return int(version)
+    raise HTTPException(
+        status_code=status.HTTP_412_PRECONDITION_FAILED,
+        detail="If-Match não corresponde a este paciente."
+    )
@@ -0,0 +1,231 @@
+import os
+import time
+from typing import Iterable, Optional, Sequence, Tuple
+from sqlalchemy import (
+    Float, REAL, Select, and_, case, cast, event, false, func, literal, or_,
+    select, text
+)
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, object_session
+from models.pacient_change_set_model import PacientChangeSet
+from models.pacient_model import Pacient
+from services.trigram import TrigramIndex, normalize_name
+
+
+_PENDING_KEY = "name_index_pending"
+# Ranked candidates checked against the database per statement.
+CANDIDATE_WINDOW = 500
+# Other workers' inserts and updates are picked up this often; the whole
+# index is rebuilt now and then for anything that bypassed both.
+REFRESH_SECONDS = float(os.getenv("NAME_INDEX_REFRESH_SECONDS", "2"))
+RELOAD_SECONDS = float(os.getenv("NAME_INDEX_RELOAD_SECONDS", "300"))
+
+# In-process fallback used when the database has no pg_trgm (SQLite, or a
+# PostgreSQL server without the extension).
+name_index = TrigramIndex()
+_trigram_support = {}
+# What this process's index has read so far.
+_synced = {"loaded_at": 0.0, "checked_at": 0.0, "last_id": 0, "last_change_set": 0}
+
+
+def create_trigram_index(connection) -> bool:
+    if connection.dialect.name != "postgresql":
+        return False
+
+    available = connection.execute(text(
+        "SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'"
+    )).first()
+    if not available:
+        return False
+
+    try:
+        with connection.begin_nested():
+            connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    except DBAPIError:
+        return False
+
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_pacient_normalized_name_trgm "
+        "ON pacient USING gin (normalized_name gin_trgm_ops)"
+    ))
+    return True
+
+
+@event.listens_for(Pacient.__table__, "after_create")
+def _create_trigram_index(target, connection, **kw):
+    create_trigram_index(connection)
+
+
+async def has_trigram_support(db: AsyncSession) -> bool:
+    bind = db.get_bind()
+    if bind.dialect.name != "postgresql":
+        return False
+
+    key = str(bind.url)
+    if key not in _trigram_support:
+        result = await db.execute(text(
+            "SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'"
+        ))
+        _trigram_support[key] = result.first() is not None
+    return _trigram_support[key]
+
+
+def _names():
+    # Each row also carries the newest change set, read in the same snapshot.
+    newest = select(func.max(PacientChangeSet.id)).scalar_subquery()
+    return select(Pacient.id, Pacient.full_name, newest.label("last_change_set"))
+
+
+def _mark_synced(rows, now: float, loaded: bool):
+    if loaded:
+        _synced["loaded_at"] = now
+    _synced["checked_at"] = now
+    if rows:
+        _synced["last_id"] = max(_synced["last_id"], max(row.id for row in rows))
+        _synced["last_change_set"] = rows[0].last_change_set or _synced["last_change_set"]
+
+
+async def ensure_index_loaded(db: AsyncSession):
+    # Commits in this process reach the index straight away (below); those
+    # of other workers arrive with the next refresh: new ids, and patients
+    # with new change sets, which is every rename through the API.
+    now = time.monotonic()
+    if not name_index.loaded or now - _synced["loaded_at"] >= RELOAD_SECONDS:
+        _synced.update(last_id=0, last_change_set=0)
+        result = await db.stream(_names().execution_options(yield_per=5000))
+        rows = [row async for row in result]
+        name_index.load([(row.id, row.full_name) for row in rows])
+        _mark_synced(rows, now, loaded=True)
+    elif now - _synced["checked_at"] >= REFRESH_SECONDS:
+        changed = select(PacientChangeSet.pacient_id).where(
+            PacientChangeSet.id > _synced["last_change_set"])
+        rows = (await db.execute(_names().where(
+            or_(Pacient.id > _synced["last_id"], Pacient.id.in_(changed))
+        ))).all()
+        for row in rows:
+            name_index.add(row.id, row.full_name)
+        _mark_synced(rows, now, loaded=False)
+
+
+def _after(score, tiebreak, after: Sequence):
+    last_score, last_tiebreak, last_id = after
+    return or_(
+        score < last_score,
+        and_(score == last_score, or_(
+            tiebreak < last_tiebreak,
+            and_(tiebreak == last_tiebreak, Pacient.id > last_id)
+        ))
+    )
+
+
+async def _matching_candidates(db: AsyncSession, ranked: list, limit: int,
+                               where: Sequence) -> list:
+    # The first `limit` ranked entries whose rows exist and pass `where`.
+    if where:
+        # An id or CPF filter leaves one row at most: find it, then rank it.
+        allowed = set(await db.scalars(select(Pacient.id).where(*where)))
+        return [r for r in ranked if r[0] in allowed][:limit]
+
+    # Otherwise walk the ranking a window at a time, so a row deleted by
+    # another process never shortens a page; those are dropped from the index.
+    matched = []
+    for start in range(0, len(ranked), CANDIDATE_WINDOW):
+        window = ranked[start:start + CANDIDATE_WINDOW]
+        present = set(await db.scalars(
+            select(Pacient.id).where(Pacient.id.in_([key for key, _, _ in window]))
+        ))
+        for candidate in window:
+            if candidate[0] in present:
+                matched.append(candidate)
+            else:
+                name_index.remove(candidate[0])
+        if len(matched) >= limit:
+            break
+    return matched[:limit]
+
+
+async def search_by_name(query: Select, db: AsyncSession, name: str, limit: int,
+                         after: Optional[Sequence] = None, where: Sequence = ()) -> Select:
+    # Rows come back as (Pacient, score, tiebreak), best match first, at most
+    # `limit` of them on either backend; [score, tiebreak, id] of the last
+    # row is the keyset for the next page. `where` narrows the rows as well.
+    normalized = normalize_name(name)
+    if not normalized:
+        return query.where(false())
+    query = query.where(*where)
+
+    if await has_trigram_support(db):
+        term = literal(normalized)
+        score = func.word_similarity(term, Pacient.normalized_name)
+        tiebreak = func.similarity(Pacient.normalized_name, term)
+        query = query.where(
+            term.op("<%")(Pacient.normalized_name)
+            | Pacient.normalized_name.like(f"%{normalized}%")
+        )
+        if after is not None:
+            query = query.where(_after(
+                score, tiebreak,
+                (cast(after[0], REAL), cast(after[1], REAL), after[2])
+            ))
+    else:
+        await ensure_index_loaded(db)
+        ranked = name_index.search(normalized)
+        if after is not None:
+            last = (-after[0], -after[1], after[2])
+            ranked = [r for r in ranked if (-r[1], -r[2], r[0]) > last]
+        # Only this page goes into the statement, never the whole ranking.
+        ranked = await _matching_candidates(db, ranked, limit, where)
+        if not ranked:
+            return query.where(false())
+
+        query = query.where(Pacient.id.in_([key for key, _, _ in ranked]))
+        score = cast(case({key: s for key, s, _ in ranked}, value=Pacient.id), Float)
+        tiebreak = cast(case({key: t for key, _, t in ranked}, value=Pacient.id), Float)
+
+    return (
+        query.add_columns(score.label("score"), tiebreak.label("tiebreak"))
+        .order_by(score.desc(), tiebreak.desc(), Pacient.id)
+        .limit(limit)
+    )
+
+
+# The fallback index is only touched once the surrounding transaction commits,
+# so rolled back inserts and renames never become searchable.
+def queue_index_updates(session, rows: Iterable[Tuple[int, Optional[str]]]):
+    # For writes that bypass the ORM (bulk inserts); a None name removes.
+    session.info.setdefault(_PENDING_KEY, []).extend(rows)
+
+
+def _queue(target, name):
+    session = object_session(target)
+    if session is not None:
+        queue_index_updates(session, [(target.id, name)])
+
+
+@event.listens_for(Pacient, "after_insert")
+@event.listens_for(Pacient, "after_update")
+def _queue_upsert(mapper, connection, target):
+    _queue(target, target.full_name)
+
+
+@event.listens_for(Pacient, "after_delete")
+def _queue_delete(mapper, connection, target):
+    _queue(target, None)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_pending(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending or not name_index.loaded:
+        return
+    for key, name in pending:
+        if name is None:
+            name_index.remove(key)
+        else:
+            name_index.add(key, name)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_pending(session, previous_transaction):
+    session.info.pop(_PENDING_KEY, None)
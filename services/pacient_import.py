@@ -0,0 +1,216 @@
+import codecs
+import csv
+import json
+from typing import AsyncIterator, List, Optional, Tuple
+from fastapi import HTTPException
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.pacient_model import Pacient
+from schemas.pacient_schema import PacientSchema
+from services.cpf_crypto import cpf_index
+from services.name_search import queue_index_updates
+from services.password_hasher import password_hasher
+from services.trigram import normalize_name
+
+
+IMPORT_CHUNK_SIZE = 500
+CSV_TYPES = ("text/csv", "application/csv")
+NDJSON_TYPES = ("application/x-ndjson", "application/jsonl", "application/json-lines")
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer = ""
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer.rstrip("\r")
+
+
+async def iter_csv_rows(lines: AsyncIterator[str]):
+    header = None
+    pending: List[str] = []
+    quoted = False
+    number = 0
+
+    async for line in lines:
+        # A quoted field may span lines; wait until the quotes balance.
+        pending.append(line)
+        quoted ^= line.count('"') % 2 == 1
+        if quoted:
+            continue
+        record, pending = "\n".join(pending), []
+        if not record.strip():
+            continue
+
+        values = next(csv.reader([record]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+
+        number += 1
+        if len(values) != len(header):
+            yield number, None
+            continue
+        yield number, {k: (v if v != "" else None) for k, v in zip(header, values)}
+
+
+async def iter_ndjson_rows(lines: AsyncIterator[str]):
+    number = 0
+    async for line in lines:
+        if not line.strip():
+            continue
+        number += 1
+        try:
+            data = json.loads(line)
+        except ValueError:
+            data = None
+        yield number, data if isinstance(data, dict) else None
+
+
+class _Report:
+    def __init__(self):
+        self.imported = 0
+        self.errors = []
+
+    def fail(self, row: int, detail: str, cpf: Optional[str] = None):
+        self.errors.append({"row": row, "cpf": cpf, "detail": detail})
+
+    def as_dict(self) -> dict:
+        self.errors.sort(key=lambda error: error["row"])
+        return {"imported": self.imported, "failed": len(self.errors),
+                "errors": self.errors}
+
+
+def _describe(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}"
+        for item in error.errors()
+    )
+
+
+def _values(pacient: PacientSchema, hashed_password: str) -> dict:
+    values = pacient.model_dump()
+    values["hashed_password"] = hashed_password
+    # Bulk inserts skip @validates, so derive the search columns here.
+    values["normalized_name"] = normalize_name(pacient.full_name)
+    values["cpf_hash"] = cpf_index(pacient.cpf)
+    return values
+
+
+def _constraint_name(exc: IntegrityError) -> Optional[str]:
+    # asyncpg keeps it on the wrapped exception, psycopg2 on diag; SQLite
+    # only names the columns in its message.
+    orig = exc.orig
+    for source in (orig, getattr(orig, "__cause__", None), getattr(orig, "diag", None)):
+        name = getattr(source, "constraint_name", None)
+        if name:
+            return name
+    message = str(orig).splitlines()[0] if orig is not None else ""
+    return message.rpartition(": ")[2] or None
+
+
+def _integrity_detail(exc: IntegrityError) -> str:
+    name = _constraint_name(exc)
+    if name and "cpf_hash" in name:
+        return "CPF já cadastrado."
+    if name:
+        return f"Restrição violada: {name}."
+    return "Restrição do banco de dados violada."
+
+
+async def _insert_one_by_one(db: AsyncSession, rows, values, report: _Report):
+    inserted = []
+    for (number, pacient), value in zip(rows, values):
+        try:
+            async with db.begin_nested():
+                result = await db.execute(
+                    insert(Pacient).values(**value)
+                    .returning(Pacient.id, Pacient.full_name)
+                )
+                inserted.append(tuple(result.one()))
+        except IntegrityError as exc:
+            report.fail(number, _integrity_detail(exc), pacient.cpf)
+
+    queue_index_updates(db, inserted)
+    await db.commit()
+    report.imported += len(inserted)
+
+
+async def _flush(db: AsyncSession, chunk: List[Tuple[int, PacientSchema]],
+                 report: _Report):
+    digests = [cpf_index(pacient.cpf) for _, pacient in chunk]
+    existing = set((await db.scalars(
+        select(Pacient.cpf_hash).where(Pacient.cpf_hash.in_(digests))
+    )).all())
+
+    rows = []
+    for (number, pacient), digest in zip(chunk, digests):
+        if digest in existing:
+            report.fail(number, "CPF já cadastrado.", pacient.cpf)
+        else:
+            rows.append((number, pacient))
+    if not rows:
+        await db.rollback()
+        return
+
+    try:
+        hashes = await password_hasher.hash_many(
+            [pacient.hashed_password for _, pacient in rows]
+        )
+    except HTTPException as exc:
+        for number, pacient in rows:
+            report.fail(number, exc.detail, pacient.cpf)
+        await db.rollback()
+        return
+
+    values = [_values(pacient, hashed) for (_, pacient), hashed in zip(rows, hashes)]
+    try:
+        result = await db.execute(
+            insert(Pacient).returning(Pacient.id, Pacient.full_name), values
+        )
+        queue_index_updates(db, [tuple(row) for row in result.all()])
+        await db.commit()
+        report.imported += len(values)
+    except IntegrityError:
+        # Someone registered one of these CPFs after our check; find which.
+        await db.rollback()
+        await _insert_one_by_one(db, rows, values, report)
+
+
+async def import_pacients(db: AsyncSession, rows) -> dict:
+    report = _Report()
+    seen = set()
+    chunk: List[Tuple[int, PacientSchema]] = []
+
+    async for number, data in rows:
+        if data is None:
+            report.fail(number, "Linha malformada.")
+            continue
+
+        try:
+            pacient = PacientSchema.model_validate(data)
+        except ValidationError as exc:
+            cpf = data.get("cpf")
+            report.fail(number, _describe(exc), str(cpf) if cpf is not None else None)
+            continue
+
+        if pacient.cpf in seen:
+            report.fail(number, "CPF duplicado no arquivo.", pacient.cpf)
+            continue
+        seen.add(pacient.cpf)
+
+        chunk.append((number, pacient))
+        if len(chunk) >= IMPORT_CHUNK_SIZE:
+            await _flush(db, chunk, report)
+            chunk = []
+
+    if chunk:
+        await _flush(db, chunk, report)
+    return report.as_dict()
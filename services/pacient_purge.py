@@ -0,0 +1,64 @@
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.appointment_model import Appointment
+from models.pacient_inactivation_model import PacientInactivation
+from models.pacient_model import Pacient
+from services.availability import queue_invalidations
+from services.entity_cache import PACIENT, queue_entity_evictions
+from services.name_search import queue_index_updates
+
+
+PURGE_CHUNK_SIZE = int(os.getenv("PURGE_CHUNK_SIZE", "500"))
+RETENTION_DAYS = int(os.getenv("PACIENT_RETENTION_DAYS", "1825"))
+
+
+async def doctor_ids_for_pacients(db: AsyncSession, pacient_ids) -> list:
+    result = await db.scalars(
+        select(Appointment.doctor_id).distinct()
+        .where(Appointment.pacient_id.in_(pacient_ids))
+    )
+    return result.all()
+
+
+async def purge_inactive_pacients(db: AsyncSession, retention_days: int = RETENTION_DAYS,
+                                  chunk_size: Optional[int] = None) -> int:
+    # Removes patients inactive for longer than the retention window. Each
+    # chunk is its own short transaction; the database cascades the delete
+    # to appointments, inactivations and history.
+    chunk_size = chunk_size or PURGE_CHUNK_SIZE
+    cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
+    # The candidates are found once; each chunk's delete re-checks that the
+    # patient is still inactive and was not inactivated again since.
+    candidates = (await db.scalars(
+        select(Pacient.id)
+        .where(Pacient.is_active.is_(False), Pacient.id.in_(
+            select(PacientInactivation.pacient_id)
+            .group_by(PacientInactivation.pacient_id)
+            .having(func.max(PacientInactivation.inactivated_at) < cutoff)))
+        .order_by(Pacient.id)
+    )).all()
+    await db.commit()
+    still_expired = ~(
+        select(PacientInactivation.id)
+        .where(PacientInactivation.pacient_id == Pacient.id,
+               PacientInactivation.inactivated_at >= cutoff)
+        .exists()
+    )
+
+    purged = 0
+    for start in range(0, len(candidates), chunk_size):
+        ids = candidates[start:start + chunk_size]
+        queue_invalidations(db, await doctor_ids_for_pacients(db, ids))
+        queue_index_updates(db, [(pacient_id, None) for pacient_id in ids])
+        queue_entity_evictions(db, PACIENT, ids)
+        result = await db.execute(
+            delete(Pacient).where(Pacient.id.in_(ids), Pacient.is_active.is_(False),
+                                  still_expired)
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        purged += result.rowcount
+    return purged
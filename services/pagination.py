@@ -0,0 +1,52 @@
+import base64
+import json
+from datetime import datetime
+from typing import Callable, List, Optional, Sequence, Tuple
+from fastapi import HTTPException
+from starlette import status
+
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(values: Sequence) -> str:
+    values = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _convert(value, expected: type):
+    if isinstance(value, bool):
+        raise TypeError(value)
+    if expected is float and isinstance(value, (int, float)):
+        return value
+    if expected is datetime and isinstance(value, str):
+        return datetime.fromisoformat(value)
+    if not isinstance(value, expected):
+        raise TypeError(value)
+    return value
+
+
+def decode_cursor(cursor: str, *types: type) -> list:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError(values)
+        return [_convert(v, t) for v, t in zip(values, types)]
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cursor inválido."
+        )
+
+
+def split_page(rows: list, limit: int,
+               key: Callable[[object], Sequence]) -> Tuple[List, Optional[str]]:
+    # Callers fetch limit + 1 rows; the extra one only tells us a next page exists.
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(key(rows[-1]))
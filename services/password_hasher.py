@@ -0,0 +1,165 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+from fastapi import HTTPException
+from passlib.context import CryptContext
+from starlette import status
+from services.metrics import Histogram
+from services.request_metrics import record_bcrypt
+
+
+# Lives in every worker process; bcrypt never runs on the event loop.
+_crypt_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+def _hash(password: str):
+    started = time.perf_counter()
+    hashed = _crypt_context.hash(password)
+    return hashed, time.perf_counter() - started
+
+
+def _hash_many(passwords: List[str]):
+    started = time.perf_counter()
+    hashed = [_crypt_context.hash(password) for password in passwords]
+    return hashed, time.perf_counter() - started
+
+
+def _verify(password: str, hashed_password: str):
+    started = time.perf_counter()
+    try:
+        valid = _crypt_context.verify(password, hashed_password)
+    except (ValueError, TypeError):
+        valid = False
+    return valid, time.perf_counter() - started
+
+
+class PasswordHasher:
+    def __init__(self, workers: Optional[int] = None,
+                 max_queue: Optional[int] = None,
+                 bulk_workers: Optional[int] = None,
+                 bulk_slice: Optional[int] = None):
+        self.workers = (workers
+                        or int(os.getenv("PASSWORD_HASH_WORKERS", "0"))
+                        or os.cpu_count() or 1)
+        if max_queue is None:
+            max_queue = int(os.getenv("PASSWORD_HASH_QUEUE", str(self.workers * 8)))
+        self.max_queue = max_queue
+        # Bulk jobs (imports) get a quarter of the processes, in slices short
+        # enough that a login queued behind one waits a second or so.
+        self.bulk_workers = (bulk_workers
+                             or int(os.getenv("PASSWORD_HASH_BULK_WORKERS", "0"))
+                             or max(1, self.workers // 4))
+        self.bulk_slice = bulk_slice or int(os.getenv("PASSWORD_HASH_BULK_SLICE", "4"))
+        self._bulk_loop = None
+        self._bulk_semaphore = None
+
+        self._executor = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.rejected = 0
+        self.wait_time = Histogram()
+        self.run_time = {"hash": Histogram(), "hash_many": Histogram(),
+                         "verify": Histogram()}
+
+    @property
+    def capacity(self) -> int:
+        return self.workers + self.max_queue
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context("spawn")
+                    )
+        return self._executor
+
+    def _acquire(self):
+        with self._lock:
+            if self._in_flight >= self.capacity:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Serviço de autenticação sobrecarregado. Tente novamente.",
+                    headers={"Retry-After": "1"}
+                )
+            self._in_flight += 1
+
+    def _release(self):
+        with self._lock:
+            self._in_flight -= 1
+
+    async def _run(self, operation: str, fn, *args):
+        self._acquire()
+        try:
+            started = time.perf_counter()
+            loop = asyncio.get_running_loop()
+            result, run_seconds = await loop.run_in_executor(
+                self._get_executor(), fn, *args
+            )
+            total = time.perf_counter() - started
+            self.run_time[operation].observe(run_seconds)
+            record_bcrypt(run_seconds)
+            self.wait_time.observe(max(total - run_seconds, 0.0))
+            return result
+        finally:
+            self._release()
+
+    async def hash(self, password: str) -> str:
+        return await self._run("hash", _hash, password)
+
+    def _bulk_slots(self) -> asyncio.Semaphore:
+        # Shared by every bulk job on this event loop.
+        loop = asyncio.get_running_loop()
+        if self._bulk_loop is not loop:
+            self._bulk_loop = loop
+            self._bulk_semaphore = asyncio.Semaphore(self.bulk_workers)
+        return self._bulk_semaphore
+
+    async def _hash_slice(self, passwords: List[str]) -> List[str]:
+        async with self._bulk_slots():
+            return await self._run("hash_many", _hash_many, passwords)
+
+    async def hash_many(self, passwords: List[str]) -> List[str]:
+        # At most `bulk_workers` slices run at once; each one that finishes
+        # submits the next behind whatever logins queued in the meantime.
+        size = self.bulk_slice
+        slices = [passwords[i:i + size] for i in range(0, len(passwords), size)]
+        results = await asyncio.gather(*(self._hash_slice(chunk) for chunk in slices))
+        return [hashed for chunk in results for hashed in chunk]
+
+    async def verify(self, password: str, hashed_password: Optional[str]) -> bool:
+        if not hashed_password:
+            return False
+        return await self._run("verify", _verify, password, hashed_password)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "bulk_workers": self.bulk_workers,
+            "in_flight": self._in_flight,
+            "rejected": self.rejected,
+            "wait_seconds": self.wait_time.snapshot(),
+            "hash_seconds": self.run_time["hash"].snapshot(),
+            "hash_many_seconds": self.run_time["hash_many"].snapshot(),
+            "verify_seconds": self.run_time["verify"].snapshot(),
+        }
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,139 @@
+import hmac
+import os
+from typing import Dict, List, Optional
+from fastapi import Header, HTTPException
+from starlette import status
+from database.database import get_pool_stats, get_replica_stats
+from services.entity_cache import entity_cache
+from services.password_hasher import password_hasher
+from services.rate_limiter import login_limiter
+from services.request_metrics import request_metrics
+from services.token_cache import token_cache
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# Sent by the scraper as "Authorization: Bearer <token>". Left unset, the
+# operational endpoints stay closed.
+SCRAPE_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+
+def require_scrape_token(authorization: Optional[str] = Header(None)):
+    # Pool, cache, latency and hasher state are for the scraper and
+    # operators, never for API clients.
+    expected = f"Bearer {SCRAPE_TOKEN}".encode()
+    if not SCRAPE_TOKEN or not authorization or \
+            not hmac.compare_digest(authorization.encode(), expected):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
+                            detail="Acesso restrito ao coletor de métricas.")
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: Dict[str, object]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+class _Exposition:
+    # Samples are grouped per metric family, as the text format requires.
+    def __init__(self):
+        self._families: Dict[str, List[str]] = {}
+
+    def _family(self, name: str, kind: str, help: str) -> List[str]:
+        lines = self._families.get(name)
+        if lines is None:
+            lines = self._families[name] = [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+        return lines
+
+    def sample(self, name: str, kind: str, help: str, value, **labels):
+        self._family(name, kind, help).append(f"{name}{_labels(labels)} {value}")
+
+    def histogram(self, name: str, help: str, snapshot: dict, **labels):
+        lines = self._family(name, "histogram", help)
+        for bound, count in snapshot["buckets"].items():
+            lines.append(f"{name}_bucket{_labels({**labels, 'le': bound})} {count}")
+        lines.append(f"{name}_bucket{_labels({**labels, 'le': '+Inf'})} {snapshot['count']}")
+        lines.append(f"{name}_sum{_labels(labels)} {snapshot['sum']}")
+        lines.append(f"{name}_count{_labels(labels)} {snapshot['count']}")
+
+    def render(self) -> str:
+        return "\n".join(line for lines in self._families.values() for line in lines) + "\n"
+
+
+def render_metrics() -> str:
+    out = _Exposition()
+
+    out.sample("http_requests_in_flight", "gauge", "Requests being served.",
+               request_metrics.in_flight)
+    for (method, route), metrics in request_metrics.routes():
+        labels = {"method": method, "route": route}
+        for status_code, count in sorted(metrics.responses.items()):
+            out.sample("http_requests_total", "counter", "Requests served.",
+                       count, **labels, status=status_code)
+        out.histogram("http_request_duration_seconds", "Request latency.",
+                      metrics.latency.snapshot(), **labels)
+        out.histogram("http_request_db_statements", "SQL statements per request.",
+                      metrics.statements.snapshot(), **labels)
+        out.histogram("http_request_db_seconds", "Time spent in SQL per request.",
+                      metrics.db_seconds.snapshot(), **labels)
+        out.sample("http_request_bcrypt_seconds_total", "counter",
+                   "Time spent hashing or verifying passwords.",
+                   metrics.bcrypt_seconds, **labels)
+
+    for pool, stats in get_pool_stats().items():
+        if "checkout_seconds" not in stats:
+            continue
+        for key in ("size", "checked_in", "checked_out", "overflow"):
+            out.sample(f"db_pool_{key}", "gauge", f"Connection pool {key.replace('_', ' ')}.",
+                       stats[key], pool=pool)
+        out.sample("db_pool_timeouts_total", "counter", "Connection checkout timeouts.",
+                   stats["timeouts"], pool=pool)
+        out.histogram("db_pool_checkout_seconds", "Time waiting for a connection.",
+                      stats["checkout_seconds"], pool=pool)
+
+    replicas = get_replica_stats()
+    for replica, up in replicas["up"].items():
+        out.sample("db_replica_up", "gauge", "Whether reads are routed to the replica.",
+                   int(up), replica=replica)
+    out.sample("db_replica_failovers_total", "counter", "Replicas taken out after an error.",
+               replicas["failovers"])
+    out.sample("db_read_your_writes_reads_total", "counter",
+               "Reads sent to the primary after the reader's own write.", replicas["pinned_reads"])
+
+    hasher = password_hasher.stats()
+    out.sample("password_hasher_in_flight", "gauge", "Password operations queued or running.",
+               hasher["in_flight"])
+    out.sample("password_hasher_rejected_total", "counter", "Password operations shed with 503.",
+               hasher["rejected"])
+    out.histogram("password_hasher_wait_seconds", "Time queued before a worker picks the job.",
+                  hasher["wait_seconds"])
+    for operation in ("hash", "hash_many", "verify"):
+        out.histogram("password_hasher_run_seconds", "Time a worker spent on the job.",
+                      hasher[f"{operation}_seconds"], operation=operation)
+
+    for scope, limiter in login_limiter.stats().items():
+        out.sample("login_rate_limit_rejected_total", "counter",
+                   "Login attempts refused with 429.", limiter["rejected"], scope=scope)
+        out.sample("login_rate_limit_buckets", "gauge",
+                   "Token buckets held by the login limiter.", limiter["buckets"], scope=scope)
+
+    cache = token_cache.stats()
+    out.sample("token_cache_size", "gauge", "Decoded tokens cached.", cache["size"])
+    out.sample("token_cache_hits_total", "counter", "Token cache hits.", cache["hits"])
+    out.sample("token_cache_misses_total", "counter", "Token cache misses.", cache["misses"])
+    out.sample("token_cache_revoked", "gauge", "Revoked tokens still unexpired.", cache["revoked"])
+
+    entities = entity_cache.stats()
+    out.sample("entity_cache_enabled", "gauge", "Whether the entity cache is on.",
+               int(entities["enabled"]))
+    out.sample("entity_cache_size", "gauge", "Patient and staff rows cached.", entities["size"])
+    for kind, counts in entities["kinds"].items():
+        out.sample("entity_cache_hits_total", "counter", "Entity cache hits.",
+                   counts["hits"], entity=kind)
+        out.sample("entity_cache_misses_total", "counter", "Entity cache misses.",
+                   counts["misses"], entity=kind)
+
+    return out.render()
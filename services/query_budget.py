@@ -0,0 +1,117 @@
+import functools
+import logging
+import os
+import sysconfig
+import traceback
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional, Tuple
+from greenlet import getcurrent
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+logger = logging.getLogger(__name__)
+
+STRICT = os.getenv("QUERY_BUDGET_STRICT", "").strip().lower() in ("1", "true", "yes", "on")
+_LIBRARY_PATHS = tuple({sysconfig.get_paths()["stdlib"], sysconfig.get_paths()["purelib"]})
+
+
+class QueryBudgetExceeded(RuntimeError):
+    pass
+
+
+def _application_stack() -> traceback.StackSummary:
+    # Under an AsyncSession the statement runs in a child greenlet whose
+    # stack stops at SQLAlchemy; the awaiting handler is on the parent's.
+    frames = traceback.extract_stack()
+    parent = getcurrent().parent
+    if parent is not None and parent.gr_frame is not None:
+        frames = traceback.extract_stack(parent.gr_frame) + frames
+    return traceback.StackSummary.from_list(
+        [frame for frame in frames if not frame.filename.startswith(_LIBRARY_PATHS)]
+    )
+
+
+class QueryTracker:
+    def __init__(self, limit: Optional[int] = None, name: str = "queries"):
+        self.limit = limit
+        self.name = name
+        self.statements: List[str] = []
+        # Stacks are only captured for the statements that break the budget.
+        self.offending: List[Tuple[str, traceback.StackSummary]] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    @property
+    def exceeded(self) -> bool:
+        return self.limit is not None and self.count > self.limit
+
+    def record(self, statement: str):
+        self.statements.append(statement)
+        if self.exceeded:
+            self.offending.append((statement, _application_stack()))
+
+    def report(self) -> str:
+        lines = [f"{self.name}: {self.count} statements (budget {self.limit})"]
+        lines += [f"  {i}. {statement}" for i, statement in enumerate(self.statements, 1)]
+        for statement, stack in self.offending:
+            lines.append(f"over budget: {statement}")
+            lines.append("".join(stack.format()).rstrip())
+        return "\n".join(lines)
+
+
+_tracker: ContextVar[Optional[QueryTracker]] = ContextVar("query_tracker", default=None)
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _record(conn, cursor, statement, parameters, context, executemany):
+    tracker = _tracker.get()
+    if tracker is not None:
+        tracker.record(statement)
+
+
+@contextmanager
+def query_budget(limit: int, name: str = "queries", strict: Optional[bool] = None):
+    # Counts the statements issued by the current task (or thread) only.
+    tracker = QueryTracker(limit, name)
+    token = _tracker.set(tracker)
+    try:
+        yield tracker
+    finally:
+        _tracker.reset(token)
+
+    if tracker.exceeded:
+        if STRICT if strict is None else strict:
+            raise QueryBudgetExceeded(tracker.report())
+        logger.warning(tracker.report())
+
+
+def route_budget(limit: int):
+    # Declares how many statements an async route handler may issue.
+    def decorate(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            with query_budget(limit, name=f"{endpoint.__module__}.{endpoint.__name__}"):
+                return await endpoint(*args, **kwargs)
+        wrapper.query_budget = limit
+        return wrapper
+    return decorate
+
+
+@contextmanager
+def count_queries(name: str = "queries"):
+    # Process-wide: every statement on any engine or thread while the block
+    # runs. Meant for tests, where the app runs on TestClient's own loop.
+    tracker = QueryTracker(name=name)
+
+    def listener(conn, cursor, statement, parameters, context, executemany):
+        tracker.record(statement)
+
+    event.listen(Engine, "after_cursor_execute", listener)
+    try:
+        yield tracker
+    finally:
+        event.remove(Engine, "after_cursor_execute", listener)
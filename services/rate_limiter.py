@@ -0,0 +1,117 @@
+import math
+import os
+import threading
+import time
+import zlib
+from typing import Callable, Dict, List, Optional
+from services.cpf_crypto import normalize_cpf
+
+
+class _Shard:
+    __slots__ = ("buckets", "lock", "next_sweep")
+
+    def __init__(self):
+        # key -> [tokens, updated_at]
+        self.buckets: Dict[str, List[float]] = {}
+        self.lock = threading.Lock()
+        self.next_sweep = 0.0
+
+
+class TokenBucketLimiter:
+    def __init__(self, burst: int, per_minute: float, shards: int = 16,
+                 clock: Callable[[], float] = time.monotonic):
+        self.burst = burst
+        self.rate = per_minute / 60.0
+        self.clock = clock
+        self.rejected = 0
+        # A bucket left alone this long is full again, so it can be dropped.
+        self.idle_ttl = burst / self.rate if self.rate > 0 else 3600.0
+        self._shards = [_Shard() for _ in range(shards)]
+
+    def __len__(self) -> int:
+        return sum(len(shard.buckets) for shard in self._shards)
+
+    def _shard(self, key: str) -> _Shard:
+        return self._shards[zlib.crc32(key.encode()) % len(self._shards)]
+
+    def hit(self, key: str) -> float:
+        # Takes one token. Returns 0 when allowed, otherwise the seconds
+        # until the next token is due.
+        if self.burst <= 0:
+            return 0.0
+        shard = self._shard(key)
+        now = self.clock()
+        with shard.lock:
+            if now >= shard.next_sweep:
+                self._sweep(shard, now)
+            bucket = shard.buckets.get(key)
+            if bucket is None:
+                shard.buckets[key] = [self.burst - 1.0, now]
+                return 0.0
+            tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if tokens >= 1.0:
+                bucket[0] = tokens - 1.0
+                return 0.0
+            bucket[0] = tokens
+            self.rejected += 1
+        return (1.0 - tokens) / self.rate if self.rate > 0 else self.idle_ttl
+
+    def _sweep(self, shard: _Shard, now: float):
+        expired = [key for key, (_, updated_at) in shard.buckets.items()
+                   if now - updated_at >= self.idle_ttl]
+        for key in expired:
+            del shard.buckets[key]
+        shard.next_sweep = now + self.idle_ttl
+
+    def clear(self):
+        for shard in self._shards:
+            with shard.lock:
+                shard.buckets.clear()
+                shard.next_sweep = 0.0
+        self.rejected = 0
+
+    def stats(self) -> dict:
+        return {
+            "burst": self.burst,
+            "per_minute": self.rate * 60.0,
+            "buckets": len(self),
+            "rejected": self.rejected,
+        }
+
+
+class LoginLimiter:
+    # One bucket per client address and one per CPF: the first stops a single
+    # host spraying many accounts, the second a botnet hammering one account.
+    def __init__(self):
+        self.by_ip = TokenBucketLimiter(
+            burst=int(os.getenv("LOGIN_IP_BURST", "20")),
+            per_minute=float(os.getenv("LOGIN_IP_PER_MINUTE", "30")),
+        )
+        self.by_cpf = TokenBucketLimiter(
+            burst=int(os.getenv("LOGIN_CPF_BURST", "5")),
+            per_minute=float(os.getenv("LOGIN_CPF_PER_MINUTE", "5")),
+        )
+
+    def check(self, client_ip: Optional[str], cpf: str) -> float:
+        # The CPF bucket is only charged once the address is allowed. It is
+        # keyed like the lookup, on the digits alone: every formatting of a
+        # CPF reaches the same account, so it must drain the same bucket.
+        retry_after = self.by_ip.hit(client_ip or "unknown")
+        if retry_after:
+            return retry_after
+        return self.by_cpf.hit(normalize_cpf(cpf))
+
+    @staticmethod
+    def retry_after_header(seconds: float) -> str:
+        return str(max(1, math.ceil(seconds)))
+
+    def clear(self):
+        self.by_ip.clear()
+        self.by_cpf.clear()
+
+    def stats(self) -> dict:
+        return {"ip": self.by_ip.stats(), "cpf": self.by_cpf.stats()}
+
+
+login_limiter = LoginLimiter()
@@ -0,0 +1,128 @@
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from services.metrics import Histogram
+
+
+STATEMENT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+
+class RequestStats:
+    __slots__ = ("statements", "db_seconds", "bcrypt_seconds")
+
+    def __init__(self):
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.bcrypt_seconds = 0.0
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def current_request() -> Optional[RequestStats]:
+    return _current.get()
+
+
+def record_bcrypt(seconds: float):
+    stats = _current.get()
+    if stats is not None:
+        stats.bcrypt_seconds += seconds
+
+
+# Every engine, sync or the sync side of an async one. The start time rides
+# on the execution context so a failed statement leaves nothing behind.
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._metrics_started = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    started = getattr(context, "_metrics_started", None)
+    if stats is None or started is None:
+        return
+    stats.statements += 1
+    stats.db_seconds += time.perf_counter() - started
+
+
+class RouteMetrics:
+    __slots__ = ("latency", "statements", "db_seconds", "bcrypt_seconds", "responses")
+
+    def __init__(self):
+        self.latency = Histogram()
+        self.statements = Histogram(STATEMENT_BUCKETS)
+        self.db_seconds = Histogram()
+        self.bcrypt_seconds = 0.0
+        self.responses: Dict[int, int] = {}
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.in_flight = 0
+        self._routes: Dict[Tuple[str, str], RouteMetrics] = {}
+        self._lock = threading.Lock()
+
+    def route(self, method: str, path: str) -> RouteMetrics:
+        key = (method, path)
+        metrics = self._routes.get(key)
+        if metrics is None:
+            with self._lock:
+                metrics = self._routes.setdefault(key, RouteMetrics())
+        return metrics
+
+    def observe(self, method: str, path: str, status_code: int,
+                seconds: float, stats: RequestStats):
+        metrics = self.route(method, path)
+        metrics.latency.observe(seconds)
+        metrics.statements.observe(stats.statements)
+        metrics.db_seconds.observe(stats.db_seconds)
+        with self._lock:
+            metrics.bcrypt_seconds += stats.bcrypt_seconds
+            metrics.responses[status_code] = metrics.responses.get(status_code, 0) + 1
+
+    def routes(self):
+        with self._lock:
+            return list(self._routes.items())
+
+
+request_metrics = RequestMetrics()
+
+
+class MetricsMiddleware:
+    # Plain ASGI middleware: recording is a few additions per request, and
+    # nothing is formatted until /metrics is scraped.
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        request_metrics.in_flight += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            request_metrics.in_flight -= 1
+            _current.reset(token)
+            # Label by route template, never by raw path, to bound cardinality.
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            request_metrics.observe(scope["method"], path, status_code, elapsed, stats)
@@ -0,0 +1,35 @@
+from typing import Iterable, List, Optional, Type
+import orjson
+from pydantic import BaseModel, TypeAdapter
+from starlette.responses import JSONResponse, Response
+
+
+class ORJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+# Read-only endpoints select exactly the columns a schema exposes and dump
+# the rows straight to JSON: no ORM identity map, no per-row validation.
+def projection(model, schema: Type[BaseModel]) -> list:
+    return [getattr(model, field) for field in schema.model_fields]
+
+
+def rows_to_dicts(rows: Iterable, schema: Type[BaseModel]) -> List[dict]:
+    # Extra trailing columns (ranking scores, version) are dropped by zip.
+    fields = tuple(schema.model_fields)
+    return [dict(zip(fields, row)) for row in rows]
+
+
+def adapter_response(adapter: TypeAdapter, value, status_code: int = 200,
+                     headers: Optional[dict] = None) -> Response:
+    # Routes with a response_model: validated and dumped by pydantic-core
+    # through an adapter built once per route, never via jsonable_encoder.
+    body = adapter.dump_json(adapter.validate_python(value, from_attributes=True))
+    return Response(body, status_code=status_code, headers=headers,
+                    media_type="application/json")
+
+
+def dump_line(row, schema: Type[BaseModel]) -> bytes:
+    # One NDJSON line.
+    return orjson.dumps(dict(zip(schema.model_fields, row))) + b"\n"
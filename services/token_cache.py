@@ -0,0 +1,137 @@
+import hashlib
+import heapq
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+
+
+def token_digest(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class TokenCache:
+    def __init__(self, max_size: Optional[int] = None):
+        if max_size is None:
+            max_size = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._by_subject: Dict[str, Set[str]] = {}
+        # Revocations outlive cache eviction: a revoked token must not be
+        # accepted again just because it was decoded once more. Each is
+        # forgotten once every token it covers has expired, through a heap
+        # of (forget_at, map, key) instead of a scan per lookup.
+        self._revoked: Dict[str, float] = {}
+        self._revoked_before: Dict[str, Tuple[int, float]] = {}
+        self._expiry: List[tuple] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, token: str) -> Optional[dict]:
+        digest = token_digest(token)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None and entry[0] <= now:
+                self._discard(digest)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            return dict(entry[1])
+
+    def put(self, token: str, claims: dict, expires_at: float):
+        if self.max_size <= 0:
+            return
+        digest = token_digest(token)
+        subject = claims.get("cpf")
+        with self._lock:
+            self._discard(digest)
+            self._entries[digest] = (expires_at, dict(claims), subject)
+            self._by_subject.setdefault(subject, set()).add(digest)
+            while len(self._entries) > self.max_size:
+                oldest = next(iter(self._entries))
+                self._discard(oldest)
+
+    def is_revoked(self, token: str, subject: Optional[str],
+                   issued_at: Optional[float]) -> bool:
+        digest = token_digest(token)
+        with self._lock:
+            self._prune(time.time())
+            if digest in self._revoked:
+                return True
+            revocation = self._revoked_before.get(subject)
+            return revocation is not None and (issued_at or 0) < revocation[0]
+
+    def revoke(self, token: str, expires_at: float):
+        digest = token_digest(token)
+        with self._lock:
+            self._discard(digest)
+            self._prune(time.time())
+            expires_at = max(expires_at, self._revoked.get(digest, 0))
+            self._revoked[digest] = expires_at
+            heapq.heappush(self._expiry, (expires_at, "token", digest))
+
+    def revoke_subject(self, subject: str, forget_at: float):
+        # Tokens carry iat in whole seconds: the cutoff is the next second,
+        # so a token issued in the revoking second is revoked as well.
+        # forget_at is when the last token issued before now expires.
+        now = time.time()
+        with self._lock:
+            for digest in list(self._by_subject.get(subject, ())):
+                self._discard(digest)
+            self._prune(now)
+            cutoff, until = self._revoked_before.get(subject, (0, 0))
+            revocation = (max(cutoff, int(now) + 1), max(until, forget_at))
+            self._revoked_before[subject] = revocation
+            heapq.heappush(self._expiry, (revocation[1], "subject", subject))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_subject.clear()
+            self._revoked.clear()
+            self._revoked_before.clear()
+            self._expiry.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "revoked": len(self._revoked),
+            "revoked_subjects": len(self._revoked_before),
+        }
+
+    def _prune(self, now: float):
+        while self._expiry and self._expiry[0][0] <= now:
+            forget_at, kind, key = heapq.heappop(self._expiry)
+            if kind == "token":
+                if self._revoked.get(key, now + 1) <= now:
+                    del self._revoked[key]
+            elif self._revoked_before.get(key, (0, now + 1))[1] <= now:
+                del self._revoked_before[key]
+
+    def _discard(self, digest: str):
+        entry = self._entries.pop(digest, None)
+        if entry is None:
+            return
+        digests = self._by_subject.get(entry[2])
+        if digests is not None:
+            digests.discard(digest)
+            if not digests:
+                del self._by_subject[entry[2]]
+
+
+token_cache = TokenCache()
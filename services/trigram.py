@@ -0,0 +1,113 @@
+import threading
+import unicodedata
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+
+def normalize_name(value: Optional[str]) -> Optional[str]:
+    if value is None:
+        return None
+    decomposed = unicodedata.normalize("NFKD", value)
+    folded = "".join(c for c in decomposed if not unicodedata.combining(c))
+    cleaned = "".join(c if c.isalnum() else " " for c in folded.lower())
+    return " ".join(cleaned.split())
+
+
+def trigrams(value: str) -> Set[str]:
+    # Same padding rules as pg_trgm: two spaces before and one after each word.
+    grams = set()
+    for word in value.split():
+        padded = f"  {word} "
+        for i in range(len(padded) - 2):
+            grams.add(padded[i:i + 3])
+    return grams
+
+
+def similarity(a: str, b: str) -> float:
+    ga, gb = trigrams(a), trigrams(b)
+    if not ga or not gb:
+        return 0.0
+    return len(ga & gb) / len(ga | gb)
+
+
+class TrigramIndex:
+    def __init__(self, threshold: float = 0.6):
+        self.threshold = threshold
+        self.loaded = False
+        self._postings: Dict[str, Set[int]] = defaultdict(set)
+        self._names: Dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def load(self, rows: Iterable[Tuple[int, str]]):
+        with self._lock:
+            self._postings.clear()
+            self._names.clear()
+            for key, name in rows:
+                self._add(key, name)
+            self.loaded = True
+
+    def add(self, key: int, name: Optional[str]):
+        with self._lock:
+            self._remove(key)
+            self._add(key, name)
+
+    def remove(self, key: int):
+        with self._lock:
+            self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._postings.clear()
+            self._names.clear()
+            self.loaded = False
+
+    def search(self, query: str,
+               limit: Optional[int] = None) -> List[Tuple[int, float, float]]:
+        normalized = normalize_name(query)
+        grams = trigrams(normalized)
+        if not grams:
+            return []
+
+        with self._lock:
+            hits: Dict[int, int] = defaultdict(int)
+            for gram in grams:
+                for key in self._postings.get(gram, ()):
+                    hits[key] += 1
+
+            ranked = []
+            for key, count in hits.items():
+                name = self._names[key]
+                # Substring matches always qualify, like the old ILIKE filter.
+                if normalized in name:
+                    score = 1.0
+                else:
+                    score = count / len(grams)
+                if score >= self.threshold:
+                    ranked.append((key, score, similarity(normalized, name)))
+
+        ranked.sort(key=lambda r: (-r[1], -r[2], r[0]))
+        if limit is not None:
+            ranked = ranked[:limit]
+        return ranked
+
+    def _add(self, key: int, name: Optional[str]):
+        normalized = normalize_name(name)
+        if not normalized:
+            return
+        self._names[key] = normalized
+        for gram in trigrams(normalized):
+            self._postings[gram].add(key)
+
+    def _remove(self, key: int):
+        name = self._names.pop(key, None)
+        if name is None:
+            return
+        for gram in trigrams(name):
+            keys = self._postings.get(gram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._postings[gram]
@@ -0,0 +1,28 @@
+from benchmarks.harness import compare, load_baseline, measure, save_baseline
+import benchmarks.harness as harness
+
+
+def test_measure_reports_milliseconds():
+    calls = []
+    result = measure(lambda: calls.append(1), iterations=20, warmup=2)
+    assert len(calls) == 22
+    assert result["iterations"] == 20
+    assert 0 <= result["min_ms"] <= result["median_ms"] <= result["p95_ms"]
+
+
+def test_compare_flags_only_regressions_over_threshold():
+    baseline = {"fast": {"median_ms": 10.0}, "slow": {"median_ms": 10.0},
+                "gone": {"median_ms": 1.0}}
+    results = {"fast": {"median_ms": 11.0}, "slow": {"median_ms": 13.0},
+               "new": {"median_ms": 5.0}}
+    report = {entry["name"]: entry for entry in compare(results, baseline, threshold=0.25)}
+    assert set(report) == {"fast", "slow"}
+    assert not report["fast"]["regressed"]
+    assert report["slow"]["regressed"]
+
+
+def test_baseline_round_trip(tmp_path, monkeypatch):
+    monkeypatch.setattr(harness, "BASELINE_DIR", tmp_path)
+    assert load_baseline("10k") is None
+    save_baseline("10k", {"jwt_encode": {"median_ms": 0.05}}, {"cpus": 1})
+    assert load_baseline("10k") == {"jwt_encode": {"median_ms": 0.05}}
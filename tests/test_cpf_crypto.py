@@ -0,0 +1,49 @@
+import pytest
+from cryptography.fernet import Fernet
+from services import cpf_crypto
+from services.cpf_crypto import cpf_index, decrypt_cpf, encrypt_cpf
+
+
+@pytest.fixture
+def keys(monkeypatch):
+    def use(*encryption_keys, index_key="indice"):
+        monkeypatch.setenv("CPF_ENCRYPTION_KEYS", ",".join(encryption_keys))
+        monkeypatch.setenv("CPF_INDEX_KEY", index_key)
+        cpf_crypto._fernet.cache_clear()
+        cpf_crypto._index_key.cache_clear()
+    yield use
+    cpf_crypto._fernet.cache_clear()
+    cpf_crypto._index_key.cache_clear()
+
+
+def test_ciphertexts_differ_but_the_index_does_not(keys):
+    keys(Fernet.generate_key().decode())
+    first, second = encrypt_cpf("52998224725"), encrypt_cpf("52998224725")
+    assert first != second
+    assert decrypt_cpf(first) == decrypt_cpf(second) == "52998224725"
+    assert cpf_index("52998224725") == cpf_index("529.982.247-25")
+    assert len(cpf_index("52998224725")) == cpf_crypto.INDEX_LENGTH
+
+
+def test_index_depends_on_the_key(keys):
+    keys(Fernet.generate_key().decode(), index_key="um")
+    digest = cpf_index("52998224725")
+    keys(Fernet.generate_key().decode(), index_key="outro")
+    assert cpf_index("52998224725") != digest
+
+
+def test_old_keys_still_decrypt(keys):
+    old, new = Fernet.generate_key().decode(), Fernet.generate_key().decode()
+    keys(old)
+    token = encrypt_cpf("52998224725")
+    keys(new, old)
+    assert decrypt_cpf(token) == "52998224725"
+    assert Fernet(new.encode()).decrypt(encrypt_cpf("1").encode()) == b"1"
+
+
+def test_missing_key_is_reported(keys, monkeypatch):
+    keys(Fernet.generate_key().decode())
+    monkeypatch.setenv("CPF_INDEX_KEY", "")
+    cpf_crypto._index_key.cache_clear()
+    with pytest.raises(RuntimeError, match="CPF_INDEX_KEY"):
+        cpf_index("52998224725")
@@ -0,0 +1,99 @@
+from services.entity_cache import PACIENT, STAFF, EntityCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_cache(**kwargs):
+    kwargs.setdefault("max_size", 10)
+    kwargs.setdefault("ttl", 30)
+    kwargs.setdefault("enabled", True)
+    return EntityCache(**kwargs)
+
+
+def pacient(id=1, version_id=1, cpf_hash="h1", **fields):
+    return {"id": id, "version_id": version_id, "cpf_hash": cpf_hash, **fields}
+
+
+def test_lookup_by_id_and_cpf():
+    cache = make_cache()
+    assert cache.get(PACIENT, 1) is None
+    cache.put(PACIENT, pacient(full_name="Ana"), 1)
+    assert cache.get(PACIENT, 1)["full_name"] == "Ana"
+    assert cache.get_by_cpf(PACIENT, "h1")["id"] == 1
+    assert cache.get(STAFF, 1) is None
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (2, 2)
+    assert stats["kinds"][PACIENT]["hit_rate"] == 2 / 3
+
+
+def test_returned_snapshots_are_copies():
+    cache = make_cache()
+    cache.put(PACIENT, pacient(full_name="Ana"), 1)
+    cache.get(PACIENT, 1)["full_name"] = "Outra"
+    assert cache.get(PACIENT, 1)["full_name"] == "Ana"
+
+
+def test_older_versions_never_replace_newer_ones():
+    cache = make_cache()
+    cache.put(PACIENT, pacient(version_id=2, full_name="Nova"), 2)
+    cache.put(PACIENT, pacient(version_id=1, full_name="Antiga"), 1)
+    assert cache.get(PACIENT, 1)["full_name"] == "Nova"
+
+
+def test_tombstones_hold_the_version_floor():
+    cache = make_cache()
+    cache.put(PACIENT, pacient(), 1)
+    cache.evict(PACIENT, 1, 2)
+    assert cache.get(PACIENT, 1) is None
+    assert cache.get_by_cpf(PACIENT, "h1") is None
+    cache.put(PACIENT, pacient(version_id=1), 1)
+    assert cache.get(PACIENT, 1) is None
+    cache.put(PACIENT, pacient(version_id=2), 2)
+    assert cache.get(PACIENT, 1)["version_id"] == 2
+
+    cache.evict(PACIENT, 1)
+    cache.put(PACIENT, pacient(version_id=3), 3)
+    assert cache.get(PACIENT, 1) is None
+
+
+def test_entries_expire():
+    clock = FakeClock()
+    cache = make_cache(clock=clock)
+    cache.put(PACIENT, pacient(), 1)
+    cache.evict(PACIENT, 2)
+    clock.now = 31
+    assert cache.get(PACIENT, 1) is None
+    cache.put(PACIENT, pacient(id=2), 1)
+    assert cache.get(PACIENT, 2) is not None
+
+
+def test_size_is_bounded_least_recently_used_first():
+    cache = make_cache(max_size=2)
+    cache.put(PACIENT, pacient(id=1, cpf_hash="h1"), 1)
+    cache.put(PACIENT, pacient(id=2, cpf_hash="h2"), 1)
+    cache.get(PACIENT, 1)
+    cache.put(PACIENT, pacient(id=3, cpf_hash="h3"), 1)
+    assert len(cache) == 2
+    assert cache.get(PACIENT, 2) is None
+    assert cache.get_by_cpf(PACIENT, "h2") is None
+    assert cache.get(PACIENT, 1) is not None
+
+
+def test_switching_off_bypasses_and_empties_the_cache():
+    cache = make_cache()
+    cache.put(PACIENT, pacient(), 1)
+    cache.enabled = False
+    assert cache.get(PACIENT, 1) is None
+    cache.put(PACIENT, pacient(), 1)
+    assert cache.stats()["misses"] == 0
+
+    cache.enabled = True
+    assert cache.get(PACIENT, 1) is None
+    assert make_cache(max_size=0).enabled is False
@@ -2,11 +2,14 @@ import os
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 from services.auth_service import get_current_user
-from database.database import Base, get_db
+from database.database import Base, get_async_db, get_db, get_read_db, to_async_url
 from main import app
 from models.pacient_model import Pacient
+from services.entity_cache import entity_cache
 from models.appointment_model import AppointmentStatus
 from datetime import datetime, timedelta, timezone
 from models.staff_model import Staff
@@ -16,6 +19,12 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 engine = create_engine(DATABASE_URL)
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# TestClient runs every request on a fresh event loop, so async connections
+# must not be pooled across requests.
+async_engine = create_async_engine(to_async_url(DATABASE_URL), poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False,
+                                              expire_on_commit=False)
+
 def override_get_current_user():
     return {
         "username": "recep_teste",
@@ -30,12 +39,20 @@ def override_get_db():
     finally:
         db.close()
 
+
+async def override_get_async_db():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_async_db] = override_get_async_db
+app.dependency_overrides[get_read_db] = override_get_async_db
 
 @pytest.fixture(scope="function")
 def db_session():
     Base.metadata.drop_all(bind=engine)
     Base.metadata.create_all(bind=engine)
+    entity_cache.clear()
     db = TestingSessionLocal()
     try:
         yield db
@@ -0,0 +1,58 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from services.password_hasher import PasswordHasher
+
+
+@pytest.fixture(scope="module")
+def hasher():
+    hasher = PasswordHasher(workers=1, max_queue=1)
+    yield hasher
+    hasher.shutdown()
+
+
+def test_hash_and_verify(hasher):
+    hashed = asyncio.run(hasher.hash("senha123"))
+    assert hashed.startswith("$2b$")
+    assert asyncio.run(hasher.verify("senha123", hashed)) is True
+    assert asyncio.run(hasher.verify("errada", hashed)) is False
+    assert asyncio.run(hasher.verify("senha123", "fakehash")) is False
+
+    stats = hasher.stats()
+    assert stats["hash_seconds"]["count"] == 1
+    assert stats["verify_seconds"]["count"] == 3
+    assert stats["in_flight"] == 0
+
+
+def test_rejects_when_saturated(hasher):
+    async def burst():
+        return await asyncio.gather(
+            *(hasher.verify("senha", "fakehash") for _ in range(4)),
+            return_exceptions=True
+        )
+
+    results = asyncio.run(burst())
+    rejected = [r for r in results if isinstance(r, HTTPException)]
+    assert len(rejected) == 2
+    assert all(r.status_code == 503 for r in rejected)
+    assert hasher.stats()["rejected"] == 2
+
+class _PeakHasher(PasswordHasher):
+    peak = 0
+
+    async def _run(self, operation, fn, *args):
+        self.peak = max(self.peak, self.in_flight + 1)
+        return await super()._run(operation, fn, *args)
+
+
+def test_bulk_hashing_leaves_workers_for_logins():
+    hasher = _PeakHasher(workers=4, max_queue=4, bulk_slice=2)
+    try:
+        assert hasher.bulk_workers == 1
+        hashes = asyncio.run(hasher.hash_many([f"senha{i}" for i in range(5)]))
+        assert len(hashes) == 5
+        assert asyncio.run(hasher.verify("senha3", hashes[3])) is True
+        assert hasher.stats()["hash_many_seconds"]["count"] == 3
+        assert hasher.peak == 1
+    finally:
+        hasher.shutdown()
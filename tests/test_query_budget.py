@@ -0,0 +1,90 @@
+import asyncio
+import inspect
+import logging
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from services.query_budget import (
+    QueryBudgetExceeded, count_queries, query_budget, route_budget
+)
+
+
+@pytest.fixture(scope="module")
+def engine():
+    engine = create_engine("sqlite://")
+    yield engine
+    engine.dispose()
+
+
+def run_selects(engine, n):
+    with engine.connect() as conn:
+        for i in range(n):
+            conn.execute(text(f"SELECT {i}"))
+
+
+def test_within_budget_is_silent(engine, caplog):
+    with caplog.at_level(logging.WARNING, logger="services.query_budget"):
+        with query_budget(2, strict=True) as tracker:
+            run_selects(engine, 2)
+    assert tracker.count == 2
+    assert tracker.offending == []
+    assert caplog.records == []
+
+
+def test_over_budget_logs_statements(engine, caplog):
+    with caplog.at_level(logging.WARNING, logger="services.query_budget"):
+        with query_budget(1, name="listagem", strict=False):
+            run_selects(engine, 3)
+    report = caplog.records[0].getMessage()
+    assert report.startswith("listagem: 3 statements (budget 1)")
+    assert "SELECT 2" in report
+
+
+def test_strict_raises_with_offending_stack(engine):
+    with pytest.raises(QueryBudgetExceeded) as excinfo:
+        with query_budget(1, strict=True) as tracker:
+            run_selects(engine, 2)
+    assert [statement for statement, _ in tracker.offending] == ["SELECT 1"]
+    assert "run_selects" in str(excinfo.value)
+
+
+def test_async_stack_reaches_the_caller():
+    async def load_twice():
+        engine = create_async_engine("sqlite+aiosqlite://")
+        try:
+            with query_budget(1, strict=False) as tracker:
+                async with engine.connect() as conn:
+                    await conn.execute(text("SELECT 1"))
+                    await conn.execute(text("SELECT 2"))
+        finally:
+            await engine.dispose()
+        return tracker
+
+    tracker = asyncio.run(load_twice())
+    _, stack = tracker.offending[0]
+    assert any(frame.name == "load_twice" for frame in stack)
+
+
+def test_route_budget_keeps_the_signature(engine, caplog):
+    @route_budget(0)
+    async def endpoint(pacient_id: int, limit: int = 10):
+        run_selects(engine, 1)
+        return pacient_id
+
+    assert endpoint.query_budget == 0
+    assert list(inspect.signature(endpoint).parameters) == ["pacient_id", "limit"]
+    with caplog.at_level(logging.WARNING, logger="services.query_budget"):
+        assert asyncio.run(endpoint(7)) == 7
+    assert "endpoint: 1 statements (budget 0)" in caplog.records[0].getMessage()
+
+
+def test_count_queries_sees_other_threads(engine):
+    def worker():
+        run_selects(engine, 2)
+
+    async def in_thread():
+        await asyncio.to_thread(worker)
+
+    with count_queries() as tracker:
+        asyncio.run(in_thread())
+    assert tracker.count == 2
@@ -0,0 +1,58 @@
+import pytest
+from services.rate_limiter import LoginLimiter, TokenBucketLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def test_burst_then_refill(clock):
+    limiter = TokenBucketLimiter(burst=3, per_minute=6, clock=clock)
+    assert [limiter.hit("a") for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert limiter.hit("a") == pytest.approx(10.0)
+    assert limiter.hit("b") == 0.0
+
+    clock.now += 10
+    assert limiter.hit("a") == 0.0
+    assert limiter.hit("a") > 0
+    assert limiter.stats()["rejected"] == 2
+
+
+def test_idle_buckets_are_evicted(clock):
+    limiter = TokenBucketLimiter(burst=2, per_minute=60, shards=1, clock=clock)
+    for key in ("a", "b", "c"):
+        limiter.hit(key)
+    assert len(limiter) == 3
+
+    clock.now += limiter.idle_ttl
+    limiter.hit("d")
+    assert len(limiter) == 1
+
+
+def test_login_limiter_checks_ip_before_cpf(monkeypatch):
+    monkeypatch.setenv("LOGIN_IP_BURST", "2")
+    monkeypatch.setenv("LOGIN_CPF_BURST", "5")
+    limiter = LoginLimiter()
+    assert limiter.check("10.0.0.1", "12345678901") == 0
+    assert limiter.check("10.0.0.1", "12345678901") == 0
+    assert limiter.check("10.0.0.1", "12345678901") > 0
+    # The refused attempt never reached the CPF bucket.
+    assert limiter.by_cpf.stats()["rejected"] == 0
+    assert limiter.by_ip.stats()["rejected"] == 1
+    assert LoginLimiter.retry_after_header(0.2) == "1"
+
+def test_cpf_formatting_variants_share_a_bucket(monkeypatch):
+    monkeypatch.setenv("LOGIN_CPF_BURST", "3")
+    limiter = LoginLimiter()
+    variants = ["12345678901", "123.456.789-01", " 1x2345678901", "123456789-01"]
+    assert [limiter.check(f"10.0.0.{i}", cpf) == 0
+            for i, cpf in enumerate(variants)] == [True, True, True, False]
@@ -0,0 +1,117 @@
+import time
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError, TimeoutError
+from sqlalchemy.orm import Session
+from database.database import Base, get_replica_stats
+from database.routing import LAST_WRITE_HEADER, ReplicaSet, is_replica_failure, wrote_recently
+from main import app
+from models.pacient_model import Pacient
+from services.auth_service import get_current_user
+from services.entity_cache import entity_cache
+
+
+RECEPTIONIST = {"Authorization": "Bearer recepcionista"}
+DOCTOR = {"Authorization": "Bearer medico"}
+
+
+def make_database(path, *pacient_ids):
+    url = f"sqlite:///{path}"
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add_all(Pacient(
+            id=pacient_id, full_name=f"Paciente {pacient_id}", birth_date="01012000",
+            cpf=f"{pacient_id:011d}", hashed_password="fakehash", gender="Feminino",
+            phone_number="11999999999", address="Rua Teste"
+        ) for pacient_id in pacient_ids)
+        session.commit()
+    engine.dispose()
+    return url
+
+
+@pytest.fixture
+def routed_client(tmp_path, monkeypatch):
+    # Two unrelated SQLite files: whatever only the replica holds proves
+    # the read went there.
+    primary = make_database(tmp_path / "primary.db", 1)
+    replica = make_database(tmp_path / "replica.db", 1, 2)
+    monkeypatch.setenv("DATABASE_URL", primary)
+    monkeypatch.setenv("DATABASE_REPLICA_URLS", replica)
+    monkeypatch.delenv("ASYNC_DATABASE_URL", raising=False)
+    monkeypatch.setattr(app, "dependency_overrides", {
+        get_current_user: lambda: {"username": "john doe", "role": "RECEPCIONISTA"}})
+    # Routing is what is under test, not the cache in front of it.
+    monkeypatch.setattr(entity_cache, "enabled", False)
+    with TestClient(app) as client:
+        yield client
+
+
+def test_reads_go_to_the_replica(routed_client):
+    assert routed_client.get("/patients/2", headers=DOCTOR).status_code == 200
+    assert routed_client.get("/patients/search-patient", params={"id": 2},
+                             headers=DOCTOR).status_code == 200
+
+
+def test_writer_reads_from_the_primary(routed_client):
+    response = routed_client.post("/patients/add-new-patient", headers=RECEPTIONIST, json={
+        "full_name": "Paciente Novo", "birth_date": "01012000", "cpf": "11122233381",
+        "hashed_password": "senha123", "gender": "Feminino",
+        "phone_number": "11999999999", "address": "Rua X"})
+    assert response.status_code == 201
+    last_write = response.headers[LAST_WRITE_HEADER]
+    assert routed_client.cookies["last_write"] == last_write
+
+    # Whichever worker serves it, the cookie sends the read to the primary.
+    params = {"cpf": "11122233381"}
+    assert routed_client.get("/patients/search-patient", params=params,
+                             headers=RECEPTIONIST).status_code == 200
+    routed_client.cookies.clear()
+    assert routed_client.get("/patients/search-patient", params=params,
+                             headers=DOCTOR).status_code == 404
+    assert routed_client.get("/patients/search-patient", params=params, headers={
+        **DOCTOR, LAST_WRITE_HEADER: last_write}).status_code == 200
+    assert get_replica_stats()["pinned_reads"] == 2
+
+
+def test_unreachable_replica_fails_over(tmp_path, monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", make_database(tmp_path / "primary.db", 1))
+    monkeypatch.setenv("DATABASE_REPLICA_URLS", f"sqlite:///{tmp_path / 'missing' / 'replica.db'}")
+    monkeypatch.delenv("ASYNC_DATABASE_URL", raising=False)
+    monkeypatch.setattr(app, "dependency_overrides", {
+        get_current_user: lambda: {"username": "john doe", "role": "DOCTOR"}})
+    with TestClient(app) as client:
+        assert client.get("/patients/1", headers=DOCTOR).status_code == 200
+        assert client.get("/patients/1", headers=DOCTOR).status_code == 200
+        stats = get_replica_stats()
+    assert stats["up"] == {"replica-0": False}
+    assert stats["failovers"] == 1
+
+
+def test_replicas_rotate_and_skip_failed_ones():
+    a, b, c = object(), object(), object()
+    replicas = ReplicaSet([a, b, c], retry_seconds=60)
+    assert [replicas.candidates()[0] for _ in range(4)] == [a, b, c, a]
+
+    replicas.mark_down(b)
+    assert all(b not in replicas.candidates() for _ in range(3))
+    replicas.retry_seconds = 0
+    replicas.mark_down(b)
+    assert b in replicas.candidates()
+
+
+def test_recent_writes_expire():
+    now = time.time()
+    assert wrote_recently(str(now - 5), window=10, now=now)
+    assert not wrote_recently(str(now - 11), window=10, now=now)
+    assert not wrote_recently(str(now + 60), window=10, now=now)
+    assert not wrote_recently("ontem", window=10, now=now)
+    assert not wrote_recently(None, window=10, now=now)
+    assert not wrote_recently(str(now), window=0, now=now)
+
+
+def test_only_connection_errors_take_a_replica_out():
+    assert is_replica_failure(OperationalError("SELECT 1", {}, Exception("recusada")))
+    assert is_replica_failure(ConnectionRefusedError())
+    assert not is_replica_failure(TimeoutError("pool ocupado"))
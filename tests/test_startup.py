@@ -0,0 +1,64 @@
+import subprocess
+import sys
+from pathlib import Path
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from database import database
+from database.readiness import expected_heads
+from main import app
+
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+
+def test_import_opens_no_connections():
+    check = ("import main\n"
+             "from database import database\n"
+             "assert database._engines.sync is None\n"
+             "assert database._engines.asynchronous is None\n")
+    subprocess.run([sys.executable, "-c", check], cwd=PROJECT_ROOT, check=True)
+
+
+def test_expected_heads_match_alembic():
+    from alembic.config import Config
+    from alembic.script import ScriptDirectory
+
+    config = Config(str(PROJECT_ROOT / "alembic.ini"))
+    config.set_main_option("script_location", str(PROJECT_ROOT / "migrations"))
+    assert expected_heads() == frozenset(ScriptDirectory.from_config(config).get_heads())
+
+
+@pytest.fixture
+def sqlite_url(tmp_path, monkeypatch):
+    url = f"sqlite:///{tmp_path / 'ready.db'}"
+    monkeypatch.setenv("DATABASE_URL", url)
+    monkeypatch.delenv("ASYNC_DATABASE_URL", raising=False)
+    yield url
+    assert database._engines.asynchronous is None
+
+
+def test_ready_waits_for_migrations(sqlite_url):
+    with TestClient(app) as client:
+        response = client.get("/ready")
+        assert response.status_code == 503
+        assert response.json()["detail"] == "Migrações pendentes."
+
+        engine = create_engine(sqlite_url)
+        with engine.begin() as conn:
+            conn.execute(text("CREATE TABLE alembic_version (version_num VARCHAR(32) NOT NULL)"))
+            for head in expected_heads():
+                conn.execute(text("INSERT INTO alembic_version VALUES (:head)"), {"head": head})
+        engine.dispose()
+
+        response = client.get("/ready")
+        assert response.status_code == 200
+        assert response.json() == {"ready": True, "revision": sorted(expected_heads())}
+
+
+def test_ready_reports_unreachable_database(tmp_path, monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'missing' / 'ready.db'}")
+    with TestClient(app) as client:
+        response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json() == {"ready": False, "detail": "Banco de dados indisponível."}
@@ -0,0 +1,86 @@
+import asyncio
+import time
+from datetime import timedelta
+import pytest
+from fastapi import HTTPException
+from services.auth_service import (
+    create_access_token, get_current_user, revoke_token, revoke_user_tokens
+)
+from services.token_cache import TokenCache, token_cache
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    token_cache.clear()
+    yield
+    token_cache.clear()
+
+
+def make_token(cpf="12345678901", minutes=30):
+    return create_access_token(cpf=cpf, role="DOCTOR", user_id=1,
+                               username="dr_teste",
+                               expires_delta=timedelta(minutes=minutes))
+
+
+def test_second_lookup_is_a_hit():
+    token = make_token()
+    first = asyncio.run(get_current_user(token))
+    second = asyncio.run(get_current_user(token))
+    assert first == second == {"cpf": "12345678901", "id": 1,
+                               "role": "DOCTOR", "username": "dr_teste"}
+    assert token_cache.stats()["hits"] == 1
+    assert token_cache.stats()["misses"] == 1
+
+
+def test_revoked_token_is_rejected():
+    token = make_token()
+    asyncio.run(get_current_user(token))
+    revoke_token(token)
+    assert len(token_cache) == 0
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(get_current_user(token))
+    assert exc.value.status_code == 401
+
+
+def test_revoke_user_purges_all_tokens():
+    token = make_token()
+    asyncio.run(get_current_user(token))
+    revoke_user_tokens("12345678901")
+    with pytest.raises(HTTPException):
+        asyncio.run(get_current_user(token))
+
+
+def test_revocations_are_forgotten_once_their_tokens_expire(monkeypatch):
+    cache = TokenCache()
+    now = time.time()
+    cache.revoke("a", now + 60)
+    cache.revoke_subject("123", now + 60)
+    assert cache.is_revoked("a", None, None)
+    assert cache.is_revoked("b", "123", int(now))
+    assert cache.stats()["revoked_subjects"] == 1
+
+    monkeypatch.setattr(time, "time", lambda: now + 61)
+    assert not cache.is_revoked("a", None, None)
+    assert cache.stats()["revoked"] == cache.stats()["revoked_subjects"] == 0
+
+
+def test_subject_cutoff_uses_whole_second_iat(monkeypatch):
+    monkeypatch.setattr(time, "time", lambda: 1000.5)
+    cache = TokenCache()
+    cache.revoke_subject("123", 1060)
+    # iat is truncated to the second: a token issued in the revoking second
+    # cannot be told apart from an older one, so it goes too.
+    assert cache.is_revoked("a", "123", 1000)
+    assert not cache.is_revoked("a", "123", 1001)
+
+
+def test_entries_expire_and_size_is_bounded():
+    cache = TokenCache(max_size=2)
+    cache.put("a", {"cpf": "1"}, time.time() - 1)
+    assert cache.get("a") is None
+
+    for token in ("b", "c", "d"):
+        cache.put(token, {"cpf": token}, time.time() + 60)
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("d") == {"cpf": "d"}
@@ -0,0 +1,31 @@
+from services.trigram import TrigramIndex, normalize_name, similarity
+
+
+def test_normalize_name_folds_case_and_accents():
+    assert normalize_name("  JOÃO  da Conceição ") == "joao da conceicao"
+
+
+def test_similarity_matches_pg_trgm():
+    assert similarity("word", "word") == 1.0
+    assert round(similarity("word", "two words"), 6) == 0.363636
+
+
+def test_index_search_partial_and_ranked():
+    index = TrigramIndex()
+    index.load([(1, "João da Silva"), (2, "Silvana Souza"), (3, "Pedro Alves")])
+
+    assert [key for key, *_ in index.search("joao silva")] == [1]
+    assert [key for key, *_ in index.search("silva")] == [1, 2]
+    assert index.search("xyz") == []
+
+
+def test_index_add_replaces_and_remove():
+    index = TrigramIndex()
+    index.add(1, "Ana Paula")
+    index.add(1, "Beatriz Costa")
+    assert index.search("ana paula") == []
+    assert [key for key, *_ in index.search("beatriz")] == [1]
+
+    index.remove(1)
+    assert index.search("beatriz") == []
+    assert len(index) == 0
@@ -1,19 +1,30 @@
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from database.database import Base, get_db
+from sqlalchemy.pool import NullPool
+from database.database import Base, get_async_db, get_db, get_read_db, to_async_url
 from main import app
 from models.pacient_model import Pacient
 from models.staff_model import Staff
 from models.appointment_model import AppointmentStatus
 from datetime import datetime, timedelta, timezone
 from services.auth_service import get_current_user
+from services.password_hasher import password_hasher
+from services.cpf_crypto import cpf_index
+from services.entity_cache import entity_cache
+from services.name_search import name_index
 from dotenv import load_dotenv
 from sqlalchemy import text
 from services.auth_service import get_current_user
 from models.staff_model import Staff
+import json
 import os
+from contextlib import contextmanager
+from services.query_budget import count_queries
+from services.pacient_import import _integrity_detail
+from sqlalchemy.exc import IntegrityError
 
 load_dotenv()
 
@@ -21,6 +32,13 @@ SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL")
 engine = create_engine(SQLALCHEMY_DATABASE_URL)
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# TestClient runs every request on a fresh event loop, so async connections
+# must not be pooled across requests.
+async_engine = create_async_engine(to_async_url(SQLALCHEMY_DATABASE_URL),
+                                   poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False,
+                                              expire_on_commit=False)
+
 @pytest.fixture(scope="session", autouse=True)
 def setup_database():
     Base.metadata.create_all(bind=engine)
@@ -40,6 +58,8 @@ def db_session():
 def reset_db_postgres():
     with engine.begin() as conn:
         conn.execute(text("TRUNCATE TABLE pacient RESTART IDENTITY CASCADE"))
+    entity_cache.clear()
+    name_index.clear()
     yield
 
 def override_get_db():
@@ -50,6 +70,11 @@ def override_get_db():
         db.close()
 
 
+async def override_get_async_db():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
+
 def fake_current_user():
     return {"username": "john doe", "role": "RECEPCIONISTA"}
 
@@ -58,8 +83,46 @@ client = TestClient(app)
 
 
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_async_db] = override_get_async_db
+app.dependency_overrides[get_read_db] = override_get_async_db
 client = TestClient(app)
 
+
+@pytest.fixture
+def assert_num_queries():
+    # Pins how many statements a request issues; the report lists them.
+    @contextmanager
+    def check(expected):
+        with count_queries() as tracker:
+            yield tracker
+        assert tracker.count == expected, tracker.report()
+    return check
+
+
+def test_pool_stats(monkeypatch):
+    from services import prometheus
+
+    # The app's engines only exist once something has used them.
+    with TestClient(app) as started:
+        started.get("/ready")
+        assert started.get("/pool-stats").status_code == 403
+        monkeypatch.setattr(prometheus, "SCRAPE_TOKEN", "coletor")
+        assert started.get("/pool-stats", headers={"Authorization": "Bearer outro"}).status_code == 403
+        response = started.get("/pool-stats", headers={"Authorization": "Bearer coletor"})
+    assert response.status_code == 200
+    stats = response.json()["async"]
+    assert stats["size"] == 10
+    assert stats["checked_out"] >= 0
+    assert stats["checkout_seconds"]["count"] > 0
+
+
+def test_lifespan_stops_the_password_hasher():
+    with TestClient(app) as started:
+        started.portal.call(password_hasher.hash, "senha123")
+        assert password_hasher._executor is not None
+    assert password_hasher._executor is None
+
+
 def test_search_patient_by_id_not_found(db_session):
     p = create_test_pacient(db_session)
     response = client.get(f"/patients/search-patient?id=9999")
@@ -132,6 +195,137 @@ def test_search_patient_by_name_multiple_results(db_session):
     assert data[1]["full_name"] == p2.full_name
 
 
+def test_search_patient_by_name_ignores_accents(db_session):
+    p = create_test_pacient(db_session)
+    p.full_name = "João da Silva"
+    db_session.commit()
+
+    response = client.get("/patients/search-patient?name=joao silva")
+    assert response.status_code == 200
+    data = response.json()
+    assert [d["id"] for d in data] == [p.id]
+
+
+def test_search_patient_by_name_ranks_closest_first(db_session):
+    p = create_test_pacient(db_session)
+    p2 = create_test_pacient2(db_session)
+    p.full_name = "Maria Souza Lima"
+    p2.full_name = "Maria Souza"
+    db_session.commit()
+
+    response = client.get("/patients/search-patient?name=maria souza")
+    assert response.status_code == 200
+    data = response.json()
+    assert [d["id"] for d in data] == [p2.id, p.id]
+
+
+def test_search_patient_keyset_pagination(db_session):
+    p = create_test_pacient(db_session)
+    p2 = create_test_pacient2(db_session)
+
+    response = client.get(f"/patients/search-patient?name={p.full_name}&limit=1")
+    assert response.status_code == 200
+    assert [d["id"] for d in response.json()] == [p.id]
+    cursor = response.headers["X-Next-Cursor"]
+
+    response = client.get(f"/patients/search-patient?name={p.full_name}&limit=1&cursor={cursor}")
+    assert response.status_code == 200
+    assert [d["id"] for d in response.json()] == [p2.id]
+    assert "X-Next-Cursor" not in response.headers
+
+
+def add_named_pacients(db, *names):
+    pacients = [Pacient(id=20 + i, full_name=name, birth_date="01012000", cpf=f"{70000000000 + i}",
+                        hashed_password="fakehash", gender="Feminino",
+                        phone_number="11999999999", address="Rua Teste")
+                for i, name in enumerate(names)]
+    db.add_all(pacients)
+    db.commit()
+    return pacients
+
+
+def test_search_patient_by_name_and_id_beyond_the_first_page(db_session):
+    *_, last = add_named_pacients(db_session, "Maria Silva", "Maria Silva", "Maria Silva",
+                                  "Maria Silva", "Maria Silva Pereira Santos")
+    for params in ({"id": last.id}, {"cpf": last.cpf}):
+        response = client.get("/patients/search-patient",
+                              params={"name": "maria silva", "limit": 2, **params})
+        assert response.status_code == 200
+        assert [d["id"] for d in response.json()] == [last.id]
+
+    response = client.get("/patients/search-patient/stream",
+                          params={"name": "maria silva", "id": last.id})
+    assert [json.loads(line)["id"] for line in response.text.splitlines()] == [last.id]
+
+
+def test_search_patient_pages_skip_rows_deleted_elsewhere(db_session):
+    pacients = add_named_pacients(db_session, "Ana Costa", "Ana Costa", "Ana Costa Lima")
+    assert len(client.get("/patients/search-patient", params={"name": "ana costa"}).json()) == 3
+
+    # Deleted without the ORM, as another worker's delete looks from here.
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM pacient WHERE id = :id"), {"id": pacients[0].id})
+    response = client.get("/patients/search-patient", params={"name": "ana costa", "limit": 1})
+    assert [d["id"] for d in response.json()] == [pacients[1].id]
+    response = client.get("/patients/search-patient", params={
+        "name": "ana costa", "limit": 1, "cursor": response.headers["X-Next-Cursor"]})
+    assert [d["id"] for d in response.json()] == [pacients[2].id]
+
+
+def test_search_patient_sees_other_workers_writes(db_session, monkeypatch):
+    from services import name_search
+    from services.cpf_crypto import encrypt_cpf
+
+    pacient, = add_named_pacients(db_session, "Bruno Alves")
+    assert client.get("/patients/search-patient", params={"name": "bruno alves"}).status_code == 200
+
+    # Written without the ORM, as another worker's insert and rename look from here.
+    monkeypatch.setattr(name_search, "REFRESH_SECONDS", 0)
+    with engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO pacient (id, full_name, birth_date, cpf, hashed_password, version_id) "
+            "VALUES (40, 'Carla Nunes', '01012000', :cpf, 'fakehash', 1)"),
+            {"cpf": encrypt_cpf("70000000040")})
+        conn.execute(text("UPDATE pacient SET full_name = 'Bruno Rocha' WHERE id = :id"),
+                     {"id": pacient.id})
+        conn.execute(text(
+            "INSERT INTO pacient_change_set (pacient_id, version_id, changes, changed_by) "
+            "VALUES (:id, 2, '{}', 'outro'), (40, 1, '{}', 'outro')"), {"id": pacient.id})
+
+    response = client.get("/patients/search-patient", params={"name": "carla nunes"})
+    assert [d["id"] for d in response.json()] == [40]
+    response = client.get("/patients/search-patient", params={"name": "bruno rocha"})
+    assert [d["id"] for d in response.json()] == [pacient.id]
+
+
+def test_search_patient_invalid_cursor(db_session):
+    create_test_pacient(db_session)
+    response = client.get("/patients/search-patient?cursor=invalido")
+    assert response.status_code == 400
+
+
+def test_stream_patients_ndjson(db_session):
+    p = create_test_pacient(db_session)
+    p2 = create_test_pacient2(db_session)
+
+    response = client.get(f"/patients/search-patient/stream?name={p.full_name}")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["id"] for line in lines] == [p.id, p2.id]
+
+
+def test_stream_patients_pages_past_one_batch(db_session, monkeypatch):
+    from routers import pacients
+
+    p = create_test_pacient(db_session)
+    p2 = create_test_pacient2(db_session)
+    monkeypatch.setattr(pacients, "STREAM_BATCH_SIZE", 1)
+
+    response = client.get(f"/patients/search-patient/stream?name={p.full_name}")
+    assert [json.loads(line)["id"] for line in response.text.splitlines()] == [p.id, p2.id]
+
+
 @pytest.mark.parametrize("cpf", ["11122233381", "49572057207"])
 def test_add_new_pacient(cpf):
     payload = {
@@ -250,8 +444,73 @@ def test_update_pacient_success(db_session):
 
 
 
+def test_login_with_hashed_password(db_session):
+    payload = {"username": "login_teste", "hashed_password": "senha123",
+               "cpf": "70080090011", "role": "RECEPCIONISTA"}
+    response = client.post("/auth/create-new-staff-member", json=payload)
+    assert response.status_code == 201
+
+    response = client.post("/auth/login", data={"username": "70080090011",
+                                                 "password": "senha123"})
+    assert response.status_code == 200
+    assert response.json()["token_type"] == "bearer"
+
+    response = client.post("/auth/login", data={"username": "70080090011",
+                                                 "password": "errada"})
+    assert response.status_code == 401
+
+
+def test_login_as_pacient(db_session):
+    payload = {
+        "full_name": "Paciente Login",
+        "birth_date": "01012000",
+        "cpf": "80090010022",
+        "hashed_password": "senha123",
+        "gender": "Feminino",
+        "phone_number": "11988887777",
+        "address": "Rua Nova",
+    }
+    response = client.post("/patients/add-new-patient", json=payload)
+    assert response.status_code == 201
+
+    response = client.post("/auth/login", data={"username": "80090010022",
+                                                 "password": "senha123"})
+    assert response.status_code == 200
+
+
+def test_login_unknown_cpf_still_verifies(db_session):
+    before = password_hasher.stats()["verify_seconds"]["count"]
+    response = client.post("/auth/login", data={"username": "00000000000",
+                                                 "password": "senha123"})
+    assert response.status_code == 401
+    assert password_hasher.stats()["verify_seconds"]["count"] == before + 1
+
+
+def test_login_flood_is_refused_before_bcrypt(db_session):
+    from services.rate_limiter import login_limiter
+    before = password_hasher.stats()["verify_seconds"]["count"]
+    try:
+        statuses = [client.post("/auth/login", data={"username": "00000000009",
+                                                      "password": "errada"})
+                    for _ in range(login_limiter.by_cpf.burst + 1)]
+    finally:
+        login_limiter.clear()
+    assert [r.status_code for r in statuses[:-1]] == [401] * login_limiter.by_cpf.burst
+    assert statuses[-1].status_code == 429
+    assert int(statuses[-1].headers["Retry-After"]) >= 1
+    verified = password_hasher.stats()["verify_seconds"]["count"] - before
+    assert verified == login_limiter.by_cpf.burst
+
+
 def test_inactivate_patient(db_session):
+    import asyncio
+    from fastapi import HTTPException
+    from services.auth_service import create_access_token
+    from services.token_cache import token_cache
+
     p = create_test_pacient(db_session, cpf="33344455566")
+    token = create_access_token(cpf=p.cpf, role="PACIENT", user_id=p.id,
+                                username=p.full_name, expires_delta=timedelta(minutes=30))
     payload = {"reason": "Motivo Teste"}
     response = client.post(f"/patients/inactivate-patient/{p.id}", json=payload)
     assert response.status_code == 200
@@ -259,6 +518,11 @@ def test_inactivate_patient(db_session):
     assert data["pacient_id"] == p.id
     assert data["inactivated_by"]
 
+    # The patient's own session ends with the registration.
+    with pytest.raises(HTTPException):
+        asyncio.run(get_current_user(token))
+    token_cache.clear()
+
 
 
 def test_schedule_appointment(db_session):
@@ -284,4 +548,646 @@ def test_schedule_appointment(db_session):
     data = response.json()
     assert data["pacient_id"] == p.id
     assert data["doctor_id"] == doctor.id
-    assert data["status"] == AppointmentStatus.SCHEDULED.value
\ No newline at end of file
+    assert data["status"] == AppointmentStatus.SCHEDULED.value
+
+def test_import_pacients_csv(db_session):
+    create_test_pacient(db_session, cpf="12345678901")
+    body = (
+        "full_name,birth_date,cpf,hashed_password,gender,phone_number,address,email\n"
+        "Paciente Um,01012000,10020030040,senha123,Feminino,11988887777,Rua Nova,\n"
+        "Paciente Dois,01012000,12345678901,senha123,Feminino,11988887777,Rua Nova,\n"
+        "Paciente Tres,01012000,10020030041,12,Feminino,11988887777,Rua Nova,\n"
+        "Paciente Quatro,01012000,10020030040,senha123,Feminino,11988887777,Rua Nova,\n"
+        "\"Paciente, Cinco\",01012000,10020030042,senha123,Feminino,11988887777,\"Rua\n"
+        "Nova\",a@b.com\n"
+    )
+    response = client.post("/patients/import-patients", content=body,
+                           headers={"Content-Type": "text/csv"})
+    assert response.status_code == 200
+    report = response.json()
+    assert report["imported"] == 2
+    assert [(e["row"], e["detail"]) for e in report["errors"]][0] == (2, "CPF já cadastrado.")
+    assert [e["row"] for e in report["errors"]] == [2, 3, 4]
+
+    imported = db_session.query(Pacient).filter(Pacient.cpf_hash == cpf_index("10020030042")).one()
+    assert imported.cpf == "10020030042"
+    assert imported.full_name == "Paciente, Cinco"
+    assert imported.normalized_name == "paciente cinco"
+
+
+def test_import_pacients_ndjson(db_session):
+    rows = [
+        {"full_name": "Paciente Json", "birth_date": "01012000", "cpf": "20030040050",
+         "hashed_password": "senha123", "gender": "Masculino",
+         "phone_number": "11988887777", "address": "Rua Nova"},
+    ]
+    body = "\n".join(json.dumps(r) for r in rows) + "\nnao e json\n"
+    response = client.post("/patients/import-patients", content=body,
+                           headers={"Content-Type": "application/x-ndjson"})
+    assert response.status_code == 200
+    report = response.json()
+    assert report["imported"] == 1
+    assert report["errors"] == [{"row": 2, "cpf": None, "detail": "Linha malformada."}]
+
+    response = client.get("/patients/search-patient?name=paciente json")
+    assert [d["cpf"] for d in response.json()] == ["20030040050"]
+
+
+def test_import_pacients_unsupported_type(db_session):
+    response = client.post("/patients/import-patients", content="{}",
+                           headers={"Content-Type": "application/xml"})
+    assert response.status_code == 415
+
+
+def test_import_failures_name_the_violated_constraint(db_session):
+    pacient = create_test_pacient(db_session, cpf="30040050060")
+    columns = "full_name, birth_date, cpf, cpf_hash, hashed_password, version_id"
+    for copied, detail in (("id, " + columns, "Restrição violada: pacient_pkey."),
+                           (columns, "CPF já cadastrado.")):
+        statement = text(f"INSERT INTO pacient ({copied}) SELECT {copied} FROM pacient WHERE id = :id")
+        with pytest.raises(IntegrityError) as exc:
+            db_session.execute(statement, {"id": pacient.id})
+        db_session.rollback()
+        assert _integrity_detail(exc.value) == detail
+
+
+def create_test_doctor(db, username, cpf):
+    doctor = Staff(username=username, cpf=cpf, hashed_password="hsuhd82731", role="DOCTOR")
+    db.add(doctor)
+    db.commit()
+    db.refresh(doctor)
+    return doctor
+
+
+def test_schedule_batch_recurrence(db_session):
+    p = create_test_pacient(db_session, cpf="44455566688")
+    doctor = create_test_doctor(db_session, "Dr. Lote", "99988871001")
+    start = (datetime.now(timezone.utc) + timedelta(days=1)).replace(microsecond=0)
+
+    payload = {"pacient_id": p.id, "doctor_id": doctor.id,
+               "recurrence": {"start": start.isoformat(), "count": 4}}
+    response = client.post("/appointments/schedule-batch", json=payload)
+    assert response.status_code == 201
+    data = response.json()
+    assert len(data["scheduled"]) == 4
+    assert data["conflicts"] == []
+
+    response = client.post("/appointments/schedule-batch", json=payload)
+    assert response.status_code == 409
+    assert len(response.json()["conflicts"]) == 4
+
+
+def test_schedule_batch_skip_conflicts(db_session):
+    p = create_test_pacient(db_session, cpf="44455566699")
+    doctor = create_test_doctor(db_session, "Dr. Conflito", "99988871002")
+    first = (datetime.now(timezone.utc) + timedelta(days=2)).replace(microsecond=0)
+    second = first + timedelta(hours=1)
+
+    response = client.post("/appointments/schedule-appointment", json={
+        "pacient_id": p.id, "doctor_id": doctor.id, "scheduled_at": first.isoformat()})
+    assert response.status_code == 201
+
+    response = client.post("/appointments/schedule-batch", json={
+        "pacient_id": p.id, "doctor_id": doctor.id, "skip_conflicts": True,
+        "slots": [first.isoformat(), second.isoformat()]})
+    assert response.status_code == 201
+    data = response.json()
+    assert [a["scheduled_at"][:19] for a in data["scheduled"]] == [second.isoformat()[:19]]
+    assert len(data["conflicts"]) == 1
+
+
+def test_schedule_batch_rejects_past_slots(db_session):
+    p = create_test_pacient(db_session, cpf="44455566600")
+    past = (datetime.now(timezone.utc) - timedelta(days=1)).isoformat()
+    response = client.post("/appointments/schedule-batch", json={
+        "pacient_id": p.id, "doctor_id": 1, "slots": [past]})
+    assert response.status_code == 422
+
+
+def test_doctor_availability(db_session):
+    from services.availability import CLINIC_TIMEZONE
+
+    p = create_test_pacient(db_session, cpf="44455566611")
+    doctor = create_test_doctor(db_session, "Dr. Agenda", "99988871003")
+    day = (datetime.now(CLINIC_TIMEZONE) + timedelta(days=2)).date()
+    ten = datetime(day.year, day.month, day.day, 10, 0, tzinfo=CLINIC_TIMEZONE)
+
+    params = {"doctor_id": doctor.id, "start_date": day.isoformat(),
+              "end_date": day.isoformat(), "slot_minutes": 30}
+    response = client.get("/appointments/availability", params=params)
+    assert response.status_code == 200
+    slots = [datetime.fromisoformat(s) for s in response.json()["slots"]]
+    assert ten in slots
+    assert len(slots) == 20
+
+    response = client.post("/appointments/schedule-appointment", json={
+        "pacient_id": p.id, "doctor_id": doctor.id, "scheduled_at": ten.isoformat()})
+    assert response.status_code == 201
+
+    response = client.get("/appointments/availability", params=params)
+    slots = [datetime.fromisoformat(s) for s in response.json()["slots"]]
+    assert ten not in slots
+    assert ten - timedelta(minutes=30) in slots
+    assert ten + timedelta(minutes=30) in slots
+    assert len(slots) == 19
+
+
+def test_doctor_availability_invalid_range(db_session):
+    response = client.get("/appointments/availability", params={
+        "doctor_id": 1, "start_date": "2030-01-10", "end_date": "2030-01-01"})
+    assert response.status_code == 400
+
+
+def test_doctor_agenda_pagination(db_session):
+    p = create_test_pacient(db_session, cpf="44455566622")
+    doctor = create_test_doctor(db_session, "Dr. Paginado", "99988871004")
+    start = (datetime.now(timezone.utc) + timedelta(days=3)).replace(microsecond=0)
+    response = client.post("/appointments/schedule-batch", json={
+        "pacient_id": p.id, "doctor_id": doctor.id,
+        "recurrence": {"start": start.isoformat(), "interval_days": 1, "count": 5}})
+    assert response.status_code == 201
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2, "start": start.isoformat()}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get(f"/appointments/doctor/{doctor.id}", params=params)
+        assert response.status_code == 200
+        seen += [a["scheduled_at"] for a in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert len(seen) == 5
+    assert seen == sorted(seen)
+
+    response = client.get(f"/appointments/doctor/{doctor.id}", params={
+        "start": start.isoformat(), "end": (start + timedelta(days=2)).isoformat()})
+    assert len(response.json()) == 2
+
+
+def test_pacient_appointments_by_status(db_session):
+    p = create_test_pacient(db_session, cpf="44455566633")
+    doctor = create_test_doctor(db_session, "Dr. Status", "99988871005")
+    start = (datetime.now(timezone.utc) + timedelta(days=1)).replace(microsecond=0)
+    response = client.post("/appointments/schedule-batch", json={
+        "pacient_id": p.id, "doctor_id": doctor.id,
+        "recurrence": {"start": start.isoformat(), "count": 3}})
+    assert response.status_code == 201
+
+    response = client.get(f"/appointments/patient/{p.id}", params={
+        "status": "Agendada", "upcoming": True})
+    assert response.status_code == 200
+    assert len(response.json()) == 3
+    assert all(a["pacient_id"] == p.id for a in response.json())
+
+    response = client.get(f"/appointments/patient/{p.id}", params={"status": "Cancelada"})
+    assert response.json() == []
+
+    response = client.get("/appointments/patient/999999")
+    assert response.status_code == 404
+
+
+def test_agenda_invalid_cursor(db_session):
+    doctor = create_test_doctor(db_session, "Dr. Cursor", "99988871006")
+    response = client.get(f"/appointments/doctor/{doctor.id}", params={"cursor": "abc"})
+    assert response.status_code == 400
+
+
+def test_pacient_history_change_sets(db_session):
+    from models.pacient_change_set_model import PacientChangeSet
+
+    p = create_test_pacient(db_session, cpf="22233344466")
+    # Converted from the per-field history: the version is unknown.
+    db_session.add(PacientChangeSet(pacient_id=p.id, version_id=None,
+                                    changes={"address": ["a", "b"]}, changed_by="john doe",
+                                    changed_at=datetime(2020, 1, 1, tzinfo=timezone.utc)))
+    db_session.commit()
+    payload = {"full_name": "Alterado Uma",
+               "birth_date": p.birth_date,
+               "phone_number": p.phone_number,
+               "address": "Montreal",
+               "email": p.email,
+               "version_id": p.version_id}
+    assert client.patch(f"/patients/update-patient/{p.id}", json=payload).status_code == 200
+    payload.update(full_name="Alterado Duas", version_id=p.version_id + 1)
+    assert client.patch(f"/patients/update-patient/{p.id}", json=payload).status_code == 200
+
+    response = client.get(f"/patients/patient-history/{p.id}", params={"limit": 1})
+    assert response.status_code == 200
+    newest = response.json()
+    assert len(newest) == 1
+    assert newest[0]["version_id"] == 3
+    assert newest[0]["changes"] == {"full_name": ["Alterado Uma", "Alterado Duas"]}
+
+    response = client.get(f"/patients/patient-history/{p.id}", params={
+        "limit": 1, "cursor": response.headers["X-Next-Cursor"]})
+    oldest = response.json()
+    assert oldest[0]["version_id"] == 2
+    assert oldest[0]["changes"] == {"full_name": ["Teste User", "Alterado Uma"],
+                                    "address": ["Rua Teste", "Montreal"]}
+    assert oldest[0]["changed_by"]
+
+    response = client.get(f"/patients/patient-history/{p.id}", params={
+        "limit": 1, "cursor": response.headers["X-Next-Cursor"]})
+    assert [(c["version_id"], c["changes"]) for c in response.json()] == [
+        (None, {"address": ["a", "b"]})]
+    assert "X-Next-Cursor" not in response.headers
+
+
+def test_update_pacient_returns_new_version(db_session):
+    p = create_test_pacient(db_session, cpf="22233344477")
+    payload = {"full_name": "Alterado",
+               "birth_date": "01012003",
+               "phone_number": "91912345678",
+               "address": "Montreal",
+               "version_id": p.version_id}
+    response = client.patch(f"/patients/update-patient/{p.id}", json=payload)
+    assert response.json()["version_id"] == p.version_id + 1
+
+    response = client.patch(f"/patients/update-patient/{p.id}", json=payload)
+    assert response.status_code == 409
+
+
+def test_pacient_version_check_is_atomic(db_session):
+    from sqlalchemy.orm.exc import StaleDataError
+
+    p = create_test_pacient(db_session, cpf="22233344488")
+    other = TestingSessionLocal()
+    try:
+        rival = other.get(Pacient, p.id)
+        rival.address = "Outro endereço"
+        other.commit()
+    finally:
+        other.close()
+
+    # db_session still holds the old version; its UPDATE must match no row.
+    p.address = "Endereço perdido"
+    with pytest.raises(StaleDataError):
+        db_session.commit()
+    db_session.rollback()
+
+
+def test_delete_pacient_cascades_children(db_session):
+    from models.appointment_model import Appointment
+    from models.pacient_change_set_model import PacientChangeSet
+    from models.pacient_inactivation_model import PacientInactivation
+
+    p = create_test_pacient(db_session, cpf="55566677701")
+    doctor = create_test_doctor(db_session, "Dr. Cascata", "99988871007")
+    db_session.add_all([
+        Appointment(pacient_id=p.id, doctor_id=doctor.id,
+                    scheduled_at=datetime.now(timezone.utc) + timedelta(days=1)),
+        PacientInactivation(pacient_id=p.id, reason="Teste", inactivated_by="john doe"),
+        PacientChangeSet(pacient_id=p.id, version_id=2, changes={"address": ["a", "b"]},
+                         changed_by="john doe"),
+    ])
+    db_session.commit()
+
+    pacient_id = p.id
+    response = client.delete(f"/patients/delete-patient/{pacient_id}")
+    assert response.status_code == 200
+
+    db_session.expire_all()
+    for model in (Appointment, PacientInactivation, PacientChangeSet):
+        assert db_session.query(model).filter_by(pacient_id=pacient_id).count() == 0
+
+
+def test_purge_inactive_pacients(db_session):
+    import asyncio
+    from models.pacient_inactivation_model import PacientInactivation
+    from services.pacient_purge import purge_inactive_pacients
+
+    expired = create_test_pacient(db_session, cpf="55566677702")
+    recent = create_test_pacient2(db_session, cpf="55566677703")
+    for pacient, days in ((expired, 400), (recent, 10)):
+        pacient.is_active = False
+        db_session.add(PacientInactivation(
+            pacient_id=pacient.id, reason="Teste", inactivated_by="john doe",
+            inactivated_at=datetime.now(timezone.utc) - timedelta(days=days)))
+    db_session.commit()
+
+    async def purge():
+        async with TestingAsyncSessionLocal() as db:
+            return await purge_inactive_pacients(db, retention_days=365, chunk_size=1)
+
+    expired_id, recent_id = expired.id, recent.id
+    assert asyncio.run(purge()) == 1
+    db_session.expire_all()
+    assert db_session.get(Pacient, expired_id) is None
+    assert db_session.get(Pacient, recent_id) is not None
+
+
+def test_purge_requires_admin(db_session):
+    response = client.post("/patients/purge-inactive")
+    assert response.status_code == 403
+
+
+def test_get_pacient_etag(db_session):
+    p = create_test_pacient(db_session, cpf="66677788801")
+    response = client.get(f"/patients/{p.id}")
+    assert response.status_code == 200
+    assert response.json()["cpf"] == "66677788801"
+    etag = response.headers["ETag"]
+    assert etag == f'"{p.id}-{p.version_id}"'
+
+    response = client.get(f"/patients/{p.id}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+
+    payload = {"full_name": "Alterado",
+               "birth_date": "01012003",
+               "phone_number": "91912345678",
+               "address": "Montreal"}
+    response = client.patch(f"/patients/update-patient/{p.id}", json=payload,
+                            headers={"If-Match": etag})
+    assert response.status_code == 200
+    new_etag = response.headers["ETag"]
+    assert new_etag != etag
+
+    response = client.get(f"/patients/{p.id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] == new_etag
+
+    response = client.patch(f"/patients/update-patient/{p.id}", json=payload,
+                            headers={"If-Match": etag})
+    assert response.status_code == 412
+
+    payload["address"] = "Quebec"
+    response = client.patch(f"/patients/update-patient/{p.id}", json=payload,
+                            headers={"If-Match": "*"})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != new_etag
+
+
+def test_update_pacient_requires_version(db_session):
+    p = create_test_pacient(db_session, cpf="66677788802")
+    payload = {"full_name": "Alterado",
+               "birth_date": "01012003",
+               "phone_number": "91912345678",
+               "address": "Montreal"}
+    response = client.patch(f"/patients/update-patient/{p.id}", json=payload)
+    assert response.status_code == 428
+
+
+def test_get_pacient_not_found(db_session):
+    response = client.get("/patients/999999", headers={"If-None-Match": '"999999-1"'})
+    assert response.status_code == 404
+
+
+def test_metrics_endpoint(db_session, monkeypatch):
+    from services import prometheus
+
+    p = create_test_pacient(db_session, cpf="77788899901")
+    assert client.get(f"/patients/{p.id}").status_code == 200
+
+    assert client.get("/metrics").status_code == 403
+    monkeypatch.setattr(prometheus, "SCRAPE_TOKEN", "coletor")
+    response = client.get("/metrics", headers={"Authorization": "Bearer coletor"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    lines = response.text.splitlines()
+    route = 'method="GET",route="/patients/{pacient_id:int}"'
+    assert any(line.startswith(f"http_requests_total{{{route},status=\"200\"}}") for line in lines)
+    statements = [line for line in lines
+                  if line.startswith(f"http_request_db_statements_sum{{{route}}}")]
+    assert statements and float(statements[0].split()[-1]) >= 1
+    # Every family is declared once, right before its samples.
+    assert len([l for l in lines if l == "# TYPE http_requests_total counter"]) == 1
+
+
+def test_every_route_declares_a_query_budget():
+    from fastapi.routing import APIRoute
+    # Their statement count grows with the payload or the backlog.
+    unbounded = {"/patients/search-patient/stream", "/patients/import-patients",
+                 "/patients/purge-inactive"}
+    missing = [route.path for route in app.routes
+               if isinstance(route, APIRoute) and route.include_in_schema
+               and route.path not in unbounded
+               and not hasattr(route.endpoint, "query_budget")]
+    assert missing == []
+
+
+def test_response_models_keep_the_default_response_class():
+    from fastapi.datastructures import DefaultPlaceholder
+    from fastapi.routing import APIRoute
+    # Any other response class makes FastAPI hand render() a plain dict
+    # instead of letting Pydantic dump the response_model to JSON.
+    overridden = [route.path for route in app.routes
+                  if isinstance(route, APIRoute) and route.response_model is not None
+                  and not isinstance(route.response_class, DefaultPlaceholder)]
+    assert overridden == []
+
+
+def test_query_counts_patient_reads(db_session, assert_num_queries, monkeypatch):
+    from services import name_search
+    monkeypatch.setattr(name_search, "REFRESH_SECONDS", float("inf"))
+    p = create_test_pacient(db_session, cpf="88800000001")
+    pacient_id = p.id
+    client.get("/patients/search-patient", params={"name": "Teste"})
+    entity_cache.clear()
+
+    with assert_num_queries(1):
+        response = client.get(f"/patients/{pacient_id}")
+    # Exact lookups serve the cached row after an index-only version check.
+    with assert_num_queries(1):
+        client.get(f"/patients/{pacient_id}", headers={"If-None-Match": response.headers["ETag"]})
+    with assert_num_queries(1):
+        client.get("/patients/search-patient", params={"id": pacient_id})
+    with assert_num_queries(1):
+        client.get("/patients/search-patient", params={"cpf": "88800000001"})
+    # Without pg_trgm the ranked candidates are checked before the page query.
+    with assert_num_queries(2):
+        client.get("/patients/search-patient", params={"name": "Teste"})
+    with assert_num_queries(1):
+        client.get("/patients/search-patient/stream", params={"id": pacient_id})
+    with assert_num_queries(1):
+        client.get(f"/patients/patient-history/{pacient_id}")
+
+    entity_cache.clear()
+    with assert_num_queries(1):
+        client.get(f"/patients/{pacient_id}", headers={"If-None-Match": response.headers["ETag"]})
+    with assert_num_queries(1):
+        client.get("/patients/search-patient", params={"cpf": "88800000001"})
+
+
+def test_query_counts_patient_writes(db_session, assert_num_queries):
+    p = create_test_pacient(db_session, cpf="88800000002")
+    pacient_id = p.id
+    pacient = {"full_name": "Paciente Contado", "birth_date": "01012000",
+               "cpf": "88800000003", "hashed_password": "senha123", "gender": "Fem",
+               "phone_number": "11999999999", "address": "Rua X"}
+    update = {"full_name": "Alterado", "birth_date": "01012003",
+              "phone_number": "91912345678", "address": "Montreal", "version_id": 1}
+    csv = ("full_name,birth_date,cpf,hashed_password,gender,phone_number,address\n"
+           "Importado Um,01012000,88800000004,senha123,Fem,11999999999,Rua X\n")
+
+    with assert_num_queries(3):
+        client.post("/patients/add-new-patient", json=pacient)
+    with assert_num_queries(2):
+        client.post("/patients/import-patients", content=csv,
+                    headers={"content-type": "text/csv"})
+    with assert_num_queries(3):
+        client.patch(f"/patients/update-patient/{pacient_id}", json=update)
+    with assert_num_queries(5):
+        client.post(f"/patients/inactivate-patient/{pacient_id}",
+                    json={"reason": "Motivo Teste"})
+    with assert_num_queries(3):
+        client.delete(f"/patients/delete-patient/{pacient_id}")
+    with assert_num_queries(0):
+        client.post("/patients/purge-inactive")
+
+
+def test_query_counts_appointments(db_session, assert_num_queries):
+    from services.availability import availability_index
+    p = create_test_pacient(db_session, cpf="88800000005")
+    d = create_test_doctor(db_session, "Dr. Contado", "88800000009")
+    pacient_id, doctor_id = p.id, d.id
+    start = (datetime.now(timezone.utc) + timedelta(days=1)).replace(microsecond=0)
+    day = {"doctor_id": doctor_id, "start_date": start.date().isoformat(),
+           "end_date": start.date().isoformat()}
+    availability_index.clear()
+    entity_cache.clear()
+
+    with assert_num_queries(4):
+        client.post("/appointments/schedule-appointment", json={
+            "pacient_id": pacient_id, "doctor_id": doctor_id,
+            "scheduled_at": start.isoformat()})
+    # Bookings always re-read the patient and doctor rows.
+    with assert_num_queries(4):
+        client.post("/appointments/schedule-batch", json={
+            "pacient_id": pacient_id, "doctor_id": doctor_id,
+            "recurrence": {"start": (start + timedelta(hours=1)).isoformat(), "count": 3}})
+    with assert_num_queries(1):
+        client.get("/appointments/availability", params=day)
+    with assert_num_queries(0):
+        client.get("/appointments/availability", params=day)
+    with assert_num_queries(1):
+        client.get(f"/appointments/doctor/{doctor_id}")
+    with assert_num_queries(1):
+        client.get(f"/appointments/patient/{pacient_id}")
+
+
+def test_query_counts_auth(db_session, assert_num_queries):
+    with assert_num_queries(2):
+        response = client.get("/auth/staff-directory")
+    with assert_num_queries(1):
+        client.get("/auth/staff-directory", headers={"If-None-Match": response.headers["ETag"]})
+    # The insert and the staff directory version bump.
+    with assert_num_queries(2):
+        client.post("/auth/create-new-staff-member", json={
+            "cpf": "88800000010", "username": "contado",
+            "hashed_password": "senha123", "role": "DOCTOR"})
+    with assert_num_queries(1):
+        response = client.post("/auth/login", data={"username": "88800000010",
+                                                     "password": "senha123"})
+    with assert_num_queries(0):
+        client.post("/auth/logout",
+                    headers={"Authorization": f"Bearer {response.json()['access_token']}"})
+
+
+def test_cpf_is_encrypted_at_rest(db_session):
+    p = create_test_pacient(db_session, cpf="52998224725")
+    stored = db_session.execute(
+        text("SELECT cpf, cpf_hash FROM pacient WHERE id = :id"), {"id": p.id}
+    ).one()
+    assert "52998224725" not in stored.cpf
+    assert stored.cpf_hash == cpf_index("529.982.247-25")
+
+    response = client.get("/patients/search-patient", params={"cpf": "529.982.247-25"})
+    assert response.status_code == 200
+    assert response.json()[0]["cpf"] == "52998224725"
+
+def test_entity_cache_follows_writes(db_session, assert_num_queries):
+    p = create_test_pacient(db_session, cpf="88800000020")
+    d = create_test_doctor(db_session, "Dr. Cache", "88800000021")
+    pacient_id, doctor_id = p.id, d.id
+    assert client.get(f"/patients/{pacient_id}").status_code == 200
+
+    response = client.patch(f"/patients/update-patient/{pacient_id}", json={
+        "full_name": "Nome Novo", "birth_date": "01012003",
+        "phone_number": "91912345678", "address": "Montreal", "version_id": 1})
+    assert response.status_code == 200
+    with assert_num_queries(1):
+        response = client.get(f"/patients/{pacient_id}")
+    assert response.json()["full_name"] == "Nome Novo"
+    assert response.headers["ETag"] == f'"{pacient_id}-2"'
+    assert entity_cache.get("pacient", pacient_id)["version_id"] == 2
+
+    assert client.post(f"/patients/inactivate-patient/{pacient_id}",
+                       json={"reason": "Mudou de cidade"}).status_code == 200
+    response = client.post("/appointments/schedule-appointment", json={
+        "pacient_id": pacient_id, "doctor_id": doctor_id,
+        "scheduled_at": (datetime.now(timezone.utc) + timedelta(days=1)).isoformat()})
+    assert response.status_code == 404
+
+    assert client.delete(f"/patients/delete-patient/{pacient_id}").status_code == 200
+    assert client.get("/patients/search-patient", params={"id": pacient_id}).status_code == 404
+    assert client.get("/patients/search-patient",
+                      params={"cpf": "88800000020"}).status_code == 404
+
+
+def test_entity_cache_sees_other_workers_writes(db_session):
+    p = create_test_pacient(db_session, cpf="88800000022")
+    d = create_test_doctor(db_session, "Dr. Outro", "88800000023")
+    pacient_id, doctor_id = p.id, d.id
+    etag = client.get(f"/patients/{pacient_id}").headers["ETag"]
+    assert entity_cache.get("pacient", pacient_id) is not None
+
+    # Another worker inactivates the patient; this process's cache never hears of it.
+    db_session.execute(text(
+        "UPDATE pacient SET is_active = false, version_id = version_id + 1 WHERE id = :id"
+    ), {"id": pacient_id})
+    db_session.commit()
+
+    response = client.get(f"/patients/{pacient_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] == f'"{pacient_id}-2"'
+    response = client.post("/appointments/schedule-appointment", json={
+        "pacient_id": pacient_id, "doctor_id": doctor_id,
+        "scheduled_at": (datetime.now(timezone.utc) + timedelta(days=1)).isoformat()})
+    assert response.status_code == 404
+
+def test_staff_directory(db_session):
+    for i, name in enumerate(("dirtest-c", "dirtest-a", "dirtest-b")):
+        create_test_doctor(db_session, name, f"8880000003{i}")
+    assert client.post("/auth/create-new-staff-member", json={
+        "cpf": "88800000039", "username": "dirtest-r",
+        "hashed_password": "senha123", "role": "recepcionista"}).status_code == 201
+
+    params = {"role": "doctor", "username": "dirtest-", "limit": 2}
+    response = client.get("/auth/staff-directory", params=params)
+    assert response.status_code == 200
+    assert [s["username"] for s in response.json()] == ["dirtest-a", "dirtest-b"]
+    assert set(response.json()[0]) == {"id", "username", "role"}
+    etag = response.headers["ETag"]
+
+    response = client.get("/auth/staff-directory", params={
+        **params, "cursor": response.headers["X-Next-Cursor"]})
+    assert [s["username"] for s in response.json()] == ["dirtest-c"]
+    assert "X-Next-Cursor" not in response.headers
+
+    response = client.get("/auth/staff-directory", params={"username": "dirtest-r"})
+    assert [s["role"] for s in response.json()] == ["RECEPCIONISTA"]
+    assert client.get("/auth/staff-directory", params={"username": "dirtest_"}).json() == []
+
+    response = client.get("/auth/staff-directory", params=params,
+                          headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    doctor = create_test_doctor(db_session, "dirtest-d", "88800000038")
+    response = client.get("/auth/staff-directory", params=params,
+                          headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    etag = response.headers["ETag"]
+    doctor.username = "dirtest-e"
+    db_session.commit()
+    response = client.get("/auth/staff-directory", params=params,
+                          headers={"If-None-Match": etag})
+    assert response.status_code == 200
+
+    assert client.post("/auth/create-new-staff-member", json={
+        "cpf": "88800000037", "username": "Dr. Diretório",
+        "hashed_password": "senha123", "role": "Doctor"}).status_code == 201
+    response = client.get("/auth/staff-directory", params={"role": "DOCTOR", "username": "Dr. Dir"})
+    assert [s["username"] for s in response.json()] == ["Dr. Diretório"]